@@ -0,0 +1,334 @@
+""" Benchmark af ekstraktion og download mod en lokal HTTP-server.
+
+Starter en server på 127.0.0.1 med konfigurerbar latenstid, filstørrelse, fejlrate og
+Content-Disposition varianter. Requests til værtsnavnet "localhost" behandles som en langsom
+host. Syntetiske workbooks genereres i en midlertidig mappe. Hvert scenarie køres i sin egen
+proces, så peak RSS måles pr. scenarie.
+
+    python benchmarks/bench_downloader.py --files 500 --latency 20 --json run.json
+    python benchmarks/bench_downloader.py --compare run.json   # sammenlign med en tidligere kørsel
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import http.server
+import json
+import os
+import queue
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import excel_downloader as ed  # noqa: E402
+
+SLOW_HOST = "localhost" # Samme server, men med --slow-latency; adaptiv samtidighed ser den som en anden host
+CONTENT_DISPOSITIONS = (
+    None,
+    'attachment; filename="{name}.pdf"',
+    "attachment; filename*=UTF-8''%C3%A6%C3%B8%C3%A5-{name}.pdf",
+    "inline",
+)
+
+
+# ----- LOKAL HTTP-SERVER -----
+
+def _path_fraction(path):
+    """ Stabil værdi i [0, 1) pr. sti, så de samme filer fejler i hver kørsel. """
+    return int(hashlib.sha1(path.encode()).hexdigest()[:8], 16) / 0x100000000
+
+
+def _file_stem(path):
+    return os.path.splitext(path.rsplit("/", 1)[-1])[0]
+
+
+class BenchHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive som en rigtig webserver
+    settings = {}
+    seen_flaky = set()
+    seen_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for name, value in headers: self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body: self.wfile.write(body)
+
+    def do_GET(self):
+        settings = self.settings
+        host = (self.headers.get("Host") or "").split(":")[0]
+        latency = settings["slow_latency"] if host == SLOW_HOST else settings["latency"]
+        if latency: time.sleep(latency / 1000.0)
+        path = self.path.split("?")[0]
+        if path.startswith("/page/"):
+            return self._send(200, settings["page_html"], [("Content-Type", "text/html; charset=utf-8")])
+        if not path.startswith("/files/"):
+            return self._send(404)
+        fraction = _path_fraction(path)
+        if fraction < settings["error_rate"]:
+            return self._send(404)
+        if fraction < settings["error_rate"] + settings["flaky_rate"]:
+            with self.seen_lock:
+                first_attempt = path not in self.seen_flaky
+                self.seen_flaky.add(path)
+            if first_attempt:
+                return self._send(503, headers=[("Retry-After", "0")])
+        name = _file_stem(path)
+        # Indholdet varierer pr. fil, så dedup ikke hardlinker alt til én fil
+        body = (path.encode() * (settings["size"] // max(1, len(path)) + 1))[:settings["size"]]
+        headers = [("Content-Type", "application/pdf")]
+        disposition = CONTENT_DISPOSITIONS[int(fraction * 1000) % len(CONTENT_DISPOSITIONS)]
+        if disposition: headers.append(("Content-Disposition", disposition.format(name=name)))
+        self._send(200, body, headers)
+
+
+class BenchServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def start_server(settings):
+    BenchHandler.settings = settings
+    server = BenchServer(("127.0.0.1", 0), BenchHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ----- SYNTETISKE DATA -----
+
+def file_urls(port, count, slow_fraction):
+    urls = []
+    for i in range(count):
+        host = SLOW_HOST if (i % 100) < slow_fraction * 100 else "127.0.0.1"
+        urls.append(f"http://{host}:{port}/files/doc_{i:06d}.pdf")
+    return urls
+
+
+def make_workbook(path, rows):
+    """ Workbook med rows rækker: hver anden celle en URL som tekst, hver fjerde et hyperlink. """
+    import openpyxl
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for i in range(1, rows + 1):
+        sheet.cell(row=i, column=1, value=f"Række {i}")
+        if i % 2 == 0:
+            sheet.cell(row=i, column=2, value=f"https://example.com/files/report_{i}.pdf")
+        if i % 4 == 0:
+            cell = sheet.cell(row=i, column=3, value="link")
+            cell.hyperlink = f"https://example.com/files/attachment_{i}.xlsx"
+    workbook.save(path)
+
+
+def make_page_html(port, count):
+    links = "\n".join(f'<a href="/files/page_{i:06d}.pdf">Fil {i}</a>' for i in range(count))
+    return f"<!doctype html><html><body>{links}</body></html>".encode()
+
+
+# ----- MÅLING -----
+
+def percentile(values, fraction):
+    if not values: return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # bytes på macOS, KB på Linux
+
+
+def _drain_in_background(q):
+    """ Tømmer køen løbende ligesom GUI'en gør, så beskederne ikke hober sig op i hukommelsen. """
+    stop = threading.Event()
+    def drain():
+        while not stop.is_set() or not q.empty():
+            try: q.get(timeout=0.05)
+            except queue.Empty: pass
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+    def finish():
+        stop.set(); thread.join()
+    return finish
+
+
+def _metrics(count, seconds, total_bytes, latencies, extra=None):
+    metrics = {
+        "items": count,
+        "seconds": round(seconds, 3),
+        "files_per_s": round(count / seconds, 1) if seconds else 0.0,
+        "mb_per_s": round(total_bytes / seconds / 1e6, 2) if seconds else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "peak_rss_mb": round(peak_rss_mb() or 0.0, 1),
+    }
+    metrics.update(extra or {})
+    return metrics
+
+
+def bench_extract_files(workbooks, fast_scan):
+    q = queue.Queue()
+    finish = _drain_in_background(q)
+    latencies = []
+    started = time.perf_counter()
+    for path in workbooks:
+        file_started = time.perf_counter()
+        ed.extract_links_from_files([path], q, fast_scan=fast_scan)
+        latencies.append(time.perf_counter() - file_started)
+    seconds = time.perf_counter() - started
+    finish()
+    return _metrics(len(workbooks), seconds, sum(os.path.getsize(path) for path in workbooks), latencies)
+
+
+def bench_extract_website(page_url, repeat, timeout, streaming):
+    q = queue.Queue()
+    finish = _drain_in_background(q)
+    latencies = []
+    links = set()
+    session = ed.DownloadSession()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        page_started = time.perf_counter()
+        links = ed.extract_links_from_website(page_url, q, timeout, session, streaming=streaming)
+        latencies.append(time.perf_counter() - page_started)
+    seconds = time.perf_counter() - started
+    session.close()
+    finish()
+    page_bytes = len(BenchHandler.settings.get("page_html", b"")) or 0
+    return _metrics(repeat, seconds, page_bytes * repeat, latencies, {"links_per_page": len(links)})
+
+
+def bench_download(urls, workers, timeout, adaptive):
+    q = queue.Queue()
+    results = []
+    latencies = [] # Fra ("event", ...) beskederne: én pr. download-forsøg
+    download_folder = tempfile.mkdtemp(prefix="bench_download_")
+    def collect():
+        while True:
+            kind, data = q.get()
+            if kind == "event": latencies.append(data["total_s"])
+            elif kind == "results": results.append(data)
+            elif kind == "enable_buttons": return
+    collector = threading.Thread(target=collect, daemon=True)
+    collector.start()
+    try:
+        started = time.perf_counter()
+        ed.run_download_task({"Bench": urls}, download_folder, q, workers, timeout, adaptive=adaptive)
+        seconds = time.perf_counter() - started
+        collector.join()
+        total_bytes = 0
+        for root, _, names in os.walk(download_folder):
+            total_bytes += sum(os.path.getsize(os.path.join(root, name)) for name in names if not name.startswith("."))
+    finally:
+        shutil.rmtree(download_folder, ignore_errors=True)
+    success_count, fail_count = results[0][:2] if results else (0, len(urls))
+    return _metrics(len(urls), seconds, total_bytes, latencies, {"ok": success_count, "failed": fail_count})
+
+
+def _run_scenario(function, args, server_settings):
+    """ Kører i en frisk proces; returnerer målingerne. """
+    BenchHandler.settings = server_settings # Kun til page-størrelsen; serveren kører i hovedprocessen
+    sys.stdout = open(os.devnull, "w") # download_file_threaded printer fejl direkte
+    return function(*args)
+
+
+def run_isolated(function, args, server_settings):
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(_run_scenario, function, args, server_settings).result()
+
+
+# ----- RAPPORT -----
+
+COLUMNS = ("items", "seconds", "files_per_s", "mb_per_s", "p50_ms", "p99_ms", "peak_rss_mb")
+
+
+def print_report(results, baseline=None):
+    print(f"{'scenarie':<28}" + "".join(f"{column:>13}" for column in COLUMNS))
+    for name, metrics in results.items():
+        print(f"{name:<28}" + "".join(f"{metrics.get(column, ''):>13}" for column in COLUMNS))
+        previous = (baseline or {}).get(name)
+        if previous:
+            deltas = []
+            for column in COLUMNS[1:]:
+                old, new = previous.get(column), metrics.get(column)
+                deltas.append(f"{(new - old) / old * 100:+.0f}%" if old else "")
+            print(f"{'  vs. baseline':<28}{'':>13}" + "".join(f"{delta:>13}" for delta in deltas))
+        extra = {key: value for key, value in metrics.items() if key not in COLUMNS}
+        if extra: print(f"{'':<28}" + ", ".join(f"{key}={value}" for key, value in extra.items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--only", choices=("extract_files", "extract_website", "download"), action="append", help="Kør kun disse scenarier (kan gentages)")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 20000], help="Rækker pr. syntetisk workbook")
+    parser.add_argument("--workbooks", type=int, default=3, help="Antal workbooks pr. størrelse")
+    parser.add_argument("--page-links", type=int, default=5000, help="Links på den syntetiske hjemmeside")
+    parser.add_argument("--repeat", type=int, default=20, help="Antal scanninger af hjemmesiden")
+    parser.add_argument("--files", type=int, default=500, help="Antal filer at downloade")
+    parser.add_argument("--size", type=int, default=64, help="Filstørrelse i KB")
+    parser.add_argument("--latency", type=float, default=10, help="Server-latenstid i ms")
+    parser.add_argument("--slow-latency", type=float, default=250, help="Latenstid i ms for den langsomme host")
+    parser.add_argument("--slow-fraction", type=float, default=0.1, help="Andel af filerne på den langsomme host")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Andel af filerne der giver 404")
+    parser.add_argument("--flaky-rate", type=float, default=0.02, help="Andel af filerne der giver 503 ved første forsøg")
+    parser.add_argument("--workers", type=int, default=ed.DEFAULT_MAX_CONCURRENT_DOWNLOADS)
+    parser.add_argument("--timeout", type=int, default=ed.DEFAULT_DOWNLOAD_TIMEOUT)
+    parser.add_argument("--no-adaptive", dest="adaptive", action="store_false")
+    parser.add_argument("--json", metavar="FIL", help="Gem målingerne som JSON")
+    parser.add_argument("--compare", metavar="FIL", help="Sammenlign med en tidligere --json fil")
+    args = parser.parse_args(argv)
+    selected = args.only or ["extract_files", "extract_website", "download"]
+
+    settings = {
+        "latency": args.latency, "slow_latency": args.slow_latency, "size": args.size * 1024,
+        "error_rate": args.error_rate, "flaky_rate": args.flaky_rate, "page_html": b"",
+    }
+    server = start_server(settings)
+    port = server.server_address[1]
+    settings["page_html"] = make_page_html(port, args.page_links)
+    work_dir = tempfile.mkdtemp(prefix="bench_data_")
+    results = {}
+    try:
+        if "extract_files" in selected:
+            for rows in args.rows:
+                workbooks = []
+                for n in range(args.workbooks):
+                    path = os.path.join(work_dir, f"bench_{rows}_{n}.xlsx")
+                    make_workbook(path, rows)
+                    workbooks.append(path)
+                results[f"extract_files[{rows}]"] = run_isolated(bench_extract_files, (workbooks, False), settings)
+                results[f"extract_files_fast[{rows}]"] = run_isolated(bench_extract_files, (workbooks, True), settings)
+        if "extract_website" in selected:
+            page_url = f"http://127.0.0.1:{port}/page/index.html"
+            results[f"extract_website[{args.page_links}]"] = run_isolated(bench_extract_website, (page_url, args.repeat, args.timeout, True), settings)
+            results[f"extract_website_bs4[{args.page_links}]"] = run_isolated(bench_extract_website, (page_url, args.repeat, args.timeout, False), settings)
+        if "download" in selected:
+            BenchHandler.seen_flaky.clear()
+            urls = file_urls(port, args.files, args.slow_fraction)
+            results[f"download[{args.files}x{args.size}KB]"] = run_isolated(bench_download, (urls, args.workers, args.timeout, args.adaptive), settings)
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: baseline = json.load(f).get("results")
+    print_report(results, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%d %H:%M:%S"), "settings": {key: value for key, value in vars(args).items()}, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,15 +10,19 @@ setup(
     long_description_content_type='text/markdown',
     url='https://github.com/yourusername/excel-link-downloader',
     packages=find_packages(where='src'),
+    py_modules=['excel_downloader'],
     package_dir={'': 'src'},
     install_requires=[
         'openpyxl',
         'requests',
         'beautifulsoup4',
     ],
+    extras_require={
+        'async': ['aiohttp'],
+    },
     entry_points={
         'console_scripts': [
-            'excel-link-downloader=excel_downloader:main',  # Adjust if main function is defined
+            'excel-link-downloader=excel_downloader:main',
         ],
     },
     classifiers=[
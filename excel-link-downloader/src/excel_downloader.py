@@ -0,0 +1,3935 @@
+import threading
+import queue
+import os
+import sys
+import importlib
+import importlib.util
+import re
+from urllib.parse import urlparse, urlunparse, unquote, urljoin # urljoin tilføjet
+import mimetypes
+import hashlib
+import json
+import traceback
+import shutil
+import concurrent.futures
+import collections
+import zipfile
+import posixpath
+import codecs
+import html.parser
+import xml.etree.ElementTree as ET
+import time
+import random
+import heapq
+import itertools
+import tarfile
+import tempfile
+import contextlib
+import array
+import asyncio
+import sqlite3 # Job-lager i distribueret mode
+import multiprocessing
+
+
+class _LazyModule:
+    """ Stedfortræder for et modul der først importeres ved første attributopslag.
+    Holder opstarten hurtig (fx kommandolinjen fra cron) og gør at GUI/parsere kun kræves når de bruges. """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+tk = _LazyModule("tkinter") # Kun GUI'en
+ttk = _LazyModule("tkinter.ttk")
+filedialog = _LazyModule("tkinter.filedialog")
+messagebox = _LazyModule("tkinter.messagebox")
+scrolledtext = _LazyModule("tkinter.scrolledtext")
+openpyxl = _LazyModule("openpyxl") # Nødvendig for hyperlinks
+requests = _LazyModule("requests")
+bs4 = _LazyModule("bs4") # Nødvendig for website scraping
+aiohttp = _LazyModule("aiohttp") # Valgfri: kun nødvendig for asyncio download-motoren
+
+
+# ----- STANDARD KONFIGURATION -----
+DEFAULT_DOWNLOAD_TIMEOUT = 30
+DEFAULT_MAX_CONCURRENT_DOWNLOADS = 10
+DEFAULT_MAX_ASYNC_CONCURRENCY = 500 # Samtidige downloads når asyncio-motoren bruges
+DOWNLOAD_ENGINE_THREADS = "threads"
+DOWNLOAD_ENGINE_ASYNCIO = "asyncio"
+DEFAULT_PIPELINE_QUEUE_SIZE = 1000 # Max links der venter mellem ekstraktion og download i pipeline-mode
+PIPELINE_PROGRESS_STEP = 25 # Opdater progress maksimum for hver N fundne links
+PIPELINE_POLL_INTERVAL = 0.1 # Sekunder mellem kig efter nye links mens downloads kører (pipeline-mode)
+DEFAULT_EXTRACTION_PROCESSES = 0 # 0 = læs Excel-filer sekventielt; >0 = antal processer til parallel læsning
+PARTIAL_SUFFIX = ".part" # Halvfærdige downloads; omdøbes først når filen er komplet
+PARTIAL_META_SUFFIX = ".json" # Validators (ETag/Last-Modified/længde) ved siden af .part-filen
+ASYNC_PARTIAL_OWNER = "asyncio" # asyncio-motorens .part-filer får eget navn (kan ikke genoptages, rører aldrig tråd-motorens)
+SEGMENTED_MIN_SIZE = 64 * 1024 * 1024 # Filer fra denne størrelse hentes i parallelle intervaller, hvis serveren sender Accept-Ranges
+SEGMENTED_CONNECTIONS = 4 # Forbindelser pr. stor fil (1 = altid én strøm)
+SEGMENT_CHUNK_SIZE = 256 * 1024 # Bytes pr. læsning i et interval
+SEGMENT_WRITE_BUFFER = 1024 * 1024 # Skrivebuffer pr. interval
+BANDWIDTH_BURST_SECONDS = 0.5 # En token-bucket kan spare op til så mange sekunders trafik
+BANDWIDTH_MIN_BURST = 256 * 1024 # ... men mindst én stor læsning, så en lav grænse ikke blokerer et helt interval
+BANDWIDTH_WAIT_SLICE = 0.25 # Ventetid deles op, så en ændret grænse slår igennem med det samme
+ARCHIVE_ZIP = "zip" # Arkiv-output: én <source_key>.zip pr. kilde i stedet for en mappe
+ARCHIVE_TAR = "tar" # ... eller én <source_key>.tar
+ARCHIVE_INDEX_SUFFIX = ".index.jsonl" # Ved siden af arkivet: én JSON-linje pr. medlem (navn, URL, størrelse, SHA-256)
+ARCHIVE_SPOOL_BYTES = 8 * 1024 * 1024 # En download til et arkiv holdes i hukommelsen op til denne størrelse (større spildes til en midlertidig fil)
+CONTENT_SNIFF_BYTES = 512 # Bytes fra starten af et svar der bruges til at genkende HTML-sider og filtype
+MANIFEST_FILENAME = ".download_manifest.json" # Pr. download-mappe: hvad er hentet, med validators og hash
+MANIFEST_SAVE_EVERY = 100 # Gem manifestet for hver N nye poster
+JOURNAL_DIRNAME = ".download_journal" # I hoved-mappen: pr. kørsel en <run_id>.failed.jsonl og <run_id>.succeeded.jsonl
+JOURNAL_KEEP_RUNS = 5 # Journaler for ældre kørsler slettes, når en ny kørsel starter
+JOURNAL_FLUSH_EVERY = 200 # Skriv journalen til disken for hver N poster
+SUBMIT_WINDOW_FACTOR = 4 # Højst max_workers * dette antal unikke downloads er taget ind ad gangen (kørende, ventende og til genforsøg)
+EVENTS_FILENAME = ".download_events.jsonl" # I hoved-mappen: én JSON-linje pr. download-forsøg
+METRICS_FILENAME = ".download_metrics.prom" # I hoved-mappen: Prometheus tekst-snapshot (textfile collector)
+METRICS_SNAPSHOT_EVERY = 500 # Skriv Prometheus-snapshot for hver N hændelser (og ved afslutning)
+METRICS_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0) # Sekunder pr. download
+DEFAULT_PORTS = {'http': 80, 'https': 443} # Fjernes ved URL-normalisering
+ADAPTIVE_INITIAL_HOST_LIMIT = 4 # Start-grænse pr. host ved adaptiv samtidighed
+ADAPTIVE_DECREASE_COOLDOWN = 2.0 # Sekunder mellem to halveringer af en hosts grænse
+ADAPTIVE_LATENCY_TOLERANCE = 1.5 # Svartid over gennemsnit * dette stopper forøgelsen af grænsen
+DEFAULT_MAX_ATTEMPTS = 3 # Forsøg pr. download inkl. det første (1 = ingen automatiske genforsøg)
+RETRY_BASE_DELAY = 1.0 # Sekunder; fordobles pr. forsøg (med jitter)
+RETRY_MAX_DELAY = 60.0
+RETRY_AFTER_MAX = 300 # Længste Retry-After vi respekterer
+SCHEDULE_INPUT = "input" # Downloads startes i input-rækkefølge
+SCHEDULE_LARGEST_FIRST = "largest" # Største filer først: kortest samlet kørselstid (ingen lang hale til sidst)
+SCHEDULE_SMALLEST_FIRST = "smallest" # Mindste filer først: flest færdige filer hurtigt
+PROGRESS_BYTES_INTERVAL = 0.5 # Mindste sekunder mellem to ("progress_bytes", ...) beskeder
+PROGRESS_RATE_WINDOW = 10.0 # Sekunder bagud hastigheden (og dermed ETA) måles over
+JOBS_FILENAME = ".download_jobs.sqlite" # Distribueret mode: delt job-lager i hoved-mappen
+JOB_LEASE_SECONDS = 120 # En worker ejer et job så længe; forlænges med heartbeat, ellers tages det op af en anden
+JOB_POLL_INTERVAL = 1.0 # Sekunder mellem opslag i job-lageret når der ikke er noget at lave
+DEFAULT_LOCAL_WORKERS = 1 # Worker-processer coordinatoren selv starter (flere kan tilslutte sig fra andre maskiner)
+DEFAULT_POOL_HOSTS = 50 # Antal hosts der holdes åbne forbindelses-pools til samtidigt
+HTML_STREAM_CHUNK_SIZE = 64 * 1024 # Bytes pr. bid når HTML-sider parses mens de hentes
+HTML_CHARSET_SNIFF_BYTES = 1024 # Bytes der læses før tegnsættet vælges (<meta charset> skal stå i starten)
+WEB_PAGE_EXTENSIONS = ('.html', '.htm', '.php', '.aspx', '.asp', '.jsp', '.do', '.action', '.shtml', '/') # Links hertil er sider, ikke filer
+CRAWL_SCOPE_HOST = "host" # Crawl hele start-URL'ens host
+CRAWL_SCOPE_PATH = "path" # Crawl kun under start-URL'ens mappe på samme host
+DEFAULT_CRAWL_DEPTH = 2 # Klik væk fra start-siden når crawl er slået til (0 = kun start-siden)
+DEFAULT_CRAWL_MAX_PAGES = 500 # Sider pr. start-URL
+DEFAULT_CRAWL_WORKERS = 8 # Samtidige side-hentninger i alt
+CRAWL_MAX_PER_HOST = 2 # Samtidige side-hentninger pr. host (høflighed)
+CRAWL_HOST_DELAY = 0.25 # Mindste sekunder mellem to side-requests til samme host (robots.txt Crawl-delay vinder hvis større)
+GUI_POLL_INTERVAL_MS = 50 # Hvor ofte GUI'en tømmer køen (~20 gange i sekundet)
+GUI_QUEUE_TIME_BUDGET = 0.02 # Max sekunder pr. tick på at behandle kø-beskeder, så Tk's event loop ikke fryser
+GUI_LOG_MAX_LINES = 5000 # Loggen i GUI'en er en ringbuffer; ældre linjer fjernes
+GUI_RESULTS_PAGE_SIZE = 200 # Rækker pr. side i resultatvisningen
+DEFAULT_REQUEST_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
+# ----- HJÆLPEFUNKTIONER -----
+
+def sanitize_filename(filename, is_folder=False):
+    """ Fjerner eller erstatter ugyldige tegn. Lidt anderledes for mapper. """
+    # Fjerner flere tegn for mapper end for filer
+    if is_folder:
+        # Fjerner også punktum for at undgå skjulte mapper eller problemer med extensions
+        # Bevarer dog underscore og bindestreg
+        sanitized = re.sub(r'[\\/*?:"<>|.,!@#$%^&()+={}\[\];\'`~]', "_", filename) # Mere aggressiv for mapper
+        sanitized = re.sub(r'_+', '_', sanitized).strip('_') # Erstat multiple underscores med en enkelt
+    else:
+        sanitized = re.sub(r'[\\/*?:"<>|]', "_", filename)
+
+    # Fælles begrænsninger
+    max_len = 150 # Reduceret max længde for bredere kompatibilitet
+    original_len = len(sanitized)
+    if original_len > max_len:
+        if is_folder:
+             sanitized = sanitized[:max_len]
+        else:
+             try:
+                 name, ext = os.path.splitext(sanitized)
+                 # Bevar extension hvis muligt og rimelig længde
+                 if len(ext) < 20 and len(ext) < original_len:
+                      sanitized = name[:max_len - len(ext)] + ext
+                 else: # Usandsynligt, men håndter hvis extension er for lang
+                      sanitized = name[:max_len]
+             except Exception: # Fallback hvis splitext fejler
+                 sanitized = sanitized[:max_len]
+
+    # Undgå tomme navne efter sanitizing
+    if not sanitized:
+        timestamp = str(int(time.time() * 1000))[-6:]
+        sanitized = f"unnamed_{'folder' if is_folder else 'file'}_{timestamp}"
+
+    # Undgå navne der kun består af punktummer eller starter med et
+    sanitized = sanitized.lstrip('.')
+    if not sanitized: # Hvis det kun var punktummer
+         timestamp = str(int(time.time() * 1000))[-6:]
+         sanitized = f"unnamed_{'folder' if is_folder else 'file'}_{timestamp}_dots"
+
+    return sanitized
+
+def get_filename_from_url(url, response):
+    """ Forsøger at udlede et filnavn fra URL'en eller HTTP-headeren. """
+    filename = None
+    try:
+        # 1. Prøv Content-Disposition headeren
+        content_disposition = response.headers.get('content-disposition')
+        if content_disposition:
+            # Udvidet regex til at håndtere forskellige formater bedre
+            fname_match = re.search(r'filename\*?=(?:(?:UTF-8|iso-8859-1)\'\')?[\'"]?([^\'"]+)[\'"]?', content_disposition, re.IGNORECASE)
+            if fname_match:
+                filename_from_header = unquote(fname_match.group(1), encoding='utf-8', errors='replace').strip()
+                if filename_from_header:
+                    # Nogle gange indeholder headeren stier, tag kun filnavnet
+                    filename = os.path.basename(filename_from_header)
+                    if filename:
+                        # print(f"      - Filnavn fundet i Content-Disposition: {filename}")
+                        return sanitize_filename(filename) # Returner straks hvis fundet
+
+        # 2. Prøv at udlede fra URL-stien
+        parsed_url = urlparse(url)
+        # Afkod stien før basename for at håndtere %20 osv. korrekt
+        path = unquote(parsed_url.path)
+        basename = os.path.basename(path)
+        # Ignorer hvis stien slutter med / eller er tom efter basename
+        # Tjek også om det ligner en fil (har en extension)
+        if basename and '.' in basename :
+             # Fjern query parametre og fragment
+             basename = basename.split('?')[0].split('#')[0]
+             if basename: # Tjek igen efter split
+                filename = basename
+                # print(f"      - Filnavn udledt fra URL: {filename}")
+                return sanitize_filename(filename) # Returner straks hvis fundet
+
+    except Exception as e:
+        print(f"      - Advarsel: Fejl under forsøg på at udlede filnavn fra header/URL: {e}", file=sys.stderr)
+
+    # 3. Fallback: Generer et navn baseret på URL og content type
+    try:
+        parsed_url = urlparse(url) # Sikrer at parsed_url eksisterer her
+        content_type = response.headers.get('content-type', '').split(';')[0].strip()
+        extension = mimetypes.guess_extension(content_type) or '.download'
+        # Undgå almindelige webside-extensions i fallback navnet
+        if extension.lower() in ['.html', '.htm', '.php', '.aspx', '.asp', '.cfm', '.jsp', '.do', '.action', '.shtml']:
+            extension = '.download'
+        # Brug domæne + en del af stien + timestamp for unikhed
+        domain = parsed_url.netloc.replace('.', '_') if parsed_url.netloc else 'unknown_domain'
+        path_part = sanitize_filename(os.path.basename(unquote(parsed_url.path)).split('?')[0].split('#')[0])[:30] # Tag en kort, sikker del af stien
+        timestamp = str(int(time.time() * 1000))[-6:]
+        # Kombiner delene, men undgå dobbelt underscore hvis path_part er tom
+        filename_parts = [part for part in ["downloaded", domain, path_part, timestamp] if part]
+        filename = "_".join(filename_parts) + extension
+        # print(f"      - Genereret fallback-filnavn: {filename}")
+        return sanitize_filename(filename) # Sanitér igen for en sikkerheds skyld
+    except Exception as fallback_err:
+         print(f"      - Fejl i fallback-navngenerering: {fallback_err}", file=sys.stderr)
+         safe_domain = re.sub(r'[^a-zA-Z0-9_-]', '_', urlparse(url).netloc) if urlparse(url).netloc else 'unknown_domain'
+         timestamp = str(int(time.time() * 1000))[-6:] # Sørg for at timestamp er defineret
+         return sanitize_filename(f"download_from_{safe_domain}_{timestamp}.download") # Absolut sidste udvej
+
+
+# Kendte filsignaturer: (offset, magiske bytes, standard-extension eller None, extensions der passer til indholdet)
+_ZIP_EXTENSIONS = ('.zip', '.xlsx', '.xlsm', '.xltx', '.docx', '.docm', '.dotx', '.pptx', '.pptm', '.odt', '.ods', '.odp', '.epub', '.jar', '.kmz', '.vsdx')
+_OLE_EXTENSIONS = ('.xls', '.doc', '.ppt', '.msg', '.msi', '.vsd', '.pub', '.xlt', '.dot', '.pps') # Gamle Office-formater deler én container
+_FILE_SIGNATURES = (
+    (0, b'%PDF-', '.pdf', ('.pdf',)),
+    (0, b'PK\x03\x04', '.zip', _ZIP_EXTENSIONS),
+    (0, b'PK\x05\x06', '.zip', _ZIP_EXTENSIONS), # Tom zip
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', None, _OLE_EXTENSIONS), # Kan ikke skelnes uden at læse containeren
+    (0, b'\x89PNG\r\n\x1a\n', '.png', ('.png',)),
+    (0, b'\xff\xd8\xff', '.jpg', ('.jpg', '.jpeg', '.jpe', '.jfif')),
+    (0, b'GIF87a', '.gif', ('.gif',)),
+    (0, b'GIF89a', '.gif', ('.gif',)),
+    (0, b'II*\x00', '.tif', ('.tif', '.tiff')),
+    (0, b'MM\x00*', '.tif', ('.tif', '.tiff')),
+    (0, b'\x1f\x8b', '.gz', ('.gz', '.tgz')),
+    (0, b"7z\xbc\xaf'\x1c", '.7z', ('.7z',)),
+    (0, b'Rar!\x1a\x07', '.rar', ('.rar',)),
+    (0, b'{\\rtf', '.rtf', ('.rtf', '.doc')),
+    (0, b'OggS', '.ogg', ('.ogg', '.oga', '.ogv', '.opus')),
+    (4, b'ftyp', '.mp4', ('.mp4', '.m4a', '.m4v', '.mov', '.3gp', '.heic')),
+)
+_REPLACEABLE_EXTENSIONS = ('', '.download', '.bin') + tuple(ext for ext in WEB_PAGE_EXTENSIONS if ext != '/')
+
+
+def peek_stream(chunks, size=CONTENT_SNIFF_BYTES):
+    """ Læser bidder fra en iterator indtil mindst size bytes (eller slutningen) er nået.
+    Returnerer (de første size bytes, iterator over HELE strømmen): de allerede læste bidder
+    gives videre uændret foran resten, så intet læses eller kopieres to gange. """
+    chunks = iter(chunks)
+    prefix = []
+    received = 0
+    for chunk in chunks:
+        if not chunk: continue
+        prefix.append(chunk)
+        received += len(chunk)
+        if received >= size: break
+    head = prefix[0][:size] if len(prefix) == 1 else b''.join(prefix)[:size]
+    return head, itertools.chain(prefix, chunks)
+
+
+def looks_like_html(head, content_type=''):
+    """ Er starten af svaret en HTML-side (typisk en fejl- eller login-side) og ikke den forventede fil?
+    Med Content-Type text/html er det nok at et <html-tag optræder; ellers skal indholdet starte som HTML. """
+    preview = head.decode('utf-8', errors='ignore').lstrip('\ufeff \t\r\n').lower()
+    if 'text/html' in (content_type or '').lower():
+        return '<html' in preview or '<!doctype html' in preview
+    if preview.startswith('<!--'): # Kommentar før dokumentet
+        return '<html' in preview
+    return preview.startswith(('<!doctype html', '<html'))
+
+
+def sniff_file_type(head):
+    """ Genkender filtypen ud fra magiske bytes. Returnerer (standard-extension eller None, passende extensions) eller None. """
+    for offset, magic, default_extension, extensions in _FILE_SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return default_extension, extensions
+    return None
+
+
+def correct_extension(filename, head, content_type=''):
+    """ Retter filnavnets extension når indholdet (magiske bytes) viser en anden filtype,
+    fx 'download.php' der er en PDF eller 'rapport.download' der er en xlsx. Ukendt indhold ændrer intet. """
+    sniffed = sniff_file_type(head)
+    if sniffed is None: return filename
+    default_extension, extensions = sniffed
+    base_name, extension = os.path.splitext(filename)
+    if extension.lower() in extensions: return filename
+    # Content-Type bruges til at vælge inden for en familie (zip -> xlsx, OLE -> xls)
+    hinted = mimetypes.guess_extension((content_type or '').split(';')[0].strip().lower()) or ''
+    new_extension = hinted if hinted in extensions else default_extension
+    if new_extension is None: return filename
+    if extension.lower() in _REPLACEABLE_EXTENSIONS or mimetypes.guess_type(filename)[0] is not None:
+        return sanitize_filename(base_name + new_extension) # Forkert eller intetsigende extension erstattes
+    return sanitize_filename(filename + new_extension) # Ukendt "extension" er nok en del af navnet (fx 'rapport.2024')
+
+
+def _url_host(url):
+    """ Hostnavn (små bogstaver) til gruppering pr. server. """
+    try: return urlparse(url).hostname or ''
+    except ValueError: return ''
+
+
+def _uppercase_percent_escapes(text):
+    return re.sub(r'%[0-9a-f]{2}', lambda match: match.group(0).upper(), text)
+
+
+def canonicalize_url(url):
+    """ Normaliseret nøgle til dedup af URL'er: lille scheme/host, ingen standard-port,
+    intet #fragment, ensartet percent-encoding og '/' som tom sti. Selve downloaden bruger den originale URL. """
+    try:
+        parsed = urlparse(url.strip())
+        port = parsed.port
+    except ValueError:
+        return url.strip()
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or '').rstrip('.')
+    netloc = f"[{host}]" if ':' in host else host
+    if port is not None and DEFAULT_PORTS.get(scheme) != port:
+        netloc += f":{port}"
+    if parsed.username is not None: # Brugerinfo bevares uændret
+        netloc = parsed.netloc.rsplit('@', 1)[0] + '@' + netloc
+    # requote_uri afkoder unreserved tegn (%7E -> ~) og koder ulovlige (mellemrum -> %20)
+    path = _uppercase_percent_escapes(requests.utils.requote_uri(parsed.path)) or '/'
+    query = _uppercase_percent_escapes(requests.utils.requote_uri(parsed.query))
+    return urlunparse((scheme, netloc, path, parsed.params, query, ''))
+
+
+def build_url_index(links_dict):
+    """ Globalt URL-indeks: {kanonisk URL: [(source_key, original url), ...]} i input-rækkefølge,
+    så hver ressource kun hentes én gang uanset hvor mange kilder der linker til den. """
+    url_index = {}
+    for source_key, urls in links_dict.items():
+        for url in urls:
+            url_index.setdefault(canonicalize_url(url), []).append((source_key, url))
+    return url_index
+
+
+def _free_save_path(download_subfolder, filename, names=None):
+    """ Reserverer første ledige sti for filename i mappen (navn, navn_1, navn_2 ...) ved at oprette en tom fil
+    eksklusivt, så to tråde aldrig får samme navn; den tomme fil erstattes bagefter med os.replace.
+    Med et FilenameIndex for mappen sker det i O(1) uden at stat'e hver kandidat. """
+    if names is not None:
+        return names.reserve(filename)
+    base_name, extension = os.path.splitext(filename)
+    for counter in itertools.count():
+        save_path = os.path.join(download_subfolder, filename if counter == 0 else f"{base_name}_{counter}{extension}")
+        try:
+            with open(save_path, 'xb'): pass
+            return save_path
+        except FileExistsError:
+            continue
+
+
+def _link_or_copy(src_path, dest_path):
+    """ Lægger src_path ind som dest_path via hardlink, eller kopi hvis filsystemet ikke kan linke. """
+    tmp_path = f"{dest_path}.{threading.get_ident()}.link"
+    try:
+        os.link(src_path, tmp_path)
+    except OSError:
+        shutil.copy2(src_path, tmp_path)
+    os.replace(tmp_path, dest_path)
+
+
+def place_download_for_source(result, primary_subfolder, primary_manifest, url, subfolder_path, source_key, manifest):
+    """ Fordeler en allerede hentet fil (result fra download_file_threaded) til endnu en source_key mappe.
+    Returnerer en resultat-tuple for (url, source_key), så resultaterne stadig rapporteres pr. kilde. """
+    success, detail = result
+    if not success:
+        return (False, (url, detail[1], source_key))
+    primary_url, saved_filename, _ = detail
+    if os.path.abspath(subfolder_path) == os.path.abspath(primary_subfolder):
+        return (True, (url, saved_filename, source_key)) # URL-variant i samme kilde: samme fil
+    src_path = os.path.join(primary_subfolder, saved_filename)
+    names = manifest.names() if manifest is not None else None
+    reserved_path = None
+    try:
+        primary_entry = primary_manifest.get(primary_url) if primary_manifest is not None else None
+        content_hash = primary_entry.get('sha256') if primary_entry else None
+        existing_entry = manifest.get(url) if manifest is not None else None
+        if existing_entry and content_hash and existing_entry.get('sha256') == content_hash:
+            return (True, (url, existing_entry['filename'], source_key)) # Ligger der allerede fra en tidligere kørsel
+        if existing_entry:
+            dest_path = os.path.join(subfolder_path, existing_entry['filename'])
+        else:
+            dest_path = reserved_path = _free_save_path(subfolder_path, saved_filename, names)
+        _link_or_copy(src_path, dest_path)
+        reserved_path = None
+        dest_filename = os.path.basename(dest_path)
+        if manifest is not None:
+            manifest.record(url, dest_filename, os.path.getsize(dest_path),
+                            primary_entry.get('etag') if primary_entry else None,
+                            primary_entry.get('last_modified') if primary_entry else None, content_hash)
+        return (True, (url, dest_filename, source_key))
+    except OSError as e:
+        if reserved_path is not None: # Den tomme reservation må ikke blive liggende som en 0-byte fil
+            if names is not None: names.release(reserved_path)
+            else:
+                try: os.remove(reserved_path)
+                except OSError: pass
+        return (False, (url, f"Fordelingsfejl: {e}", source_key))
+
+
+def _partial_paths(download_subfolder, url, owner=None):
+    """ Stier til .part-fil og tilhørende metadata for en URL. Navnet er en hash af URL'en (og evt. owner),
+    så et genforsøg kan finde den halve fil før filnavnet kendes. Med owner (ASYNC_PARTIAL_OWNER eller en distribueret
+    workers id) skriver to skrivere der har haft samme URL aldrig i samme .part-fil. """
+    url_hash = hashlib.sha1((url if owner is None else f"{owner}\n{url}").encode('utf-8')).hexdigest()[:20]
+    part_path = os.path.join(download_subfolder, f"{url_hash}{PARTIAL_SUFFIX}")
+    return part_path, part_path + PARTIAL_META_SUFFIX
+
+
+def _load_partial_meta(part_path, meta_path, url):
+    """ Returnerer gemte validators for en halv download, eller None hvis den ikke kan genoptages. """
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('url') != url or not meta.get('resumable'): return None
+        meta['offset'] = os.path.getsize(part_path)
+        return meta if meta['offset'] > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def _save_partial_meta(meta_path, meta):
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+
+def _discard_partial(part_path, meta_path):
+    for path in (part_path, meta_path):
+        try: os.remove(path)
+        except OSError: pass
+
+
+def _parse_content_range(content_range):
+    """ 'bytes 100-199/1000' -> (100, 1000). Total er None ved '*'. """
+    match = re.match(r'bytes\s+(\d+)-\d+/(\d+|\*)', content_range or '', re.IGNORECASE)
+    if not match: return None, None
+    total = match.group(2)
+    return int(match.group(1)), (int(total) if total != '*' else None)
+
+
+def _get(url, timeout, session, extra_headers=None):
+    if session is not None:
+        return session.get(url, stream=True, timeout=timeout, allow_redirects=True, headers=extra_headers)
+    headers = dict(DEFAULT_REQUEST_HEADERS)
+    if extra_headers: headers.update(extra_headers)
+    return requests.get(url, stream=True, timeout=timeout, allow_redirects=True, headers=headers)
+
+
+def _segment_ranges(total_length, segments):
+    """ Deler [0, total_length) i segments sammenhængende intervaller: [(start, slut inklusiv), ...]. """
+    size = -(-total_length // segments)
+    return [(start, min(start + size, total_length) - 1) for start in range(0, total_length, size)]
+
+
+def _fetch_segment(url, start, end, total_length, part_path, timeout, session, if_range, abort, chunks=None, limiter=None, progress=None):
+    """ Henter bytes start..end ind på deres plads i den forhåndsallokerede .part-fil.
+    chunks er en allerede åben strøm der begynder ved start (første interval genbruger det oprindelige svar).
+    Stopper når abort sættes af et andet interval. Returnerer antal skrevne bytes. """
+    response = None
+    expected = end - start + 1
+    written = 0
+    try:
+        if chunks is None:
+            headers = {'Range': f"bytes={start}-{end}"}
+            if if_range: headers['If-Range'] = if_range
+            response = _get(url, timeout, session, headers)
+            response.raise_for_status()
+            range_start, range_total = _parse_content_range(response.headers.get('content-range'))
+            if response.status_code != 206 or range_start != start or range_total != total_length:
+                raise IOError(f"Ufuldstændig download: serveren sendte ikke intervallet {start}-{end} (status {response.status_code}, filen er måske ændret)")
+            chunks = response.iter_content(chunk_size=SEGMENT_CHUNK_SIZE)
+        with open(part_path, 'r+b', buffering=SEGMENT_WRITE_BUFFER) as f:
+            f.seek(start)
+            for chunk in chunks:
+                if abort.is_set(): break
+                if not chunk: continue
+                if len(chunk) > expected - written: # Første intervals strøm fortsætter forbi end
+                    chunk = memoryview(chunk)[:expected - written]
+                if limiter is not None: limiter.consume(_url_host(url), len(chunk))
+                if progress is not None: progress.add(url, len(chunk))
+                f.write(chunk)
+                written += len(chunk)
+                if written >= expected: break
+        if written != expected and not abort.is_set():
+            raise IOError(f"Ufuldstændig download: interval {start}-{end} gav {written} af {expected} bytes")
+        return written
+    except Exception:
+        abort.set() # De øvrige intervaller stopper; hele filen hentes forfra ved genforsøg
+        raise
+    finally:
+        if response is not None: response.close()
+
+
+def _download_segmented(url, response, body_chunks, part_path, total_length, timeout, session, if_range, segments, limiter=None, progress=None):
+    """ Henter en stor fil over flere forbindelser: filen forhåndsallokeres, og hvert interval skrives på sin plads.
+    Det første interval læses fra det svar der allerede er åbent; de øvrige hentes med Range + If-Range i egne tråde.
+    Returnerer det samlede antal bytes (kontrolleres mod total_length). """
+    with open(part_path, 'wb') as f:
+        f.truncate(total_length)
+    ranges = _segment_ranges(total_length, segments)
+    abort = threading.Event()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(ranges) - 1) as segment_pool:
+        futures = [segment_pool.submit(_fetch_segment, url, start, end, total_length, part_path, timeout, session, if_range, abort, limiter=limiter, progress=progress)
+                   for start, end in ranges[1:]]
+        try:
+            received = _fetch_segment(url, ranges[0][0], ranges[0][1], total_length, part_path, timeout, session, None, abort, body_chunks, limiter, progress)
+        finally:
+            response.close() # Resten af det første svar skal ikke læses
+        received += sum(future.result() for future in futures)
+    if received != total_length:
+        raise IOError(f"Ufuldstændig download: {received} af {total_length} bytes i intervaller")
+    return received
+
+
+def _store_part_file(part_path, meta_path, download_subfolder, filename, url, size, content_hash, etag, last_modified, manifest, manifest_entry, content_index, q, log_prefix):
+    """ Flytter en komplet .part-fil på plads (fælles for begge download-motorer) og returnerer det gemte filnavn.
+    En kendt URL (manifest_entry) erstatter sin tidligere fil, eller beholder den hvis indholdet er identisk; ellers
+    reserveres et ledigt navn. Bagefter dedupliceres filen mod content_index og registreres i manifestet. """
+    if manifest_entry and manifest_entry.get('sha256') == content_hash:
+        # Serveren sendte hele filen igen, men indholdet er identisk: behold den eksisterende
+        _discard_partial(part_path, meta_path)
+        save_path = os.path.join(download_subfolder, manifest_entry['filename'])
+        manifest.mark_unchanged(url)
+    elif manifest_entry:
+        # Ændret fil fra en kendt URL erstatter den tidligere kopi i stedet for at blive til navn_1
+        save_path = os.path.join(download_subfolder, manifest_entry['filename'])
+        if content_index is not None: content_index.forget(save_path)
+        os.replace(part_path, save_path)
+        _discard_partial(part_path, meta_path)
+    else:
+        names = manifest.names() if manifest is not None else None
+        save_path = _free_save_path(download_subfolder, filename, names)
+        try:
+            os.replace(part_path, save_path)
+        except OSError:
+            if names is not None: names.release(save_path)
+            else: os.remove(save_path)
+            raise
+        _discard_partial(part_path, meta_path)
+
+    saved_filename = os.path.basename(save_path)
+    if content_index is not None and content_index.deduplicate(save_path, content_hash, size):
+        q.put(("log", f"{log_prefix} DUBLET: {saved_filename} er identisk med en tidligere fil (hardlink)"))
+    if manifest is not None:
+        manifest.record(url, saved_filename, size, etag, last_modified, content_hash)
+    return saved_filename
+
+
+def download_file_threaded(url, download_subfolder, q, timeout, source_key, session=None, manifest=None, content_index=None, timings=None, segments=SEGMENTED_CONNECTIONS, progress=None,
+                           archive=None, partial_owner=None):
+    """ Downloader fil, gemmer i download_subfolder. Returnerer resultat-tuple inkl. source_key.
+    Hvis en DownloadSession gives med, genbruges dens keep-alive forbindelser.
+    Data skrives til en .part-fil der først omdøbes når filen er komplet; et genforsøg
+    fortsætter med en Range-request hvis serveren understøtter det og filen er uændret.
+    Med et DownloadManifest sendes betingede requests for kendte URL'er; 304 springer downloaden over.
+    Med et ContentIndex erstattes filer med samme SHA-256 som en allerede gemt fil af et hardlink.
+    Filer fra SEGMENTED_MIN_SIZE hentes over op til segments forbindelser, når serveren understøtter Range-requests.
+    Gives en ByteProgress, meldes forventet størrelse og hver modtaget bid til den.
+    Med en ArchiveWriter skrives filen som medlem i arkivet i stedet for i mappen (ingen .part-fil, ingen genoptagelse).
+    partial_owner indgår i .part-filens navn (se _partial_paths).
+    Gives en timings dict, udfyldes den med http_status, bytes og sekunder for connect, ttfb, transfer og disk. """
+    thread_id = threading.get_ident()
+    save_path = None
+    response = None
+    spool = None
+    limiter = session.limiter if session is not None else None
+    part_path, meta_path = _partial_paths(download_subfolder, url, partial_owner)
+    timings = {} if timings is None else timings
+    _connection_timing.connect_s = 0.0
+    request_started = time.perf_counter()
+    try:
+        resume_meta = _load_partial_meta(part_path, meta_path, url) if archive is None else None
+        manifest_entry = manifest.get(url) if manifest is not None else None
+        offset = 0
+        part_complete = False # Sat når serveren svarer 416 på en genoptagelse af en allerede komplet .part-fil
+        if resume_meta:
+            range_headers = {'Range': f"bytes={resume_meta['offset']}-"}
+            # If-Range kræver en stærk ETag; ellers bruges Last-Modified
+            etag = resume_meta.get('etag')
+            if etag and not etag.startswith('W/'): range_headers['If-Range'] = etag
+            elif resume_meta.get('last_modified'): range_headers['If-Range'] = resume_meta['last_modified']
+            response = _get(url, timeout, session, range_headers)
+            if response.status_code == 206:
+                range_start, range_total = _parse_content_range(response.headers.get('content-range'))
+                expected_total = resume_meta.get('total_length')
+                if range_start == resume_meta['offset'] and (expected_total is None or range_total == expected_total):
+                    offset = range_start
+                    q.put(("log", f"[Thread-{thread_id}] Genoptager {resume_meta.get('filename')} fra byte {offset} (fra {source_key})"))
+                else: # Uventet interval; start forfra
+                    response.close(); response = None
+            elif response.status_code == 416 and resume_meta.get('total_length') == resume_meta['offset']:
+                offset = resume_meta['offset'] # .part-filen er allerede komplet
+                part_complete = True
+            elif response.status_code != 200: # 200 = serveren sender hele (evt. ændrede) fil
+                response.close(); response = None
+        if response is None:
+            conditional_headers = manifest.conditional_headers(manifest_entry) if manifest_entry else None
+            response = _get(url, timeout, session, conditional_headers)
+        headers_received = time.perf_counter()
+        timings['ttfb_s'] = headers_received - request_started # Inkl. connect og evt. et afvist Range-forsøg
+        timings['http_status'] = response.status_code
+        if not part_complete: response.raise_for_status() # Tjekker for 4xx/5xx fejl
+
+        if response.status_code == 304 and manifest_entry:
+            # Uændret siden sidste kørsel: den eksisterende fil genbruges
+            manifest.mark_unchanged(url)
+            q.put(("log", f"[Thread-{thread_id}] UÆNDRET: {manifest_entry['filename']} (fra {source_key})"))
+            return (True, (url, manifest_entry['filename'], source_key))
+
+        hasher = hashlib.sha256()
+        body_chunks = None
+        segmented = False
+        if offset:
+            filename = resume_meta.get('filename') or get_filename_from_url(url, response)
+            total_length = resume_meta.get('total_length')
+            etag, last_modified = resume_meta.get('etag'), resume_meta.get('last_modified')
+            with open(part_path, 'rb') as f: # Hash af den del der allerede ligger på disken
+                for block in iter(lambda: f.read(1024 * 1024), b''): hasher.update(block)
+        else:
+            # Kig på starten af strømmen for at undgå at gemme HTML-fejlsider som filer og for at finde den rigtige filtype
+            content_type = response.headers.get('content-type', '').lower()
+            head, body_chunks = peek_stream(response.iter_content(chunk_size=8192))
+            if looks_like_html(head, content_type):
+                raise ValueError(f"Modtog HTML i stedet for forventet fil (Content-Type: {content_type})")
+
+            filename = correct_extension(get_filename_from_url(url, response), head, content_type)
+            content_length = response.headers.get('content-length')
+            # Komprimerede svar skrives dekomprimeret, så byte-offsets passer ikke til en Range-request
+            compressed = response.headers.get('content-encoding', 'identity').lower() != 'identity'
+            total_length = int(content_length) if content_length and content_length.isdigit() and not compressed else None
+            etag, last_modified = response.headers.get('etag'), response.headers.get('last-modified')
+            # Intervallerne skal komme fra samme version af filen, så det kræver en validator til If-Range
+            if_range = etag if etag and not etag.startswith('W/') else last_modified
+            segmented = (archive is None and segments > 1 and response.status_code == 200 and total_length is not None and total_length >= SEGMENTED_MIN_SIZE
+                         and 'bytes' in response.headers.get('accept-ranges', '').lower() and bool(if_range))
+            # Validators gemmes før første byte, så en afbrudt download kan genoptages
+            # (ikke ved intervaller: den forhåndsallokerede fil siger intet om hvor langt hvert interval nåede)
+            if archive is None:
+                _save_partial_meta(meta_path, {
+                    'url': url, 'filename': filename, 'total_length': total_length, 'etag': etag, 'last_modified': last_modified,
+                    'resumable': not compressed and not segmented and bool(etag or last_modified or total_length),
+                })
+            else:
+                spool = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_BYTES)
+
+        if progress is not None: progress.start(url, total_length, offset)
+        # Gem til .part-filen (fortsæt hvis vi genoptager)
+        disk_seconds = 0.0
+        received = 0
+        if segmented:
+            q.put(("log", f"[Thread-{thread_id}] Henter {filename} ({total_length / (1024 * 1024):.0f} MB) over {segments} forbindelser"))
+            received = _download_segmented(url, response, body_chunks, part_path, total_length, timeout, session, if_range, segments, limiter, progress)
+            hash_started = time.perf_counter() # Skrivningerne ligger i transfer_s; her tælles kun hash-læsningen som disk
+            with open(part_path, 'rb') as f:
+                for block in iter(lambda: f.read(SEGMENT_WRITE_BUFFER), b''): hasher.update(block)
+            disk_seconds = time.perf_counter() - hash_started
+        elif not part_complete:
+            with open(part_path, 'ab' if offset else 'wb') if spool is None else contextlib.nullcontext(spool) as f:
+                for chunk in body_chunks if body_chunks is not None else response.iter_content(chunk_size=8192):
+                    if chunk:
+                        if limiter is not None: limiter.consume(_url_host(url), len(chunk))
+                        if progress is not None: progress.add(url, len(chunk))
+                        write_started = time.perf_counter()
+                        f.write(chunk)
+                        disk_seconds += time.perf_counter() - write_started
+                        hasher.update(chunk)
+                        received += len(chunk)
+        body_received = time.perf_counter()
+        timings['bytes'] = received
+        timings['transfer_s'] = body_received - headers_received - disk_seconds
+        if segmented: timings['segments'] = segments
+
+        written = os.path.getsize(part_path) if spool is None else spool.tell()
+        if total_length is not None and written != total_length:
+            raise IOError(f"Ufuldstændig download: {written} af {total_length} bytes (kan genoptages)")
+        content_hash = hasher.hexdigest()
+
+        if spool is not None:
+            spool.seek(0)
+            member = archive.add(filename, spool, written, url, content_hash)
+            timings['disk_s'] = disk_seconds + time.perf_counter() - body_received # Spool + skrivning i arkivet
+            q.put(("log", f"[Thread-{thread_id}] SUCCES: Gemt {member} i {archive.name} (fra {source_key})"))
+            return (True, (url, member, source_key))
+
+        saved_filename = _store_part_file(part_path, meta_path, download_subfolder, filename, url, written, content_hash, etag, last_modified,
+                                          manifest, manifest_entry, content_index, q, f"[Thread-{thread_id}]")
+        timings['disk_s'] = disk_seconds + time.perf_counter() - body_received # Skrivning + omdøbning/hardlink
+        q.put(("log", f"[Thread-{thread_id}] SUCCES: Gemt {saved_filename} (fra {source_key})"))
+        return (True, (url, saved_filename, source_key))
+
+    except requests.exceptions.Timeout: reason = f"Timeout ({timeout}s)"
+    except requests.exceptions.RequestException as e:
+        reason = f"Request Fejl: {e}"
+        retry_after = _retry_after_seconds(e.response.headers.get('retry-after')) if getattr(e, 'response', None) is not None else None
+        if retry_after is not None: reason += f" [Retry-After: {retry_after}]"
+    except ValueError as e:
+        reason = f"Værdi Fejl: {e}"
+        _discard_partial(part_path, meta_path) # Indholdet var forkert; intet at genoptage
+    except Exception as e: reason = f"Anden Fejl: {e}"
+    finally:
+        # Frigiv forbindelsen til poolen (også når body ikke er læst færdig)
+        if response is not None: response.close()
+        if spool is not None: spool.close()
+        timings['connect_s'] = _connection_timing.connect_s
+
+    # Fejl-logning
+    q.put(("log", f"[Thread-{thread_id}] FEJL: {url} (fra {source_key}) - {reason}"))
+    return (False, (url, reason, source_key))
+
+# ----- HTTP FORBINDELSES-POOL -----
+
+CountingHTTPAdapter = None # Bygges af _counting_http_adapter_class() første gang der skal hentes noget
+_connection_timing = threading.local() # connect_s: sekunder brugt på at åbne forbindelser i denne tråd
+_TIMED_POOL_CLASSES = None
+
+
+def _timed_connection_pool_classes():
+    """ urllib3 pool-klasser hvis forbindelser lægger tiden for connect (DNS, TCP og TLS) i _connection_timing.
+    Genbrugte keep-alive forbindelser kalder ikke connect(), så de tæller 0. """
+    global _TIMED_POOL_CLASSES
+    if _TIMED_POOL_CLASSES is None:
+        import urllib3.connection, urllib3.connectionpool
+        def timed_connect(connection_class):
+            class TimedConnection(connection_class):
+                def connect(self):
+                    started = time.perf_counter()
+                    try:
+                        super().connect()
+                    finally:
+                        _connection_timing.connect_s = getattr(_connection_timing, 'connect_s', 0.0) + time.perf_counter() - started
+            return TimedConnection
+        class TimedHTTPConnectionPool(urllib3.connectionpool.HTTPConnectionPool):
+            ConnectionCls = timed_connect(urllib3.connection.HTTPConnection)
+        class TimedHTTPSConnectionPool(urllib3.connectionpool.HTTPSConnectionPool):
+            ConnectionCls = timed_connect(urllib3.connection.HTTPSConnection)
+        _TIMED_POOL_CLASSES = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+    return dict(_TIMED_POOL_CLASSES)
+
+
+def _counting_http_adapter_class():
+    """ Returnerer CountingHTTPAdapter; klassen arver fra requests' HTTPAdapter og oprettes derfor først ved brug. """
+    global CountingHTTPAdapter
+    if CountingHTTPAdapter is None:
+        importlib.import_module("requests.adapters")
+        class _CountingHTTPAdapter(requests.adapters.HTTPAdapter):
+            """ HTTPAdapter der husker forbindelses-tællere fra pools, også efter de er smidt ud af pool-cachen. """
+            def __init__(self, *args, **kwargs):
+                self._retired_lock = threading.Lock()
+                self._retired_connections = 0
+                self._retired_requests = 0
+                super().__init__(*args, **kwargs)
+
+            def init_poolmanager(self, *args, **kwargs):
+                super().init_poolmanager(*args, **kwargs)
+                self.poolmanager.pool_classes_by_scheme = _timed_connection_pool_classes()
+                original_dispose = self.poolmanager.pools.dispose_func
+                def dispose_and_count(pool):
+                    with self._retired_lock:
+                        self._retired_connections += getattr(pool, 'num_connections', 0)
+                        self._retired_requests += getattr(pool, 'num_requests', 0)
+                    if original_dispose: original_dispose(pool)
+                self.poolmanager.pools.dispose_func = dispose_and_count
+
+            def connection_counts(self):
+                """ Returnerer (åbnede forbindelser, requests sendt) summeret over levende og udsmidte pools. """
+                with self._retired_lock:
+                    opened, sent = self._retired_connections, self._retired_requests
+                pools = self.poolmanager.pools
+                for pool_key in pools.keys(): # keys() tager en kopi under containerens lås
+                    pool = pools.get(pool_key)
+                    if pool is None: continue
+                    opened += getattr(pool, 'num_connections', 0)
+                    sent += getattr(pool, 'num_requests', 0)
+                return opened, sent
+
+        CountingHTTPAdapter = _CountingHTTPAdapter
+    return CountingHTTPAdapter
+
+
+class DownloadSession:
+    """ Delt keep-alive forbindelses-pool til downloads og website scanning.
+    Hver tråd får sin egen requests.Session (cookies/headers), men alle deler samme adapter,
+    så TCP/TLS forbindelser til samme host genbruges på tværs af ThreadPoolExecutor workers.
+    En BandwidthLimiter følger med sessionen, så alle downloads i kørslen deler samme båndbredde-grænser. """
+    def __init__(self, max_workers=DEFAULT_MAX_CONCURRENT_DOWNLOADS, max_hosts=DEFAULT_POOL_HOSTS, limiter=None):
+        self.limiter = limiter # BandwidthLimiter der gælder for alle downloads gennem sessionen, eller None
+        # pool_maxsize pr. host følger max_workers, så alle tråde kan have en åben forbindelse til samme host
+        self.adapter = _counting_http_adapter_class()(pool_connections=max_hosts, pool_maxsize=max(1, max_workers), pool_block=False)
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(DEFAULT_REQUEST_HEADERS)
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            self._local.session = session
+            with self._sessions_lock: self._sessions.append(session)
+        return session
+
+    def get(self, url, **kwargs):
+        return self._session().get(url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self._session().head(url, **kwargs)
+
+    def connection_stats(self):
+        """ Returnerer dict med antal åbnede og genbrugte forbindelser. """
+        opened, sent = self.adapter.connection_counts()
+        return {"opened": opened, "reused": max(0, sent - opened), "requests": sent}
+
+    def close(self):
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        # Sessions deler adapteren, så den lukkes kun én gang til sidst
+        for session in sessions:
+            session.adapters.clear()
+            session.close()
+        self.adapter.close()
+
+
+# ----- DOWNLOAD-MANIFEST -----
+
+class DownloadManifest:
+    """ Husker på tværs af kørsler hvad der er hentet til én download-mappe:
+    URL -> filnavn, størrelse, ETag, Last-Modified og SHA-256. Gemmes som JSON i mappen.
+    Bruges til betingede requests (If-None-Match/If-Modified-Since), så uændrede filer kun koster headers.
+    shared=True (flere processer om samme mappe): save() fletter først de poster andre processer har gemt siden,
+    og overskriver kun dem denne proces selv har ændret. """
+    def __init__(self, folder_path, save_every=MANIFEST_SAVE_EVERY, shared=False):
+        self.folder_path = folder_path
+        self.path = os.path.join(folder_path, MANIFEST_FILENAME)
+        self.save_every = save_every
+        self.shared = shared
+        self.unchanged_count = 0
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self._changed = set() # URL'er ændret i denne proces (bruges ved shared)
+        self._names = None
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('files', {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"      - Advarsel: Kunne ikke læse manifest {self.path}: {e}", file=sys.stderr)
+        return {}
+
+    def get(self, url):
+        """ Returnerer manifest-posten for url, hvis den gemte fil stadig findes med samme størrelse. """
+        with self._lock:
+            entry = self._entries.get(url)
+        if not entry: return None
+        try:
+            if os.path.getsize(os.path.join(self.folder_path, entry['filename'])) != entry.get('size'):
+                return None
+        except (OSError, KeyError):
+            return None
+        return entry
+
+    def names(self):
+        """ Mappens FilenameIndex; bygges ved første brug og deles af alle tråde der gemmer i mappen. """
+        with self._lock:
+            if self._names is None: self._names = FilenameIndex(self.folder_path)
+            return self._names
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get('etag'): headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'): headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def record(self, url, filename, size, etag, last_modified, sha256):
+        with self._lock:
+            self._entries[url] = {'filename': filename, 'size': size, 'etag': etag, 'last_modified': last_modified,
+                                  'sha256': sha256, 'checked_at': int(time.time())}
+            self._changed.add(url)
+            self._dirty += 1
+            save_now = self._dirty >= self.save_every
+        if save_now: self.save() # Gemmes løbende, så et nedbrud ikke mister hele kørslens viden
+
+    def entries(self):
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+    def mark_unchanged(self, url):
+        with self._lock:
+            self.unchanged_count += 1
+            if url in self._entries:
+                self._entries[url]['checked_at'] = int(time.time())
+                self._changed.add(url)
+
+    def save(self):
+        """ Skriver manifestet atomisk (tmp-fil + os.replace). """
+        with self._lock:
+            if self.shared:
+                merged = self._load()
+                merged.update((url, self._entries[url]) for url in self._changed)
+                self._entries = merged
+            data = json.dumps({'version': 1, 'files': self._entries}, ensure_ascii=False)
+            self._dirty = 0
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"      - Advarsel: Kunne ikke gemme manifest {self.path}: {e}", file=sys.stderr)
+
+
+class FilenameIndex:
+    """ Filnavne i én download-mappe, læst én gang med os.listdir og holdt i hukommelsen.
+    reserve() finder et ledigt navn (navn, navn_1 ...) i O(1) i stedet for en os.path.exists-løkke pr. download,
+    og opretter filen eksklusivt, så hverken andre tråde eller andre processer kan tage samme navn. """
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self._lock = threading.Lock()
+        self._next_counter = {} # Normaliseret ønsket navn -> næste suffiks der skal prøves
+        try:
+            self._taken = {os.path.normcase(name) for name in os.listdir(folder_path)}
+        except OSError:
+            self._taken = set()
+
+    def reserve(self, filename):
+        """ Returnerer stien til en nyoprettet, tom fil med første ledige variant af filename. """
+        key = os.path.normcase(filename)
+        base_name, extension = os.path.splitext(filename)
+        with self._lock:
+            counter = self._next_counter.get(key, 0)
+            while True:
+                candidate = filename if counter == 0 else f"{base_name}_{counter}{extension}"
+                counter += 1
+                if os.path.normcase(candidate) in self._taken: continue
+                save_path = os.path.join(self.folder_path, candidate)
+                try:
+                    with open(save_path, 'xb'): pass
+                except FileExistsError: # Oprettet udefra efter listdir
+                    self._taken.add(os.path.normcase(candidate))
+                    continue
+                self._taken.add(os.path.normcase(candidate))
+                self._next_counter[key] = counter
+                return save_path
+
+    def release(self, save_path):
+        """ Fjerner en reservation der ikke blev brugt (den tomme fil slettes). """
+        with self._lock:
+            self._taken.discard(os.path.normcase(os.path.basename(save_path)))
+            self._next_counter.clear() # Tællerne er kun en genvej; det frigivne navn skal kunne findes igen
+        try: os.remove(save_path)
+        except OSError: pass
+
+
+class ContentIndex:
+    """ SHA-256 -> gemt fil på tværs af alle source_key mapper under hoved-mappen.
+    Startes fra manifesterne (tidligere kørsler) og udvides løbende; identiske filer
+    erstattes af hardlinks til første kopi. """
+    def __init__(self, base_folder_path=None):
+        self._lock = threading.Lock()
+        self._paths_by_hash = {} # sha256 -> (sti, størrelse, verificeret i denne kørsel)
+        self._hash_by_path = {}
+        self.linked_count = 0
+        self.bytes_saved = 0
+        if base_folder_path:
+            self._load_from_manifests(base_folder_path)
+
+    def _load_from_manifests(self, base_folder_path):
+        try:
+            subfolders = [entry.path for entry in os.scandir(base_folder_path) if entry.is_dir()]
+        except OSError:
+            return
+        for subfolder_path in subfolders:
+            if not os.path.exists(os.path.join(subfolder_path, MANIFEST_FILENAME)): continue
+            for entry in DownloadManifest(subfolder_path).entries():
+                if entry.get('sha256') and entry.get('filename') and entry['sha256'] not in self._paths_by_hash:
+                    path = os.path.join(subfolder_path, entry['filename'])
+                    self._paths_by_hash[entry['sha256']] = (path, entry.get('size'), False)
+                    self._hash_by_path[path] = entry['sha256']
+
+    def forget(self, path):
+        """ Kaldes før en kendt fil overskrives, så den ikke længere bruges som link-kilde. """
+        with self._lock:
+            content_hash = self._hash_by_path.pop(path, None)
+            if content_hash and self._paths_by_hash.get(content_hash, (None,))[0] == path:
+                del self._paths_by_hash[content_hash]
+
+    def _register(self, save_path, content_hash, size):
+        with self._lock:
+            self._paths_by_hash[content_hash] = (save_path, size, True)
+            self._hash_by_path[save_path] = content_hash
+
+    def deduplicate(self, save_path, content_hash, size):
+        """ Registrerer save_path, eller erstatter den med et hardlink hvis samme indhold allerede findes.
+        Returnerer True hvis filen blev linket. """
+        with self._lock:
+            existing = self._paths_by_hash.get(content_hash)
+            if existing is None:
+                self._paths_by_hash[content_hash] = (save_path, size, True)
+                self._hash_by_path[save_path] = content_hash
+                return False
+        existing_path, existing_size, verified = existing
+        try:
+            if os.path.samefile(existing_path, save_path): return False
+            if os.path.getsize(existing_path) != size: raise OSError("størrelsen passer ikke")
+            if not verified and _file_sha256(existing_path) != content_hash:
+                raise OSError("filen fra en tidligere kørsel er ændret")
+            tmp_path = f"{save_path}.{threading.get_ident()}.link"
+            os.link(existing_path, tmp_path)
+            os.replace(tmp_path, save_path)
+        except OSError:
+            # Første kopi er væk/ændret, eller filsystemet kan ikke hardlinke: denne fil bliver den nye reference
+            self._register(save_path, content_hash, size)
+            return False
+        with self._lock:
+            if not verified: self._paths_by_hash[content_hash] = (existing_path, size, True)
+            self._hash_by_path[save_path] = content_hash
+            self.linked_count += 1
+            self.bytes_saved += size
+        return True
+
+
+_journal_runs = itertools.count(1)
+
+
+class RunJournal:
+    """ Journal for én kørsel i JOURNAL_DIRNAME under hoved-mappen: én JSON-linje pr. endeligt resultat, skrevet
+    efterhånden i en fil for mislykkede og en for succesfulde. Kørslen holder kun tællerne i hukommelsen;
+    resultat-listerne læses bagefter fra disken gennem views(). Kun de seneste JOURNAL_KEEP_RUNS kørsler gemmes. """
+    def __init__(self, folder_path):
+        self.folder = os.path.join(folder_path, JOURNAL_DIRNAME)
+        os.makedirs(self.folder, exist_ok=True)
+        self._prune()
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{next(_journal_runs):06d}"
+        self.failed_path = os.path.join(self.folder, f"{self.run_id}.failed.jsonl")
+        self.succeeded_path = os.path.join(self.folder, f"{self.run_id}.succeeded.jsonl")
+        self.success_count = 0
+        self.fail_count = 0
+        self._unflushed = 0
+        self._files = {False: open(self.failed_path, 'w', encoding='utf-8'), True: open(self.succeeded_path, 'w', encoding='utf-8')}
+
+    def _prune(self):
+        """ Sletter journalerne for alle på nær de JOURNAL_KEEP_RUNS - 1 nyeste kørsler. """
+        runs = {}
+        for entry in os.scandir(self.folder):
+            run_id, _, suffix = entry.name.partition('.')
+            if suffix in ('failed.jsonl', 'succeeded.jsonl'):
+                runs.setdefault(run_id, []).append(entry)
+        # Nyeste først efter ændringstid; run_id (tidspunkt, pid, løbenummer) afgør ved samme tid
+        newest_first = sorted(runs, key=lambda run_id: (max(entry.stat().st_mtime_ns for entry in runs[run_id]), run_id), reverse=True)
+        for run_id in newest_first[JOURNAL_KEEP_RUNS - 1:]:
+            for entry in runs[run_id]:
+                try: os.remove(entry.path)
+                except OSError: pass
+
+    def record(self, result):
+        """ Tilføjer en resultat-tuple (success, (url, filnavn/årsag, source_key)). """
+        success, (url, detail, source_key) = result
+        self._files[bool(success)].write(json.dumps({'url': url, 'detail': detail, 'source_key': source_key}, ensure_ascii=False) + "\n")
+        if success: self.success_count += 1
+        else: self.fail_count += 1
+        self._unflushed += 1
+        if self._unflushed >= JOURNAL_FLUSH_EVERY:
+            for f in self._files.values(): f.flush()
+            self._unflushed = 0
+
+    def views(self):
+        """ (mislykkede, succesfulde) for denne kørsel som JournalView. """
+        return (JournalView(self.failed_path, self.fail_count), JournalView(self.succeeded_path, self.success_count))
+
+    def close(self):
+        for f in self._files.values(): f.close()
+
+
+class JournalView:
+    """ Læse-visning af en journal-fil med én kørsels mislykkede eller succesfulde poster.
+    Opfører sig som listen af (url, filnavn/årsag, source_key) tuples den erstatter: len(), iteration og slices
+    (til sidevisning). Ved første slice gemmes kun en byte-position pr. linje, ikke posterne selv. """
+    def __init__(self, path, count):
+        self.path = path
+        self._count = count
+        self._offsets = None
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            for line in f:
+                entry = json.loads(line)
+                yield (entry['url'], entry['detail'], entry['source_key'])
+
+    def __getitem__(self, index):
+        if self._offsets is None:
+            with open(self.path, 'rb') as f:
+                self._offsets = array.array('q', itertools.accumulate((len(line) for line in f), initial=0))[:-1]
+        if not isinstance(index, slice):
+            return self[index:index + 1 or None][0]
+        rows = []
+        with open(self.path, 'rb') as f:
+            for position in self._offsets[index]:
+                f.seek(position)
+                entry = json.loads(f.readline())
+                rows.append((entry['url'], entry['detail'], entry['source_key']))
+        return rows
+
+
+def _file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''): hasher.update(block)
+    return hasher.hexdigest()
+
+
+# ----- ARKIV-OUTPUT -----
+
+class ArchiveWriter:
+    """ Ét zip- eller tar-arkiv pr. source_key, skrevet af én dedikeret tråd (zipfile/tarfile er ikke trådsikre).
+    Download-trådene henter til en SpooledTemporaryFile og giver den til add(); navnet reserveres med det samme efter
+    samme regler som i en mappe (navn, navn_1 ...), og tråden venter til medlemmet er skrevet.
+    Hvert medlem får en linje i <arkiv>ARCHIVE_INDEX_SUFFIX. Et eksisterende arkiv udvides (fx ved genforsøg).
+    Zip-arkivets indholdsfortegnelse skrives først ved close(); tar kan læses op til sidste hele medlem. """
+    def __init__(self, archive_path, archive_format):
+        self.path = archive_path
+        self.name = os.path.basename(archive_path)
+        self.format = archive_format
+        self.added_count = 0
+        self.members = {} # Medlemmer skrevet i denne kørsel: navn -> (størrelse, sha256)
+        self._data_offsets = {} # tar: navn -> position af medlemmets data i filen
+        self._lock = threading.Lock()
+        self._next_counter = {}
+        self._tasks = queue.Queue()
+        exists = os.path.exists(archive_path)
+        if archive_format == ARCHIVE_ZIP:
+            self._archive = zipfile.ZipFile(archive_path, 'a' if exists else 'w', zipfile.ZIP_STORED, allowZip64=True)
+            names = self._archive.namelist()
+        else:
+            # Filen åbnes læsbar, så medlemmer kan kopieres til andre arkiver mens der skrives
+            self._file = open(archive_path, 'r+b' if exists else 'w+b')
+            try:
+                self._archive = tarfile.open(fileobj=self._file, mode='a' if exists else 'w', format=tarfile.PAX_FORMAT)
+            except BaseException:
+                self._file.close()
+                raise
+            names = self._archive.getnames()
+        self._taken = {os.path.normcase(name) for name in names}
+        self._index = open(archive_path + ARCHIVE_INDEX_SUFFIX, 'a', encoding='utf-8')
+        self._thread = threading.Thread(target=self._writer, name=f"archive-{self.name}", daemon=True)
+        self._thread.start()
+
+    def _reserve(self, filename):
+        key = os.path.normcase(filename)
+        base_name, extension = os.path.splitext(filename)
+        with self._lock:
+            counter = self._next_counter.get(key, 0)
+            while True:
+                candidate = filename if counter == 0 else f"{base_name}_{counter}{extension}"
+                counter += 1
+                if os.path.normcase(candidate) not in self._taken: break
+            self._taken.add(os.path.normcase(candidate))
+            self._next_counter[key] = counter
+            return candidate
+
+    def _submit(self, *task):
+        future = concurrent.futures.Future()
+        self._tasks.put((future,) + task)
+        return future.result()
+
+    def add(self, filename, body, size, url, content_hash):
+        """ Skriver body (filobjekt, læst fra starten) som et nyt medlem og returnerer medlemsnavnet. """
+        member = self._reserve(filename)
+        try:
+            self._submit("add", member, body, size, url, content_hash)
+        except BaseException:
+            with self._lock: self._taken.discard(os.path.normcase(member))
+            raise
+        return member
+
+    def read(self, member):
+        """ Returnerer en SpooledTemporaryFile med medlemmets indhold (til fordeling til andre kilder). """
+        return self._submit("read", member)
+
+    def _writer(self):
+        while True:
+            task = self._tasks.get()
+            if task is None: return
+            future, kind, *args = task
+            try:
+                future.set_result(self._write_member(*args) if kind == "add" else self._read_member(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _write_member(self, member, body, size, url, content_hash):
+        if self.format == ARCHIVE_ZIP:
+            info = zipfile.ZipInfo(member, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED # Downloads er typisk allerede komprimerede (PDF, Office, zip)
+            with self._archive.open(info, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as dest:
+                shutil.copyfileobj(body, dest, SEGMENT_WRITE_BUFFER)
+        else:
+            info = tarfile.TarInfo(member)
+            info.size = size
+            info.mtime = time.time()
+            self._archive.addfile(info, body)
+            # tarfile sætter ikke offset_data på nye medlemmer; data ligger lige før den udfyldte slut-blok
+            self._data_offsets[member] = self._archive.offset - -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        self._index.write(json.dumps({'member': member, 'url': url, 'size': size, 'sha256': content_hash}, ensure_ascii=False) + "\n")
+        self.members[member] = (size, content_hash)
+        self.added_count += 1
+
+    def _read_member(self, member):
+        spool = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_BYTES)
+        if self.format == ARCHIVE_ZIP:
+            with self._archive.open(member) as source: shutil.copyfileobj(source, spool, SEGMENT_WRITE_BUFFER)
+        else:
+            self._file.seek(self._data_offsets[member])
+            remaining = self.members[member][0]
+            while remaining:
+                block = self._file.read(min(remaining, SEGMENT_WRITE_BUFFER))
+                if not block: raise IOError(f"{member} er afkortet i {self.name}")
+                spool.write(block)
+                remaining -= len(block)
+            self._file.seek(self._archive.offset) # tarfile skriver videre fra sin egen position
+        spool.seek(0)
+        return spool
+
+    def close(self):
+        """ Skriver de sidste medlemmer, afslutter arkivet og lukker indeks-filen. Kan kaldes flere gange. """
+        if self._thread is None: return
+        self._tasks.put(None)
+        self._thread.join()
+        self._thread = None
+        try:
+            self._archive.close()
+        finally:
+            if self.format == ARCHIVE_TAR: self._file.close()
+            self._index.close()
+
+
+def place_archived_download(result, primary_archive, url, archive, source_key):
+    """ Som place_download_for_source, men kopierer medlemmet fra det primære arkiv til source_keys arkiv. """
+    success, detail = result
+    if not success:
+        return (False, (url, detail[1], source_key))
+    member = detail[1]
+    if archive is primary_archive:
+        return (True, (url, member, source_key)) # URL-variant i samme kilde: samme medlem
+    try:
+        size, content_hash = primary_archive.members[member]
+        with primary_archive.read(member) as body:
+            return (True, (url, archive.add(member, body, size, url, content_hash), source_key))
+    except (OSError, KeyError, zipfile.BadZipFile, tarfile.TarError) as e:
+        return (False, (url, f"Fordelingsfejl: {e}", source_key))
+
+
+# ----- HURTIG XLSX-SCANNER -----
+
+XLSX_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+XLSX_DOC_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+XLSX_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+class FastScanUnsupported(Exception):
+    """ Workbooken indeholder noget den hurtige scanner ikke håndterer; brug openpyxl i stedet. """
+
+
+class UnsafeWorkbook(Exception):
+    """ Workbookens XML indeholder en DTD (mulig entity-bombe); filen springes over i stedet for at gå videre til openpyxl. """
+
+
+def _is_http_url(text):
+    return text.lower().startswith(('http://', 'https://'))
+
+
+class _XlsxTreeBuilder(ET.TreeBuilder):
+    """ TreeBuilder der noterer (event, element) som iterparse og afviser DOCTYPE, før entity-definitioner kan udvides. """
+    def __init__(self, pending, events):
+        super().__init__()
+        self._pending = pending
+        self._events = events
+
+    def start(self, tag, attrs):
+        element = super().start(tag, attrs)
+        if "start" in self._events: self._pending.append(("start", element))
+        return element
+
+    def end(self, tag):
+        element = super().end(tag)
+        if "end" in self._events: self._pending.append(("end", element))
+        return element
+
+    def doctype(self, name, pubid, system):
+        raise UnsafeWorkbook("DOCTYPE/ENTITY i workbookens XML afvises")
+
+
+def _xlsx_iterparse(stream, events=("end",)):
+    """ Som ET.iterparse for en zip-del, men uden DTD'er (workbooks kan komme fra ukendte kilder). """
+    pending = []
+    parser = ET.XMLParser(target=_XlsxTreeBuilder(pending, events))
+    for data in iter(lambda: stream.read(HTML_STREAM_CHUNK_SIZE), b''):
+        parser.feed(data)
+        yield from pending
+        pending.clear()
+    parser.close()
+    yield from pending
+
+
+def _xlsx_rels(zip_file, part_path):
+    """ Læser .rels for en del (fx. xl/workbook.xml) og returnerer {rId: (Target, Type)}. """
+    rels_path = posixpath.join(posixpath.dirname(part_path), "_rels", posixpath.basename(part_path) + ".rels")
+    try:
+        rels_stream = zip_file.open(rels_path)
+    except KeyError:
+        return {}
+    rels = {}
+    with rels_stream:
+        for _, element in _xlsx_iterparse(rels_stream):
+            if element.tag == f"{{{XLSX_PKG_REL_NS}}}Relationship":
+                rels[element.get("Id")] = (element.get("Target"), element.get("Type", ""))
+    return rels
+
+
+def _xlsx_part_path(base_part, target):
+    """ Oversætter en relations-Target til en sti i zip-filen. """
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_part), target))
+
+
+def _xlsx_text(element):
+    """ Tekst fra <si>/<is> som openpyxl: direkte <t> plus <r><t> runs (fonetik <rPh> ignoreres). """
+    snippets = []
+    plain = element.find(f"{{{XLSX_MAIN_NS}}}t")
+    if plain is not None and plain.text:
+        snippets.append(plain.text)
+    for run in element.iterfind(f"{{{XLSX_MAIN_NS}}}r"):
+        run_text = run.findtext(f"{{{XLSX_MAIN_NS}}}t")
+        if run_text:
+            snippets.append(run_text)
+    return "".join(snippets)
+
+
+def _xlsx_shared_url_strings(zip_file, part_path):
+    """ Streamer shared strings og gemmer kun dem der er URL'er: {indeks: url}. Konstant hukommelse ift. øvrig tekst. """
+    url_strings = {}
+    try:
+        stream = zip_file.open(part_path)
+    except KeyError:
+        return url_strings
+    index = 0
+    with stream:
+        context = _xlsx_iterparse(stream, events=("start", "end"))
+        _, root = next(context)
+        for event, element in context:
+            if event == "end" and element.tag == f"{{{XLSX_MAIN_NS}}}si":
+                text = _xlsx_text(element).replace('x005F_', '').strip()
+                if _is_http_url(text):
+                    url_strings[index] = text
+                index += 1
+                root.clear()
+    return url_strings
+
+
+def _xlsx_scan_sheet(zip_file, sheet_path, url_strings, found):
+    """ Streamer ét regneark: tilføjer tekst-URL'er og hyperlink-targets til found. """
+    c_tag, v_tag, is_tag = f"{{{XLSX_MAIN_NS}}}c", f"{{{XLSX_MAIN_NS}}}v", f"{{{XLSX_MAIN_NS}}}is"
+    row_tag, hyperlink_tag, sheet_data_tag = f"{{{XLSX_MAIN_NS}}}row", f"{{{XLSX_MAIN_NS}}}hyperlink", f"{{{XLSX_MAIN_NS}}}sheetData"
+    hyperlink_ids = []
+    sheet_data = None
+    with zip_file.open(sheet_path) as stream:
+        context = _xlsx_iterparse(stream, events=("start", "end"))
+        _, root = next(context)
+        if root.tag != f"{{{XLSX_MAIN_NS}}}worksheet":
+            raise FastScanUnsupported(f"Ukendt regneark-format: {root.tag}")
+        for event, element in context:
+            if event == "start":
+                if element.tag == sheet_data_tag: sheet_data = element
+                continue
+            if element.tag == c_tag:
+                data_type = element.get("t", "n")
+                if data_type == "s":
+                    value = element.findtext(v_tag)
+                    if value:
+                        url = url_strings.get(int(value))
+                        if url: found.add(url)
+                elif data_type == "str":
+                    value = (element.findtext(v_tag) or "").strip()
+                    if _is_http_url(value): found.add(value)
+                elif data_type == "inlineStr":
+                    inline = element.find(is_tag)
+                    if inline is not None:
+                        value = _xlsx_text(inline).strip()
+                        if _is_http_url(value): found.add(value)
+            elif element.tag == row_tag and sheet_data is not None:
+                sheet_data.clear() # Færdige rækker smides væk, så hukommelsen er konstant
+            elif element.tag == hyperlink_tag:
+                rel_id = element.get(f"{{{XLSX_DOC_REL_NS}}}id")
+                if rel_id: hyperlink_ids.append(rel_id)
+
+    if hyperlink_ids:
+        sheet_rels = _xlsx_rels(zip_file, sheet_path)
+        for rel_id in hyperlink_ids:
+            if rel_id not in sheet_rels:
+                raise FastScanUnsupported(f"Hyperlink-relation {rel_id} mangler i {sheet_path}")
+            target = (sheet_rels[rel_id][0] or "").strip()
+            if _is_http_url(target): found.add(target)
+
+
+def scan_xlsx_links_fast(excel_path):
+    """ Finder samme URL'er som openpyxl-scanningen (celletekst og hyperlinks) ved at streame
+    workbookens XML direkte fra zip-filen. Kaster FastScanUnsupported for formater den ikke kender. """
+    found = set()
+    with zipfile.ZipFile(excel_path) as zip_file:
+        workbook_path = "xl/workbook.xml"
+        for rel_target, rel_type in _xlsx_rels(zip_file, "").values():
+            if rel_type.endswith("/officeDocument"):
+                workbook_path = _xlsx_part_path("", rel_target)
+        with zip_file.open(workbook_path) as stream:
+            workbook_root = None
+            for _, element in _xlsx_iterparse(stream): workbook_root = element # Rod-elementet afsluttes sidst
+        if workbook_root is None or workbook_root.tag != f"{{{XLSX_MAIN_NS}}}workbook":
+            raise FastScanUnsupported(f"Ukendt workbook-format: {workbook_root.tag}")
+        workbook_rels = _xlsx_rels(zip_file, workbook_path)
+
+        url_strings = {}
+        for rel_target, rel_type in workbook_rels.values():
+            if rel_type.endswith("/sharedStrings"):
+                url_strings = _xlsx_shared_url_strings(zip_file, _xlsx_part_path(workbook_path, rel_target))
+
+        for sheet in workbook_root.iter(f"{{{XLSX_MAIN_NS}}}sheet"):
+            rel_target, rel_type = workbook_rels.get(sheet.get(f"{{{XLSX_DOC_REL_NS}}}id"), (None, ""))
+            if not rel_type.endswith("/worksheet"):
+                continue # Chartsheets o.l. har ingen celler
+            _xlsx_scan_sheet(zip_file, _xlsx_part_path(workbook_path, rel_target), url_strings, found)
+    return found
+
+
+# ----- STREAMING HTML LINK-UDTRÆK -----
+
+LINK_FILE = "file"
+LINK_PAGE = "page"
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9._:-]+)""", re.IGNORECASE)
+_CONTENT_TYPE_CHARSET_RE = re.compile(r"""charset\s*=\s*["']?([A-Za-z0-9._:-]+)""", re.IGNORECASE)
+
+
+def _classify_link(absolute_url):
+    """ LINK_FILE for fil-lignende http(s) links, LINK_PAGE for øvrige http(s) links, ellers None. """
+    try:
+        parsed_link = urlparse(absolute_url)
+    except ValueError:
+        return None
+    if parsed_link.scheme not in ['http', 'https']: return None
+    path_basename = os.path.basename(parsed_link.path)
+    if path_basename and '.' in path_basename and not absolute_url.lower().split('?')[0].split('#')[0].endswith(WEB_PAGE_EXTENSIONS):
+        return LINK_FILE
+    return LINK_PAGE
+
+
+def _html_charset(content_type, first_chunk):
+    """ Tegnsæt fra Content-Type, ellers fra <meta charset> i starten af dokumentet, ellers UTF-8. """
+    match = _CONTENT_TYPE_CHARSET_RE.search(content_type or '')
+    charset = match.group(1) if match else None
+    if charset is None:
+        match = _META_CHARSET_RE.search(first_chunk[:HTML_CHARSET_SNIFF_BYTES * 4])
+        charset = match.group(1).decode('ascii', 'ignore') if match else 'utf-8'
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return 'utf-8'
+
+
+class _LinkStreamParser(html.parser.HTMLParser):
+    """ Samler href fra <a>, <base> og (med follow_next) <link rel="next"> mens HTML'en fødes i bidder; bygger intet DOM. """
+    def __init__(self, page_url, follow_next=False):
+        super().__init__(convert_charrefs=True)
+        self.base_url = page_url
+        self.follow_next = follow_next
+        self._base_seen = False
+        self.hrefs = [] # Tømmes af iter_html_links efter hver bid
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in ('a', 'link', 'base'): return
+        attributes = dict(attrs)
+        href = attributes.get('href')
+        if href is None: return
+        if tag == 'base':
+            if not self._base_seen: # Kun den første <base> gælder
+                self._base_seen = True
+                try: self.base_url = urljoin(self.base_url, href.strip())
+                except ValueError: pass
+        elif tag == 'a' or (self.follow_next and tag == 'link' and 'next' in (attributes.get('rel') or '').lower().split()):
+            try: self.hrefs.append(urljoin(self.base_url, href.strip()))
+            except ValueError: pass # Ignorer ugyldige hrefs
+
+    handle_startendtag = handle_starttag
+
+
+def iter_html_links(page_url, chunks, content_type=None, follow_next=False):
+    """ Generator over (LINK_FILE/LINK_PAGE, absolut URL) for en HTML-side givet som en iterator af byte-bidder,
+    fx response.iter_content(). Hvert link gives én gang, i dokumentets rækkefølge, så snart dets tag er læst;
+    kun den ufærdige rest af den seneste bid holdes i hukommelsen. <base href> respekteres.
+    follow_next=True medtager også <link rel="next"> (paginering; kun til crawl). """
+    parser = _LinkStreamParser(page_url, follow_next)
+    decoder = None
+    head = b'' # Starten af dokumentet samles til tegnsættet er bestemt (<meta charset> kan ligge i flere bidder)
+    seen = set()
+    chunks = iter(chunks)
+    while True:
+        chunk = next(chunks, None)
+        if decoder is None:
+            if chunk is not None:
+                head += chunk
+                if len(head) < HTML_CHARSET_SNIFF_BYTES: continue
+            decoder = codecs.getincrementaldecoder(_html_charset(content_type, head))(errors='replace')
+            parser.feed(decoder.decode(head))
+            head = b''
+        elif chunk:
+            parser.feed(decoder.decode(chunk))
+        if chunk is None:
+            parser.feed(decoder.decode(b'', final=True))
+            parser.close()
+        hrefs, parser.hrefs = parser.hrefs, []
+        for absolute_url in hrefs:
+            if absolute_url in seen: continue
+            seen.add(absolute_url)
+            kind = _classify_link(absolute_url)
+            if kind is not None: yield kind, absolute_url
+        if chunk is None: return
+
+
+# ----- FEJLKLASSIFIKATION OG GENFORSØG -----
+
+FAILURE_TIMEOUT = "timeout"
+FAILURE_CONNECTION = "connection" # Connection reset/refused, DNS o.l.
+FAILURE_THROTTLED = "throttled" # 429/503: serveren beder os vente
+FAILURE_SERVER = "server" # Øvrige 5xx
+FAILURE_PERMANENT = "permanent" # 404, 403, 410 osv.
+FAILURE_HTML = "html" # HTML i stedet for forventet fil
+FAILURE_OTHER = "other"
+RETRYABLE_FAILURES = (FAILURE_TIMEOUT, FAILURE_CONNECTION, FAILURE_THROTTLED, FAILURE_SERVER)
+OVERLOAD_FAILURES = RETRYABLE_FAILURES # Samme fejl får HostConcurrencyController til at skrue ned
+
+
+def classify_failure(reason):
+    """ Klassificerer en fejl-årsag fra download_file_threaded. Returnerer (kategori, retry_after sekunder eller None). """
+    retry_after_match = re.search(r"\[Retry-After: (\d+)\]", reason)
+    retry_after = int(retry_after_match.group(1)) if retry_after_match else None
+    if reason.startswith("Timeout"): return FAILURE_TIMEOUT, None
+    status_match = re.match(r"Request Fejl: (\d{3}) ", reason)
+    if status_match:
+        status = int(status_match.group(1))
+        if status in (429, 503): return FAILURE_THROTTLED, retry_after
+        if status >= 500: return FAILURE_SERVER, retry_after
+        if status == 408: return FAILURE_TIMEOUT, None
+        return FAILURE_PERMANENT, None
+    if reason.startswith("Request Fejl"): return FAILURE_CONNECTION, None
+    if "Modtog HTML" in reason: return FAILURE_HTML, None
+    if "Ufuldstændig download" in reason: return FAILURE_CONNECTION, None # Afbrudt midt i; .part genoptages
+    return FAILURE_OTHER, None
+
+
+def _retry_after_seconds(value):
+    """ Retry-After header (sekunder eller HTTP-dato) -> hele sekunder, eller None. """
+    if not value: return None
+    value = value.strip()
+    if value.isdigit(): return int(value)
+    import email.utils # Sjældent brugt og ~10 ms at importere; holdes ude af opstarten
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+        return max(0, int(retry_at.timestamp() - time.time()))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def retry_delay(attempt, retry_after=None, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    """ Eksponentiel backoff med fuld jitter for forsøg nr. attempt (1 = første fejl).
+    En Retry-After fra serveren respekteres (op til RETRY_AFTER_MAX). """
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, RETRY_AFTER_MAX))
+    return delay
+
+
+# ----- ADAPTIV SAMTIDIGHED PR. HOST -----
+
+class HostConcurrencyController:
+    """ AIMD-styring af samtidige downloads pr. host under et samlet loft.
+    Som TCP: grænsen for en host fordobles efter en fuld 'runde' af hurtige succeser indtil første
+    tegn på overbelastning, derefter hæves den med 1 pr. runde. Timeout, 429 og 5xx halverer den
+    (højst én halvering pr. cooldown), så langsomme hosts ikke optager alle tråde. """
+    def __init__(self, ceiling, initial_limit=ADAPTIVE_INITIAL_HOST_LIMIT, decrease_cooldown=ADAPTIVE_DECREASE_COOLDOWN):
+        self.ceiling = max(1, ceiling)
+        self.initial_limit = max(1, min(initial_limit, self.ceiling))
+        self.decrease_cooldown = decrease_cooldown
+        self._lock = threading.Lock()
+        self._hosts = {}
+        self.total_in_flight = 0
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = {"limit": self.initial_limit, "in_flight": 0, "successes": 0,
+                                         "latency": None, "last_decrease": 0.0, "slow_start": True}
+        return state
+
+    def try_acquire(self, host):
+        """ Reserverer en plads til host, hvis både host-grænsen og det samlede loft tillader det. """
+        with self._lock:
+            state = self._state(host)
+            if self.total_in_flight >= self.ceiling or state["in_flight"] >= state["limit"]:
+                return False
+            state["in_flight"] += 1
+            self.total_in_flight += 1
+            return True
+
+    def release(self, host, success, reason, elapsed):
+        """ Frigiver pladsen og justerer host-grænsen ud fra udfaldet og svartiden (sekunder). """
+        with self._lock:
+            state = self._state(host)
+            state["in_flight"] -= 1
+            self.total_in_flight -= 1
+            if success:
+                average = state["latency"]
+                state["latency"] = elapsed if average is None else 0.8 * average + 0.2 * elapsed
+                # Hæv kun hvis svartiden ikke er steget markant (tegn på at hosten er ved at blive mættet)
+                if average is None or elapsed <= average * ADAPTIVE_LATENCY_TOLERANCE:
+                    state["successes"] += 1
+                    if state["successes"] >= state["limit"] and state["limit"] < self.ceiling:
+                        state["limit"] = min(self.ceiling, state["limit"] * 2 if state["slow_start"] else state["limit"] + 1)
+                        state["successes"] = 0
+            elif classify_failure(reason)[0] in OVERLOAD_FAILURES:
+                now = time.monotonic()
+                if now - state["last_decrease"] >= self.decrease_cooldown:
+                    state["limit"] = max(1, state["limit"] // 2)
+                    state["last_decrease"] = now
+                    state["slow_start"] = False
+                state["successes"] = 0
+
+    def limits(self):
+        with self._lock:
+            return {host: state["limit"] for host, state in self._hosts.items()}
+
+
+# ----- BÅNDBREDDE-BEGRÆNSNING -----
+
+def parse_rate(text):
+    """ '500K', '2M', '1.5MB/s', '0' -> bytes pr. sekund (1K = 1024). 0 betyder ubegrænset. """
+    match = re.fullmatch(r'\s*(\d+(?:[.,]\d+)?)\s*([kmg]?)i?b?(?:/s)?\s*', str(text), re.IGNORECASE)
+    if not match: raise ValueError(f"ugyldig hastighed: {text!r} (fx 500K, 2M eller 0 for ubegrænset)")
+    multiplier = 1024 ** " kmg".index(match.group(2).lower() or " ")
+    return int(float(match.group(1).replace(',', '.')) * multiplier)
+
+
+def _format_rate(rate):
+    return f"{rate / (1024 * 1024):.2f} MB/s" if rate else "ubegrænset"
+
+
+class TokenBucket:
+    """ Token-bucket for én grænse i bytes/s. Tokens kan gå i minus: den der trækker, venter til gælden er betalt,
+    så den samlede hastighed holdes uanset hvor mange tråde der deler spanden. rate 0 = ubegrænset. """
+    def __init__(self, rate=0):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self._tokens = self._burst()
+        self._updated = time.monotonic()
+
+    def _burst(self):
+        return max(self.rate * BANDWIDTH_BURST_SECONDS, BANDWIDTH_MIN_BURST)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._burst(), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self._tokens = min(self._tokens, self._burst())
+
+    def take(self, size):
+        """ Trækker size bytes og returnerer hvor mange sekunder der skal ventes. """
+        with self._lock:
+            if not self.rate: return 0.0
+            self._refill()
+            self._tokens -= size
+            return max(0.0, -self._tokens / self.rate)
+
+    def debt_seconds(self):
+        """ Resterende ventetid for dem der allerede har trukket (genberegnet med den aktuelle grænse). """
+        with self._lock:
+            if not self.rate: return 0.0
+            self._refill()
+            return max(0.0, -self._tokens / self.rate)
+
+
+class BandwidthLimiter:
+    """ Global grænse plus valgfri grænser pr. host (bytes/s) for alle downloads i en kørsel.
+    Grænserne kan ændres mens kørslen er i gang (set_global_rate / set_host_rate).
+    Tæller også de bytes der er gået igennem, så kørslen kan rapportere opnået hastighed mod grænsen. """
+    def __init__(self, global_rate=0, host_rates=None):
+        self._lock = threading.Lock()
+        self._global = TokenBucket(global_rate)
+        self._hosts = {}
+        self._host_bytes = collections.Counter()
+        self._first_at = None
+        self._last_at = None
+        for host, rate in (host_rates or {}).items(): self.set_host_rate(host, rate)
+
+    @property
+    def global_rate(self):
+        return self._global.rate
+
+    def set_global_rate(self, rate):
+        self._global.set_rate(rate)
+
+    def set_host_rate(self, host, rate):
+        host = host.lower()
+        with self._lock:
+            bucket = self._hosts.get(host)
+            if bucket is None: self._hosts[host] = TokenBucket(rate)
+        if bucket is not None: bucket.set_rate(rate)
+
+    def host_rates(self):
+        with self._lock:
+            return {host: bucket.rate for host, bucket in self._hosts.items()}
+
+    def _take(self, host, size):
+        now = time.monotonic()
+        with self._lock:
+            host_bucket = self._hosts.get(host)
+            self._host_bytes[host] += size
+            if self._first_at is None: self._first_at = now
+            self._last_at = now
+        buckets = (self._global, host_bucket) if host_bucket is not None else (self._global,)
+        return buckets, max(bucket.take(size) for bucket in buckets)
+
+    def consume(self, host, size):
+        """ Kaldes efter hver læst bid; blokerer tråden til bidden er inden for grænserne. """
+        buckets, wait = self._take(host, size)
+        while wait > 0:
+            time.sleep(min(wait, BANDWIDTH_WAIT_SLICE))
+            wait = max(bucket.debt_seconds() for bucket in buckets)
+
+    async def consume_async(self, host, size):
+        """ Som consume, men venter med asyncio.sleep (asyncio-motoren). """
+        buckets, wait = self._take(host, size)
+        while wait > 0:
+            await asyncio.sleep(min(wait, BANDWIDTH_WAIT_SLICE))
+            wait = max(bucket.debt_seconds() for bucket in buckets)
+
+    def throughput(self):
+        """ (gennemsnit bytes/s for hele kørslen, {host: bytes/s}) fra første til sidste bid. """
+        with self._lock:
+            if self._first_at is None: return 0.0, {}
+            elapsed = max(self._last_at - self._first_at, 1e-3)
+            return sum(self._host_bytes.values()) / elapsed, {host: count / elapsed for host, count in self._host_bytes.items()}
+
+
+def _report_bandwidth(limiter, q):
+    """ Opnået hastighed ved siden af de konfigurerede grænser. """
+    if limiter is None: return
+    achieved, by_host = limiter.throughput()
+    if not achieved: return
+    q.put(("summary", f"Båndbredde: {_format_rate(achieved)} i gennemsnit (grænse {_format_rate(limiter.global_rate)})"))
+    for host, rate in sorted(limiter.host_rates().items()):
+        q.put(("summary", f"  {host}: {_format_rate(by_host.get(host, 0.0))} (grænse {_format_rate(rate)})"))
+
+
+# ----- DOWNLOAD-METRIKKER -----
+
+EVENT_PHASES = ("connect_s", "ttfb_s", "transfer_s", "disk_s")
+
+
+def _download_event(run_id, url, source_key, result, timings, attempt, will_retry=False):
+    """ Struktureret hændelse for ét download-forsøg (sendes som ("event", dict) og skrives til JSONL). """
+    success, detail = result
+    event = {
+        "ts": round(time.time(), 3), "run_id": run_id, "url": url, "host": _url_host(url), "source_key": source_key,
+        "attempt": attempt, "http_status": timings.get("http_status"), "bytes": timings.get("bytes", 0),
+        "total_s": round(timings.get("total_s", 0.0), 4),
+    }
+    for phase in EVENT_PHASES:
+        if phase in timings: event[phase] = round(timings[phase], 4)
+    if "segments" in timings: event["segments"] = timings["segments"]
+    if success:
+        event["status"] = "unchanged" if timings.get("http_status") == 304 else "ok"
+        event["filename"] = detail[1]
+    else:
+        event["status"] = "retry" if will_retry else "failed"
+        event["reason"] = detail[1]
+        event["category"] = classify_failure(detail[1])[0]
+    return event
+
+
+def _prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class DownloadMetrics:
+    """ Samler download-hændelser pr. host og for hele kørslen.
+    Hver hændelse skrives som en JSON-linje til events_path; prometheus_text() giver et snapshot
+    i Prometheus' tekstformat, som skrives atomisk til metrics_path (til node_exporters textfile collector). """
+    def __init__(self, events_path=None, metrics_path=None, snapshot_every=METRICS_SNAPSHOT_EVERY):
+        self.run_id = time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}"
+        self.events_path = events_path
+        self.metrics_path = metrics_path
+        self.snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self._events_file = None
+        self._since_snapshot = 0
+        self._hosts = {}
+
+    @classmethod
+    def for_folder(cls, base_folder_path):
+        return cls(os.path.join(base_folder_path, EVENTS_FILENAME), os.path.join(base_folder_path, METRICS_FILENAME))
+
+    def _host_stats(self, host):
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = {
+                "status": collections.Counter(), "bytes": 0, "attempts": 0,
+                "phase_s": dict.fromkeys(EVENT_PHASES, 0.0), "total_s": 0.0,
+                "buckets": [0] * len(METRICS_DURATION_BUCKETS),
+            }
+        return stats
+
+    def record(self, event):
+        with self._lock:
+            stats = self._host_stats(event["host"])
+            stats["status"][event["status"]] += 1
+            stats["attempts"] += 1
+            stats["bytes"] += event.get("bytes") or 0
+            stats["total_s"] += event["total_s"]
+            for phase in EVENT_PHASES:
+                stats["phase_s"][phase] += event.get(phase) or 0.0
+            for i, bound in enumerate(METRICS_DURATION_BUCKETS):
+                if event["total_s"] <= bound: stats["buckets"][i] += 1
+            if self.events_path:
+                try:
+                    if self._events_file is None:
+                        self._events_file = open(self.events_path, 'a', encoding='utf-8')
+                    self._events_file.write(json.dumps(event, ensure_ascii=False) + "\n")
+                except OSError as e:
+                    print(f"      - Advarsel: Kunne ikke skrive hændelser til {self.events_path}: {e}", file=sys.stderr)
+                    self.events_path = None
+            self._since_snapshot += 1
+            snapshot_due = self.metrics_path and self._since_snapshot >= self.snapshot_every
+        if snapshot_due: self.write_snapshot()
+
+    def host_summaries(self):
+        """ host -> dict med antal pr. status, bytes og gennemsnitlige sekunder pr. fase og i alt. """
+        with self._lock:
+            summaries = {}
+            for host, stats in self._hosts.items():
+                attempts = stats["attempts"] or 1
+                summary = {"attempts": stats["attempts"], "bytes": stats["bytes"], "avg_total_s": stats["total_s"] / attempts}
+                summary.update(stats["status"])
+                summary.update({f"avg_{phase}": seconds / attempts for phase, seconds in stats["phase_s"].items()})
+                summaries[host] = summary
+            return summaries
+
+    def run_summary(self):
+        """ Samme tal som host_summaries(), summeret over alle hosts. """
+        with self._lock:
+            status = collections.Counter()
+            attempts = sum(stats["attempts"] for stats in self._hosts.values())
+            summary = {"run_id": self.run_id, "hosts": len(self._hosts), "attempts": attempts,
+                       "bytes": sum(stats["bytes"] for stats in self._hosts.values())}
+            for stats in self._hosts.values(): status.update(stats["status"])
+            summary.update(status)
+            for phase in EVENT_PHASES + ("total_s",):
+                total = sum(stats["phase_s"][phase] if phase != "total_s" else stats["total_s"] for stats in self._hosts.values())
+                summary[f"avg_{phase}"] = total / attempts if attempts else 0.0
+            return summary
+
+    def prometheus_text(self):
+        prefix = "excel_downloader"
+        lines = [
+            f"# HELP {prefix}_downloads_total Download-forsøg pr. host og udfald.", f"# TYPE {prefix}_downloads_total counter",
+        ]
+        with self._lock:
+            hosts = sorted(self._hosts.items())
+            for host, stats in hosts:
+                for status, count in sorted(stats["status"].items()):
+                    lines.append(f'{prefix}_downloads_total{{host="{_prometheus_label(host)}",status="{status}"}} {count}')
+            lines += [f"# HELP {prefix}_bytes_total Modtagne bytes pr. host.", f"# TYPE {prefix}_bytes_total counter"]
+            for host, stats in hosts:
+                lines.append(f'{prefix}_bytes_total{{host="{_prometheus_label(host)}"}} {stats["bytes"]}')
+            lines += [f"# HELP {prefix}_phase_seconds_total Sekunder brugt pr. fase (connect, ttfb, transfer, disk).", f"# TYPE {prefix}_phase_seconds_total counter"]
+            for host, stats in hosts:
+                for phase, seconds in stats["phase_s"].items():
+                    lines.append(f'{prefix}_phase_seconds_total{{host="{_prometheus_label(host)}",phase="{phase[:-2]}"}} {seconds:.6f}')
+            lines += [f"# HELP {prefix}_download_duration_seconds Varighed pr. download-forsøg.", f"# TYPE {prefix}_download_duration_seconds histogram"]
+            for host, stats in hosts:
+                label = f'host="{_prometheus_label(host)}"'
+                for bound, count in zip(METRICS_DURATION_BUCKETS, stats["buckets"]):
+                    lines.append(f'{prefix}_download_duration_seconds_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{prefix}_download_duration_seconds_bucket{{{label},le="+Inf"}} {stats["attempts"]}')
+                lines.append(f'{prefix}_download_duration_seconds_sum{{{label}}} {stats["total_s"]:.6f}')
+                lines.append(f'{prefix}_download_duration_seconds_count{{{label}}} {stats["attempts"]}')
+        lines += [f"# HELP {prefix}_last_event_timestamp_seconds Tidspunkt for snapshottet.", f"# TYPE {prefix}_last_event_timestamp_seconds gauge",
+                  f"{prefix}_last_event_timestamp_seconds {time.time():.3f}"]
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self):
+        """ Skriver prometheus_text() atomisk (tmp-fil + os.replace), så en scraper aldrig ser en halv fil. """
+        if not self.metrics_path: return
+        text = self.prometheus_text()
+        with self._lock: self._since_snapshot = 0
+        tmp_path = f"{self.metrics_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, self.metrics_path)
+        except OSError as e:
+            print(f"      - Advarsel: Kunne ikke gemme metrikker {self.metrics_path}: {e}", file=sys.stderr)
+
+    def close(self):
+        if self._hosts: self.write_snapshot() # Ingen hændelser: lad et tidligere snapshot stå
+        with self._lock:
+            if self._events_file is not None:
+                self._events_file.close()
+                self._events_file = None
+
+
+class ByteProgress:
+    """ Bytes hentet og forventet i en kørsel. Forventet størrelse kommer fra probe_sizes eller fra Content-Length
+    når et svar starter; hastigheden måles over de seneste PROGRESS_RATE_WINDOW sekunder og giver en ETA.
+    Sender ("progress_bytes", dict) på køen højst hvert PROGRESS_BYTES_INTERVAL sekund. """
+    def __init__(self, q, interval=PROGRESS_BYTES_INTERVAL):
+        self.q = q
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._expected = {} # url -> bytes (None = ukendt endnu)
+        self._done = {}
+        self._expected_total = 0
+        self._done_total = 0
+        self._transferred = 0 # Kun stigende (også bytes fra mislykkede forsøg); bruges til hastigheden
+        self._samples = collections.deque() # (tidspunkt, _transferred)
+        self._last_sent = 0.0
+
+    def _set_expected(self, url, size):
+        self._expected_total += (size or 0) - (self._expected.get(url) or 0)
+        self._expected[url] = size
+
+    def expect(self, url, size):
+        """ Registrerer en URL før kørslen; size er None hvis den ikke kendes. """
+        with self._lock:
+            self._set_expected(url, size)
+            self._done.setdefault(url, 0)
+
+    def start(self, url, size, offset=0):
+        """ Et forsøg begynder: size fra Content-Length (None = ukendt), offset ved genoptagelse. """
+        with self._lock:
+            if size is not None or url not in self._expected: self._set_expected(url, size)
+            self._done_total += offset - self._done.get(url, 0)
+            self._done[url] = offset
+
+    def add(self, url, size):
+        with self._lock:
+            self._done[url] = self._done.get(url, 0) + size
+            self._done_total += size
+            self._transferred += size
+        self.send()
+
+    def finish(self, url):
+        """ URL'en er færdig (hentet, uændret eller opgivet): det forventede sættes til det faktisk hentede. """
+        with self._lock:
+            self._set_expected(url, self._done.get(url, 0))
+        self.send()
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, self._transferred))
+            while len(self._samples) > 2 and now - self._samples[0][0] > PROGRESS_RATE_WINDOW:
+                self._samples.popleft()
+            first_at, first_bytes = self._samples[0]
+            rate = (self._transferred - first_bytes) / (now - first_at) if now - first_at > 0 else 0.0
+            remaining = max(0, self._expected_total - self._done_total)
+            return {"done": self._done_total, "expected": self._expected_total,
+                    "unknown": sum(1 for size in self._expected.values() if size is None),
+                    "bytes_per_s": round(rate, 1), "eta_s": round(remaining / rate, 1) if rate > 0 else None}
+
+    def send(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_sent < self.interval: return
+            self._last_sent = now
+        self.q.put(("progress_bytes", self.snapshot()))
+
+
+def probe_sizes(urls, timeout, session=None, max_workers=DEFAULT_MAX_CONCURRENT_DOWNLOADS, known_sizes=None):
+    """ Let probe før en kørsel: HEAD-request pr. URL i max_workers tråde. Returnerer {url: bytes eller None}.
+    known_sizes (fx fra manifesterne) bruges direkte uden request. Servere der afviser HEAD giver None. """
+    known_sizes = known_sizes or {}
+    def probe(url):
+        if known_sizes.get(url) is not None: return known_sizes[url]
+        try:
+            if session is not None:
+                response = session.head(url, timeout=timeout, allow_redirects=True)
+            else:
+                response = requests.head(url, timeout=timeout, allow_redirects=True, headers=DEFAULT_REQUEST_HEADERS)
+            response.close()
+        except requests.exceptions.RequestException:
+            return None
+        content_length = response.headers.get('content-length', '')
+        if response.status_code != 200 or not content_length.isdigit(): return None
+        if response.headers.get('content-encoding', 'identity').lower() != 'identity': return None
+        return int(content_length)
+    urls = list(urls)
+    if not urls: return {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as executor:
+        return dict(zip(urls, executor.map(probe, urls)))
+
+
+def schedule_order(items, sizes, order):
+    """ Sorterer [(url, job), ...] efter probede størrelser: SCHEDULE_LARGEST_FIRST eller SCHEDULE_SMALLEST_FIRST.
+    Ukendte størrelser kommer til sidst i input-rækkefølge; SCHEDULE_INPUT ændrer intet. """
+    if order == SCHEDULE_INPUT: return list(items)
+    known = [item for item in items if sizes.get(item[0]) is not None]
+    unknown = [item for item in items if sizes.get(item[0]) is None]
+    known.sort(key=lambda item: sizes[item[0]], reverse=(order == SCHEDULE_LARGEST_FIRST))
+    return known + unknown
+
+
+def _format_eta(seconds):
+    if seconds is None: return "?"
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}" if seconds >= 3600 else f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def _report_metrics(metrics, q):
+    """ Logger tider pr. fase for kørslen og de langsomste hosts. """
+    summary = metrics.run_summary()
+    if not summary["attempts"]: return
+    q.put(("summary", "Gns. pr. forsøg: connect {:.0f} ms, TTFB {:.0f} ms, overførsel {:.0f} ms, disk {:.0f} ms (i alt {:.0f} ms)".format(
+        *(summary[f"avg_{phase}"] * 1000 for phase in EVENT_PHASES + ("total_s",)))))
+    slowest = sorted(metrics.host_summaries().items(), key=lambda item: -item[1]["avg_total_s"] * item[1]["attempts"])[:5]
+    for host, host_summary in slowest:
+        q.put(("log", f"  {host or '?'}: {host_summary['attempts']} forsøg, {host_summary['bytes'] / 1e6:.1f} MB, "
+                      f"connect {host_summary['avg_connect_s'] * 1000:.0f} ms, TTFB {host_summary['avg_ttfb_s'] * 1000:.0f} ms, "
+                      f"overførsel {host_summary['avg_transfer_s'] * 1000:.0f} ms, disk {host_summary['avg_disk_s'] * 1000:.0f} ms"))
+
+
+def _timed_download(*args, **kwargs):
+    """ Kører download_file_threaded og returnerer (resultat, timings); timings['total_s'] er hele forsøgets varighed. """
+    timings = {}
+    started = time.monotonic()
+    result = download_file_threaded(*args, timings=timings, **kwargs)
+    timings['total_s'] = time.monotonic() - started
+    return result, timings
+
+
+# ----- KERNE LOGIK -----
+
+def _excel_source_key(excel_path):
+    """ source_key: Mappenavn baseret på Excel-filens navn """
+    base_filename = os.path.basename(excel_path)
+    return sanitize_filename(f"Excel_{os.path.splitext(base_filename)[0]}", is_folder=True)
+
+
+def _read_excel_links(excel_path, q, add_link, fast_scan=False):
+    """ Scanner én workbook og kalder add_link(url) for hver URL. Fejl rapporteres på q; returnerer True ved succes.
+    Med fast_scan prøves scan_xlsx_links_fast først; openpyxl bruges hvis den giver op. """
+    base_filename = os.path.basename(excel_path)
+    if fast_scan:
+        try:
+            for url in scan_xlsx_links_fast(excel_path):
+                add_link(url)
+            return True
+        except UnsafeWorkbook as e:
+            q.put(("error", f"FEJL: Springer '{base_filename}' over: {e}"))
+            return False
+        except Exception as e:
+            # Alt den hurtige scanner ikke kan (ukendt format, korrupt zip osv.) håndteres af openpyxl nedenfor
+            if not isinstance(e, (FastScanUnsupported, zipfile.BadZipFile, FileNotFoundError)):
+                q.put(("log", f"  - Hurtig scanning fejlede for {base_filename} ({e}); bruger openpyxl."))
+    try:
+        workbook = openpyxl.load_workbook(excel_path, data_only=True)
+        for sheet_name in workbook.sheetnames:
+            sheet = workbook[sheet_name]
+            # q.put(("log", f"  - Scanner ark: '{sheet_name}'")) # Undlad for mindre støj
+            for row in sheet.iter_rows():
+                for cell in row:
+                    # Tjek Hyperlink
+                    if cell.hyperlink and cell.hyperlink.target:
+                        url_hl = cell.hyperlink.target
+                        if isinstance(url_hl, str):
+                            url_hl_cleaned = url_hl.strip()
+                            if url_hl_cleaned.lower().startswith(('http://', 'https://')):
+                                add_link(url_hl_cleaned)
+                    # Tjek Celleværdi
+                    if cell.value and isinstance(cell.value, str):
+                         url_val = cell.value.strip()
+                         if url_val.lower().startswith(('http://', 'https://')):
+                              add_link(url_val)
+        return True
+    except FileNotFoundError:
+         q.put(("error", f"FEJL: Filen blev ikke fundet: {base_filename}"))
+    except Exception as e:
+        q.put(("error", f"FEJL: Kunne ikke læse Excel '{base_filename}'. Fejl: {e}"))
+        q.put(("error_detail", traceback.format_exc()))
+    return False
+
+
+def _report_excel_links(links_by_source_file, source_key, links_in_this_file, base_filename, q):
+    if links_in_this_file:
+         q.put(("log", f"  - Fundet {len(links_in_this_file)} unikke links i: {base_filename}"))
+         links_by_source_file[source_key] = links_in_this_file
+    else:
+         q.put(("log", f"  - Ingen links fundet i: {base_filename}"))
+
+
+def extract_links_from_files(excel_files_list, q, on_link=None, fast_scan=False):
+    """ Læser hyperlinks OG tekst-URL'er fra Excel-filer. Returnerer dict {source_key: set(urls)}.
+    Hvis on_link gives, kaldes on_link(source_key, url) straks for hvert nyt link (bruges af pipelinen).
+    fast_scan=True læser sheet-XML direkte (scan_xlsx_links_fast) med openpyxl som fallback. """
+    links_by_source_file = {}
+    total_files = len(excel_files_list)
+    if total_files > 0: q.put(("log", f"Starter link-ekstraktion fra {total_files} Excel fil(er)..."))
+
+    for i, excel_path in enumerate(excel_files_list):
+        base_filename = os.path.basename(excel_path)
+        source_key = _excel_source_key(excel_path)
+
+        q.put(("log", f"Læser Excel fil {i+1}/{total_files}: {base_filename} (Mappe: {source_key})"))
+        links_in_this_file = set()
+        def add_link(url):
+            if url not in links_in_this_file:
+                links_in_this_file.add(url)
+                if on_link: on_link(source_key, url)
+        if _read_excel_links(excel_path, q, add_link, fast_scan):
+            _report_excel_links(links_by_source_file, source_key, links_in_this_file, base_filename, q)
+
+    return links_by_source_file
+
+
+class _MessageList(list):
+    """ Kø-erstatning i underprocesser: samler beskeder, så de kan sendes tilbage til GUI-køen. """
+    def put(self, item): self.append(item)
+
+
+def _extract_links_worker(excel_path, fast_scan=False):
+    """ Kører i en underproces: scanner én workbook og returnerer (succes, links, beskeder). """
+    messages = _MessageList()
+    links_in_this_file = set()
+    success = _read_excel_links(excel_path, messages, links_in_this_file.add, fast_scan)
+    return success, links_in_this_file, list(messages)
+
+
+def extract_links_from_files_parallel(excel_files_list, q, on_link=None, max_processes=None, fast_scan=False):
+    """ Som extract_links_from_files, men workbooks fordeles på en ProcessPoolExecutor (én fil pr. opgave).
+    Returnerer samme {source_key: set(urls)}; log/fejl-beskeder fra hver fil videresendes til q. """
+    total_files = len(excel_files_list)
+    processes = min(max_processes or os.cpu_count() or 1, total_files)
+    if processes <= 1:
+        return extract_links_from_files(excel_files_list, q, on_link, fast_scan)
+
+    q.put(("log", f"Starter parallel link-ekstraktion fra {total_files} Excel fil(er) ({processes} processer)..."))
+    results_by_index = {}
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as pool:
+            future_to_index = {pool.submit(_extract_links_worker, excel_path, fast_scan): i for i, excel_path in enumerate(excel_files_list)}
+            for done_count, future in enumerate(concurrent.futures.as_completed(future_to_index), 1):
+                i = future_to_index[future]
+                excel_path = excel_files_list[i]
+                base_filename = os.path.basename(excel_path)
+                source_key = _excel_source_key(excel_path)
+                q.put(("log", f"Læst Excel fil {done_count}/{total_files}: {base_filename} (Mappe: {source_key})"))
+                try:
+                    success, links_in_this_file, messages = future.result()
+                except Exception as e:
+                    q.put(("error", f"FEJL: Kunne ikke læse Excel '{base_filename}' i underproces. Fejl: {e}"))
+                    continue
+                for message in messages: q.put(message)
+                if not success: continue
+                if on_link:
+                    for url in links_in_this_file: on_link(source_key, url)
+                results_by_index[i] = (source_key, links_in_this_file, base_filename)
+    except (OSError, NotImplementedError, concurrent.futures.BrokenExecutor) as e:
+        # Fx. miljøer uden multiprocessing; de resterende filer læses sekventielt
+        q.put(("log", f"Parallel ekstraktion ikke mulig ({e}); fortsætter sekventielt."))
+        links_by_source_file = {}
+        for i in sorted(results_by_index):
+            source_key, links_in_this_file, base_filename = results_by_index[i]
+            if links_in_this_file: links_by_source_file[source_key] = links_in_this_file
+        remaining = [path for i, path in enumerate(excel_files_list) if i not in results_by_index]
+        links_by_source_file.update(extract_links_from_files(remaining, q, on_link, fast_scan))
+        return links_by_source_file
+
+    # Saml i input-rækkefølge, så samme source_key giver samme resultat som den sekventielle udgave
+    links_by_source_file = {}
+    for i in sorted(results_by_index):
+        source_key, links_in_this_file, base_filename = results_by_index[i]
+        _report_excel_links(links_by_source_file, source_key, links_in_this_file, base_filename, q)
+    return links_by_source_file
+
+
+def _page_links(page_url, soup, follow_next=False):
+    """ Deler links på en HTML-side i (fil-lignende links, links til andre sider), begge i sideorden uden dubletter.
+    Samme regler som iter_html_links: første <base href> gælder, og <link rel="next"> kun med follow_next. """
+    file_links, page_links = [], []
+    seen = set()
+    base_tag = soup.find('base', href=True)
+    if base_tag is not None:
+        try: page_url = urljoin(page_url, base_tag['href'].strip())
+        except ValueError: pass
+    hrefs = [tag['href'] for tag in soup.find_all('a', href=True)]
+    if follow_next:
+        hrefs += [tag['href'] for tag in soup.find_all('link', href=True, rel='next')] # Paginering i <head>
+    for href in hrefs:
+        try:
+            absolute_url = urljoin(page_url, href.strip())
+        except ValueError:
+            continue # Ignorer ugyldige hrefs
+        if absolute_url in seen: continue
+        seen.add(absolute_url)
+        kind = _classify_link(absolute_url)
+        if kind == LINK_FILE: file_links.append(absolute_url)
+        elif kind == LINK_PAGE: page_links.append(absolute_url)
+    return file_links, page_links
+
+
+def extract_links_from_website(website_url, q, timeout_seconds, session=None, on_link=None, streaming=True):
+    """ Henter HTML fra URL, finder fil-lignende links. Returnerer et sæt af URLs.
+    Hvis on_link gives, kaldes on_link(url) straks for hvert nyt link.
+    streaming=True parser siden med iter_html_links mens den hentes (intet DOM, respekterer <base href>);
+    streaming=False bruger BeautifulSoup på hele siden. """
+    found_links = set()
+    response = None
+    q.put(("log", f"Scanner hjemmeside: {website_url}"))
+    try:
+        if session is not None:
+            response = session.get(website_url, timeout=timeout_seconds, stream=streaming)
+        else:
+            response = requests.get(website_url, timeout=timeout_seconds, headers=DEFAULT_REQUEST_HEADERS, stream=streaming) # Bruger timeout
+        response.raise_for_status()
+
+        content_type = response.headers.get('content-type', '').lower()
+        if 'html' not in content_type:
+            q.put(("error", f"FEJL: URL '{website_url}' returnerede ikke HTML (Content-Type: {content_type}). Kan ikke scanne."))
+            return found_links
+
+        if streaming:
+            links = iter_html_links(response.url or website_url, response.iter_content(HTML_STREAM_CHUNK_SIZE), content_type)
+            file_links = (absolute_url for kind, absolute_url in links if kind == LINK_FILE)
+        else:
+            file_links, _ = _page_links(website_url, bs4.BeautifulSoup(response.text, 'html.parser'))
+        links_found_on_page = 0
+        for absolute_url in file_links:
+            found_links.add(absolute_url)
+            links_found_on_page += 1
+            if on_link: on_link(absolute_url)
+
+        q.put(("log", f"  - Fundet {links_found_on_page} nye download-lignende links på: {website_url}"))
+
+    except requests.exceptions.Timeout:
+        q.put(("error", f"FEJL: Timeout ved hentning af hjemmeside {website_url} ({timeout_seconds}s)"))
+    except requests.exceptions.RequestException as e:
+        q.put(("error", f"FEJL: Kunne ikke hente hjemmeside {website_url}. Fejl: {e}"))
+    except Exception as e:
+        q.put(("error", f"FEJL: Kunne ikke parse hjemmeside {website_url}. Fejl: {e}"))
+        q.put(("error_detail", traceback.format_exc()))
+    finally:
+        if response is not None: response.close()
+
+    return found_links
+
+
+class _CrawlScope:
+    """ Afgør om en side hører til crawlet: samme host, og med CRAWL_SCOPE_PATH også under start-URL'ens mappe. """
+    def __init__(self, start_url, scope):
+        parsed = urlparse(start_url)
+        self.host = (parsed.hostname or '').lower()
+        path = parsed.path or '/'
+        self.path_prefix = path if path.endswith('/') else posixpath.dirname(path).rstrip('/') + '/'
+        self.scope = scope
+
+    def contains(self, url):
+        try: parsed = urlparse(url)
+        except ValueError: return False
+        if (parsed.hostname or '').lower() != self.host: return False
+        return self.scope != CRAWL_SCOPE_PATH or (parsed.path or '/').startswith(self.path_prefix)
+
+
+class _RobotsCache:
+    """ robots.txt pr. scheme+host, hentet én gang via samme session som crawlet (fra en worker-tråd, aldrig fra
+    planlæggeren). Kan robots.txt ikke hentes (eller giver 404) må alt crawles; 401/403 betyder ingen adgang. """
+    def __init__(self, session, timeout_seconds):
+        self.session = session
+        self.timeout_seconds = timeout_seconds
+        self.user_agent = DEFAULT_REQUEST_HEADERS['User-Agent']
+        self._lock = threading.Lock()
+        self._parsers = {}
+        self._fetch_locks = {} # origin -> lås, så to tråde ikke henter samme robots.txt
+
+    @staticmethod
+    def _origin(url):
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def _parser(self, url):
+        import urllib.robotparser
+        origin = self._origin(url)
+        with self._lock:
+            if origin in self._parsers: return self._parsers[origin]
+            fetch_lock = self._fetch_locks.setdefault(origin, threading.Lock())
+        with fetch_lock:
+            with self._lock:
+                if origin in self._parsers: return self._parsers[origin]
+            parser = urllib.robotparser.RobotFileParser(origin + "/robots.txt")
+            try:
+                response = self.session.get(origin + "/robots.txt", timeout=self.timeout_seconds)
+                if response.status_code in (401, 403): parser.disallow_all = True
+                elif response.status_code >= 400: parser.allow_all = True
+                else: parser.parse(response.text.splitlines())
+            except requests.exceptions.RequestException:
+                parser.allow_all = True
+            with self._lock:
+                self._parsers[origin] = parser
+        return parser
+
+    def allowed(self, url):
+        """ Henter robots.txt første gang hostens sider ses; kaldes derfor kun fra worker-tråde. """
+        return self._parser(url).can_fetch(self.user_agent, url)
+
+    def known_crawl_delay(self, url):
+        """ Crawl-delay fra en allerede hentet robots.txt (0.0 hvis ingen), eller None hvis den ikke er hentet endnu. """
+        with self._lock:
+            parser = self._parsers.get(self._origin(url))
+        return None if parser is None else parser.crawl_delay(self.user_agent) or 0.0
+
+
+def _fetch_crawl_page(url, session, timeout_seconds, robots):
+    """ Henter og parser én side (kører i en worker-tråd). Returnerer (fil-links, side-links, fejl eller None). """
+    if robots is not None and not robots.allowed(url):
+        return [], [], "blokeret af robots.txt"
+    response = None
+    try:
+        response = session.get(url, timeout=timeout_seconds, stream=True)
+        response.raise_for_status()
+        content_type = response.headers.get('content-type', '').lower()
+        if 'html' not in content_type:
+            return [], [], f"ikke HTML ({content_type})"
+        file_links, page_links = [], []
+        for kind, absolute_url in iter_html_links(response.url or url, response.iter_content(HTML_STREAM_CHUNK_SIZE), content_type, follow_next=True):
+            (file_links if kind == LINK_FILE else page_links).append(absolute_url)
+        return file_links, page_links, None
+    except requests.exceptions.Timeout:
+        return [], [], f"Timeout ({timeout_seconds}s)"
+    except requests.exceptions.RequestException as e:
+        return [], [], f"Request Fejl: {e}"
+    finally:
+        if response is not None: response.close()
+
+
+def crawl_websites(start_urls, q, timeout_seconds, session=None, on_link=None, max_depth=DEFAULT_CRAWL_DEPTH, max_pages=DEFAULT_CRAWL_MAX_PAGES,
+                   scope=CRAWL_SCOPE_PATH, max_workers=DEFAULT_CRAWL_WORKERS, respect_robots=True, host_delay=CRAWL_HOST_DELAY):
+    """ Crawler fra start_urls og samler fil-lignende links som extract_links_from_website. Returnerer et sæt af URLs.
+    Sider følges op til max_depth klik væk og højst max_pages sider pr. start-URL, kun inden for scope
+    (CRAWL_SCOPE_HOST eller CRAWL_SCOPE_PATH). Siderne hentes samtidigt af max_workers tråde, dog højst
+    CRAWL_MAX_PER_HOST ad gangen og med mindst host_delay (eller robots.txt's Crawl-delay) mellem requests til samme host.
+    robots.txt hentes af worker-tråden med hostens første side; indtil den kendes sendes kun én side ad gangen til hosten.
+    Fil-links tages med uanset host; on_link(url) kaldes fra den kaldende tråd for hvert nyt link. """
+    owns_session = session is None
+    if owns_session:
+        session = DownloadSession(max_workers=max_workers)
+    robots = _RobotsCache(session, timeout_seconds) if respect_robots else None
+    scopes = [_CrawlScope(url, scope) for url in start_urls]
+    found_links = set()
+    visited = set() # Kanoniske side-URL'er der er sat i kø
+    pages_by_root = collections.Counter()
+    pending = collections.deque() # (url, dybde, indeks i start_urls)
+    running = {} # future -> (url, dybde, rod, starttidspunkt)
+    in_flight_by_host = collections.Counter()
+    next_request_at = {} # host -> tidligste tidspunkt for næste request
+    skipped = collections.Counter()
+
+    def enqueue(url, depth, root):
+        key = canonicalize_url(url)
+        if key in visited: return
+        if pages_by_root[root] >= max_pages:
+            skipped["sidegrænse"] += 1
+            return
+        visited.add(key)
+        pages_by_root[root] += 1
+        pending.append((url, depth, root))
+
+    q.put(("log", f"Crawler {len(start_urls)} hjemmeside(r) (dybde {max_depth}, max {max_pages} sider pr. start-URL, {max_workers} tråde)..."))
+    for root, start_url in enumerate(start_urls):
+        enqueue(start_url, 0, root)
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending or running:
+                now = time.monotonic()
+                wait_until = None
+                deferred = collections.deque()
+                while pending and len(running) < max_workers:
+                    url, depth, root = pending.popleft()
+                    host = _url_host(url)
+                    ready_at = next_request_at.get(host, 0.0)
+                    # Kun fra cachen: en ukendt robots.txt hentes af workeren, og hosten får da kun én side ad gangen
+                    robots_delay = robots.known_crawl_delay(url) if robots is not None else 0.0
+                    host_limit = CRAWL_MAX_PER_HOST if robots_delay is not None else 1
+                    if in_flight_by_host[host] >= host_limit or ready_at > now:
+                        deferred.append((url, depth, root))
+                        if ready_at > now: wait_until = ready_at if wait_until is None else min(wait_until, ready_at)
+                        continue
+                    next_request_at[host] = now + max(host_delay, robots_delay or 0.0)
+                    in_flight_by_host[host] += 1
+                    running[executor.submit(_fetch_crawl_page, url, session, timeout_seconds, robots)] = (url, depth, root, now)
+                pending.extendleft(reversed(deferred)) # Bevar rækkefølgen (bredde først)
+                if not running:
+                    if wait_until is not None: time.sleep(max(0.0, wait_until - time.monotonic()))
+                    continue
+                timeout = max(0.0, wait_until - time.monotonic()) if wait_until is not None else None
+                done, _ = concurrent.futures.wait(running, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    url, depth, root, started = running.pop(future)
+                    host = _url_host(url)
+                    in_flight_by_host[host] -= 1
+                    robots_delay = robots.known_crawl_delay(url) if robots is not None else None
+                    if robots_delay and robots_delay > host_delay:
+                        # robots.txt er hentet nu: Crawl-delay gælder også fra den side der hentede den
+                        next_request_at[host] = max(next_request_at.get(host, 0.0), started + robots_delay)
+                    try:
+                        file_links, page_links, error = future.result()
+                    except Exception as exc:
+                        file_links, page_links, error = [], [], f"Anden Fejl: {exc}"
+                    if error:
+                        # Start-siden rapporteres som fejl ligesom i extract_links_from_website; undersider kun i loggen
+                        q.put(("error" if depth == 0 else "log", f"{'FEJL: ' if depth == 0 else '  - '}Kunne ikke crawle {url}: {error}"))
+                        continue
+                    new_files = 0
+                    for file_url in file_links:
+                        if file_url in found_links: continue
+                        found_links.add(file_url)
+                        new_files += 1
+                        if on_link: on_link(file_url)
+                    if depth < max_depth:
+                        for page_url in page_links:
+                            if scopes[root].contains(page_url): enqueue(page_url, depth + 1, root)
+                    q.put(("log", f"  - [dybde {depth}] {url}: {new_files} nye download-lignende links"))
+    finally:
+        if owns_session: session.close()
+
+    q.put(("log", f"Crawl færdig: {sum(pages_by_root.values())} sider, {len(found_links)} download-lignende links."))
+    if skipped["sidegrænse"]:
+        q.put(("log", f"  - {skipped['sidegrænse']} sider sprunget over pga. sidegrænsen ({max_pages} pr. start-URL)."))
+    return found_links
+
+
+def _links_dict_from_input(links_to_process, is_retry):
+    """ Normaliserer download-input til ({source_key: set(urls)}, antal links). """
+    links_dict = {}
+    if is_retry:  # Input er [(url, reason, source_key), ...]
+        for url, reason, source_key in links_to_process:
+            links_dict.setdefault(source_key, set()).add(url)
+        total_links = len(links_to_process)
+    else:
+        links_dict = links_to_process
+        total_links = sum(len(urls) for urls in links_dict.values())
+    return links_dict, total_links
+
+
+def _report_dedup(content_index, q):
+    """ Sender dedup-statistik som log og som linje til resultat-opsummeringen. """
+    if content_index is None or not content_index.linked_count: return
+    saved_text = f"{content_index.linked_count} dubletter hardlinket, {content_index.bytes_saved / (1024 * 1024):.1f} MB diskplads sparet"
+    q.put(("log", f"Dedup: {saved_text}"))
+    q.put(("summary", f"Dedup: {saved_text}"))
+
+
+def run_download_task(links_to_process, base_download_folder_path, q, max_workers, timeout_seconds, is_retry=False, session=None, adaptive=True, max_attempts=DEFAULT_MAX_ATTEMPTS, metrics=None, limiter=None,
+                      order=SCHEDULE_INPUT, archive_format=None, link_queue=None, engine=DOWNLOAD_ENGINE_THREADS):
+    """ Udfører download for links, organiseret i undermapper.
+    Alle tråde deler én DownloadSession; gives ingen med, oprettes (og lukkes) en her.
+    URL'er normaliseres på tværs af kilder: hver ressource hentes én gang og fordeles til alle
+    source_key mapper der linker til den; resultaterne rapporteres stadig pr. kilde.
+    adaptive=True lader HostConcurrencyController styre samtidigheden pr. host, med max_workers som samlet loft.
+    Forbigående fejl (timeout, forbindelse, 429/5xx) forsøges igen op til max_attempts gange med eksponentiel
+    backoff; ventetiden holdes her i planlægningsløkken, så ingen tråd sover imens.
+    Hvert forsøg sendes som en ("event", dict) besked og samles i metrics (DownloadMetrics); gives ingen med,
+    skrives hændelser og Prometheus-snapshot til EVENTS_FILENAME og METRICS_FILENAME i hoved-mappen.
+    limiter (BandwidthLimiter) bruges når sessionen oprettes her; ellers gælder sessionens egen.
+    order = SCHEDULE_LARGEST_FIRST/SCHEDULE_SMALLEST_FIRST prober først størrelserne (probe_sizes) og starter
+    downloads i den rækkefølge. Bytes hentet/forventet og ETA sendes som ("progress_bytes", dict) beskeder.
+    archive_format = ARCHIVE_ZIP/ARCHIVE_TAR skriver hver source_key til ét arkiv (ArchiveWriter) i hoved-mappen i stedet
+    for en undermappe; manifest og dedup-hardlinks bruges da ikke.
+    Resultaterne skrives løbende til en RunJournal; ("results", ...) indeholder JournalView'er der læser dem fra disken.
+    Links tages ind efterhånden i et vindue: højst max_workers * SUBMIT_WINDOW_FACTOR unikke downloads er kørende, venter
+    på plads hos en host eller venter på genforsøg ad gangen. Mapper og manifester oprettes første gang en kilde ses.
+    link_queue (pipeline-mode) erstatter links_to_process: (source_key, url) læses fra køen efterhånden som de findes,
+    indtil _PIPELINE_DONE; progress maksimum vokser med antallet af fundne links. order skal da være SCHEDULE_INPUT.
+    engine = DOWNLOAD_ENGINE_ASYNCIO henter med download_file_async på ét event loop (_AsyncioExecutor) i stedet for
+    max_workers tråde; planlægning, manifest, dedup, fan-out, genforsøg, progress og hændelser er de samme.
+    Arkiv-output kræver tråd-motoren, som da bruges. """
+    task_name = "Genforsøg" if is_retry else "Download"
+    owns_session = session is None
+    if owns_session:
+        session = DownloadSession(max_workers=max_workers, limiter=limiter)
+    owns_metrics = metrics is None
+    if owns_metrics:
+        metrics = DownloadMetrics.for_folder(base_download_folder_path)
+    future_to_info = {}
+    manifests = []
+    archives = {} # source_key -> ArchiveWriter ved arkiv-output
+    content_index = None
+    journal = None
+    processed_count = 0
+    total_links = 0
+    try:
+        links_dict = {}
+        if archive_format and engine != DOWNLOAD_ENGINE_THREADS:
+            q.put(("log", "Arkiv-output understøttes kun af tråd-motoren; bruger den."))
+            engine = DOWNLOAD_ENGINE_THREADS
+        if engine == DOWNLOAD_ENGINE_ASYNCIO and importlib.util.find_spec("aiohttp") is None:
+            raise RuntimeError("asyncio-motoren kræver pakken 'aiohttp' (pip install aiohttp)")
+        if link_queue is None:
+            links_dict, total_links = _links_dict_from_input(links_to_process, is_retry)
+
+            if total_links == 0:
+                q.put(("log", f"{task_name} afsluttet (ingen links at behandle)."))
+                q.put(("results", (0, 0, [], [], is_retry)))
+                q.put(("enable_buttons", True))
+                return
+
+            q.put(("progress_max", total_links))
+            q.put(("progress", 0))
+            q.put(("log", f"Starter {total_links} {task_name.lower()}(s){' med asyncio' if engine == DOWNLOAD_ENGINE_ASYNCIO else ''} (max {max_workers} ad gangen)..."))
+        else:
+            q.put(("progress_max", 1))
+            q.put(("log", f"Starter pipeline: downloads begynder mens links findes (max {max_workers} ad gangen)..."))
+        os.makedirs(base_download_folder_path, exist_ok=True)
+        journal = RunJournal(base_download_folder_path)
+        content_index = ContentIndex(base_download_folder_path) if not archive_format else None
+
+        folders = {} # source_key -> (undermappe, manifest), eller fejlteksten hvis mappen/arkivet ikke kunne oprettes
+        def folder_for(source_key):
+            if source_key in folders: return folders[source_key]
+            if archive_format:
+                archive_path = os.path.join(base_download_folder_path, f"{source_key}.{archive_format}")
+                try:
+                    archives[source_key] = ArchiveWriter(archive_path, archive_format)
+                    folders[source_key] = (base_download_folder_path, None)
+                except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+                    q.put(("error", f"Kunne ikke åbne arkivet {archive_path}: {e}. Springer links fra {source_key} over."))
+                    folders[source_key] = f"Arkiv-fejl: {e}"
+                return folders[source_key]
+            subfolder_path = os.path.join(base_download_folder_path, source_key)
+            try:
+                os.makedirs(subfolder_path, exist_ok=True)
+            except OSError as e:
+                q.put(("error", f"Kunne ikke oprette mappe {subfolder_path}: {e}. Springer links fra {source_key} over."))
+                folders[source_key] = f"Mappe-oprettelsesfejl: {e}"
+                return folders[source_key]
+            manifest = DownloadManifest(subfolder_path)
+            manifest.names() # Mappens filnavne læses én gang her, før trådene begynder at gemme
+            manifests.append(manifest)
+            folders[source_key] = (subfolder_path, manifest)
+            return folders[source_key]
+
+        links = ((source_key, url) for source_key, urls in links_dict.items() for url in urls)
+        sizes = {}
+        if order != SCHEDULE_INPUT:
+            # Rækkefølgen kræver hele listen: URL'erne grupperes og sorteres, før de tages ind i vinduet
+            ordered_jobs = [(refs[0][1], refs) for refs in build_url_index(links_dict).values()] # (URL der hentes, refs)
+            # Kendte filer fra manifesterne koster ingen request; resten probes med HEAD
+            known_sizes = {}
+            for url, refs in ordered_jobs:
+                folder = folder_for(refs[0][0])
+                entry = folder[1].get(url) if not isinstance(folder, str) and folder[1] is not None else None
+                if entry: known_sizes[url] = entry.get('size')
+            probe_started = time.monotonic()
+            sizes = probe_sizes([url for url, _ in ordered_jobs], timeout_seconds, session, max_workers, known_sizes)
+            known_count = sum(1 for size in sizes.values() if size is not None)
+            q.put(("log", f"Størrelser probet på {time.monotonic() - probe_started:.1f}s: {known_count} af {len(ordered_jobs)} kendt "
+                          f"({sum(size for size in sizes.values() if size) / (1024 * 1024):.1f} MB); starter {'største' if order == SCHEDULE_LARGEST_FIRST else 'mindste'} først."))
+            links = (ref for _, refs in schedule_order(ordered_jobs, sizes, order) for ref in refs)
+        byte_progress = ByteProgress(q)
+
+        # Med adaptiv samtidighed venter downloads i køer pr. host til HostConcurrencyController giver plads;
+        # ellers sendes de direkte til executoren. Vinduet (active_count) begrænser i begge tilfælde hvor mange der er taget ind.
+        controller = HostConcurrencyController(max_workers) if adaptive else None
+        jobs = {} # kanonisk URL -> {"primary": (source_key, url), "waiting": [refs] eller None når færdig, "result": ...}
+        pending_by_host = {}
+        submit_window = max_workers * SUBMIT_WINDOW_FACTOR
+        active_count = 0 # Unikke downloads taget ind men ikke afsluttet
+        shared_count = 0 # Links der fik en anden kildes download (samme kanoniske URL)
+        request_error_count = 0
+        running = set()
+        delayed = [] # Heap af (klar_tidspunkt, løbenummer, kanonisk URL, forsøg) for genforsøg der venter på backoff
+        retry_counter = collections.Counter() # Kategori -> antal genforsøg
+        retry_sequence = itertools.count() # Bryder uafgjort i heapen
+        recovered_count = 0
+        if engine == DOWNLOAD_ENGINE_ASYNCIO:
+            download_executor = _AsyncioExecutor(max_workers, timeout_seconds)
+        else:
+            download_executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        with download_executor as executor:
+            def submit(canonical_url, attempt=1):
+                source_key, url = jobs[canonical_url]["primary"] # Første kilde henter; de øvrige får filen bagefter
+                subfolder_path, manifest = folders[source_key]
+                if engine == DOWNLOAD_ENGINE_ASYNCIO:
+                    future = executor.submit(_timed_download_async, url, subfolder_path, q, timeout_seconds, source_key, executor.http_session, manifest, content_index,
+                                             progress=byte_progress, limiter=session.limiter)
+                else:
+                    future = executor.submit(_timed_download, url, subfolder_path, q, timeout_seconds, source_key, session, manifest, content_index, progress=byte_progress,
+                                             archive=archives.get(source_key))
+                future_to_info[future] = (canonical_url, attempt)
+                running.add(future)
+
+            def enqueue(canonical_url, attempt=1):
+                if controller is None:
+                    submit(canonical_url, attempt)
+                else:
+                    url = jobs[canonical_url]["primary"][1]
+                    pending_by_host.setdefault(_url_host(url), collections.deque()).append((canonical_url, attempt))
+
+            def record(success, detail):
+                nonlocal processed_count, request_error_count
+                journal.record((success, detail))
+                if not success and "Request Fejl" in detail[1]: request_error_count += 1
+                processed_count += 1
+
+            def place(job, source_key, url):
+                """ Giver source_key det resultat jobbets første kilde fik (kopi/hardlink, eller arkiv-medlem). """
+                primary_key = job["primary"][0]
+                if archive_format:
+                    record(*place_archived_download(job["result"], archives[primary_key], url, archives[source_key], source_key))
+                else:
+                    primary_subfolder, primary_manifest = folders[primary_key]
+                    subfolder_path, manifest = folders[source_key]
+                    record(*place_download_for_source(job["result"], primary_subfolder, primary_manifest, url, subfolder_path, source_key, manifest))
+
+            def take(source_key, url):
+                """ Tager ét (source_key, url) ind: ny download, ekstra kilde til en igangværende, eller fordeling af en færdig. """
+                nonlocal active_count, shared_count
+                folder = folder_for(source_key)
+                if isinstance(folder, str):
+                    record(False, (url, folder, source_key))
+                    return
+                canonical_url = canonicalize_url(url)
+                job = jobs.get(canonical_url)
+                if job is None:
+                    jobs[canonical_url] = {"primary": (source_key, url), "waiting": [], "result": None}
+                    byte_progress.expect(url, sizes.get(url))
+                    active_count += 1
+                    enqueue(canonical_url)
+                    return
+                shared_count += 1
+                if job["waiting"] is not None:
+                    job["waiting"].append((source_key, url)) # Fordeles når downloaden er færdig
+                else:
+                    place(job, source_key, url)
+
+            if controller is None:
+                q.put(("log", f"Sender download-opgaver til trådene, højst {submit_window} ad gangen. Venter..."))
+            else:
+                q.put(("log", f"Fordeler download-opgaver pr. host (adaptiv samtidighed, max {max_workers} i alt, højst {submit_window} taget ind)..."))
+
+            def next_link():
+                """ Næste (source_key, url), _PIPELINE_DONE når der ikke kommer flere, eller None hvis køen er tom lige nu. """
+                nonlocal total_links
+                if link_queue is None: return next(links, _PIPELINE_DONE)
+                try:
+                    # Uden noget i gang er der intet andet at vente på end næste link
+                    link = link_queue.get() if not (running or pending_by_host or delayed) else link_queue.get_nowait()
+                except queue.Empty:
+                    return None
+                if link is _PIPELINE_DONE:
+                    q.put(("progress_max_update", total_links))
+                    q.put(("log", f"Link-ekstraktion færdig: {total_links} links fundet. Venter på resterende downloads..."))
+                    return link
+                total_links += 1
+                # Progress maksimum vokser efterhånden som links findes (sendes i klumper for at skåne GUI'en)
+                if total_links == 1 or total_links % PIPELINE_PROGRESS_STEP == 0:
+                    q.put(("progress_max_update", total_links))
+                return link
+
+            links_open = True
+            while True:
+                reported_count = processed_count
+                while links_open and active_count < submit_window:
+                    link = next_link()
+                    if link is None: break
+                    if link is _PIPELINE_DONE:
+                        links_open = False
+                        break
+                    take(*link)
+                now = time.monotonic()
+                while delayed and delayed[0][0] <= now:
+                    _, _, canonical_url, attempt = heapq.heappop(delayed)
+                    enqueue(canonical_url, attempt)
+                if controller is not None:
+                    for host in list(pending_by_host):
+                        host_jobs = pending_by_host[host]
+                        while host_jobs and controller.try_acquire(host):
+                            submit(*host_jobs.popleft())
+                        if not host_jobs: del pending_by_host[host]
+                if processed_count != reported_count: q.put(("progress", processed_count))
+                if not (running or pending_by_host or delayed or links_open): break
+                wait_timeout = max(0.0, delayed[0][0] - time.monotonic()) if delayed else None
+                if link_queue is not None and links_open and active_count < submit_window:
+                    # Der er plads i vinduet: kig efter nye links igen om lidt, også selvom intet bliver færdigt
+                    wait_timeout = PIPELINE_POLL_INTERVAL if wait_timeout is None else min(wait_timeout, PIPELINE_POLL_INTERVAL)
+                if not running:
+                    # Intet kører; vent blot til næste genforsøg er klar
+                    if wait_timeout: time.sleep(wait_timeout)
+                    continue
+                done, running = concurrent.futures.wait(running, timeout=wait_timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    canonical_url, attempt = future_to_info.pop(future)
+                    job = jobs[canonical_url]
+                    source_key_ctx, url_ctx = job["primary"]
+                    try:
+                        result, timings = future.result()
+                    except Exception as exc:
+                        q.put(("error", f"FEJL i {task_name.lower()} tråd for {url_ctx}: {exc}"))
+                        result, timings = (False, (url_ctx, f"Tråd Fejl: {exc}", source_key_ctx)), {"total_s": 0.0}
+                    if controller is not None:
+                        controller.release(_url_host(url_ctx), result[0], result[1][1], timings["total_s"])
+                    will_retry = False
+                    if not result[0]:
+                        category, retry_after = classify_failure(result[1][1])
+                        will_retry = category in RETRYABLE_FAILURES and attempt < max_attempts
+                    event = _download_event(metrics.run_id, url_ctx, source_key_ctx, result, timings, attempt, will_retry)
+                    metrics.record(event)
+                    q.put(("event", event))
+                    if will_retry:
+                        delay = retry_delay(attempt, retry_after)
+                        retry_counter[category] += 1
+                        q.put(("log", f"  -> Forsøg {attempt}/{max_attempts} fejlede for {url_ctx} ({category}); prøver igen om {delay:.1f}s"))
+                        heapq.heappush(delayed, (time.monotonic() + delay, next(retry_sequence), canonical_url, attempt + 1))
+                        continue
+                    byte_progress.finish(url_ctx)
+                    if not result[0] and attempt > 1:
+                        result = (False, (url_ctx, f"{result[1][1]} [forsøg: {attempt}]", source_key_ctx))
+                    elif result[0] and attempt > 1:
+                        recovered_count += 1
+                    job["result"] = result
+                    record(*result)
+                    waiting, job["waiting"] = job["waiting"], None
+                    for source_key, url in waiting: place(job, source_key, url)
+                    active_count -= 1
+                if done: q.put(("progress", processed_count))
+        byte_progress.send(force=True)
+        if shared_count:
+            q.put(("log", f"{len(jobs)} unikke URL'er efter normalisering; {shared_count} dubletter på tværs af kilder blev kun hentet én gang."))
+
+        if controller is not None:
+            host_limits = controller.limits()
+            if host_limits:
+                shown = ", ".join(f"{host or '?'}={limit}" for host, limit in sorted(host_limits.items(), key=lambda item: -item[1])[:10])
+                q.put(("log", f"Samtidighed pr. host ved afslutning: {shown}"))
+
+        for archive in archives.values():
+            archive.close() # Zip-arkivets indholdsfortegnelse skal være skrevet før resultatet meldes
+            q.put(("log", f"Arkiv {archive.name}: {archive.added_count} nye filer (indeks: {archive.name}{ARCHIVE_INDEX_SUFFIX})"))
+        unchanged_count = sum(manifest.unchanged_count for manifest in manifests)
+        if unchanged_count: q.put(("log", f"Uændrede filer (ikke hentet igen): {unchanged_count}"))
+        _report_dedup(content_index, q)
+        _report_metrics(metrics, q)
+        _report_bandwidth(session.limiter, q)
+        if retry_counter:
+            shown = ", ".join(f"{category}={count}" for category, count in retry_counter.most_common())
+            q.put(("summary", f"Automatiske genforsøg: {sum(retry_counter.values())} ({shown}); {recovered_count} lykkedes efter genforsøg."))
+
+        # Antallet af "Request Fejl" i de mislykkede downloads tælles mens de journaliseres.
+        q.put(("log", f"Antal 'Request Fejl': {request_error_count}"))
+        if engine == DOWNLOAD_ENGINE_THREADS:
+            conn_stats = session.connection_stats()
+            q.put(("log", f"Forbindelser: {conn_stats['opened']} åbnet, {conn_stats['reused']} genbrugt ({conn_stats['requests']} requests)"))
+
+        journal.close() # Alt skal være på disken før visningerne læser det
+        failed_view, successful_view = journal.views()
+        if total_links == 0:
+            q.put(("log", "Færdig (ingen links fundet)."))
+        else:
+            q.put(("log", f"Alle {task_name.lower()}(s) forsøgt. Resultater: {journal.folder}"))
+        q.put(("results", (journal.success_count, journal.fail_count, failed_view, successful_view, is_retry)))
+    except Exception as e:
+        q.put(("error", f"FATAL FEJL i {task_name.lower()} tråd: {e}"))
+        q.put(("error_detail", traceback.format_exc()))
+        if link_queue is not None and journal is not None:
+            # Pipeline: kun de links der nåede at blive fundet kendes; meld det der er journaliseret indtil nu
+            journal.close()
+            q.put(("results", (journal.success_count, journal.fail_count, *journal.views(), is_retry)))
+            return
+        fail_count = total_links
+        failed_list_generic = []
+        if is_retry:
+            failed_list_generic = [(url_t[0], f"Processing Error: {e}", url_t[2]) for url_t in links_to_process]
+        else:
+            failed_list_generic = [(url, f"Processing Error: {e}", key) for key, urls in links_dict.items() for url in urls]
+        q.put(("results", (0, fail_count, failed_list_generic, [], is_retry)))
+    finally:
+        for manifest in manifests: manifest.save()
+        if journal is not None: journal.close()
+        for archive in archives.values():
+            try: archive.close()
+            except (OSError, zipfile.BadZipFile, tarfile.TarError) as e: q.put(("error", f"Kunne ikke afslutte arkivet {archive.path}: {e}"))
+        if owns_session: session.close()
+        if owns_metrics: metrics.close()
+        q.put(("enable_buttons", True))
+
+
+# ----- ASYNCIO DOWNLOAD-MOTOR -----
+
+async def download_file_async(url, download_subfolder, q, timeout, source_key, http_session, manifest=None, content_index=None, timings=None, progress=None, limiter=None):
+    """ asyncio-udgave af download_file_threaded med samme kontrol af HTML og filnavne, samme manifest (betingede requests
+    og 304), dedup, ByteProgress, timings og resultat-tuples. Data skrives i standard-executoren (ikke i event loopet)
+    til en .part-fil med ASYNC_PARTIAL_OWNER i navnet, så tråd-motorens genoptagelige .part-filer aldrig røres; den
+    slettes ved fejl. Ingen genoptagelse, intervaller eller arkiv-output. limiter er en BandwidthLimiter. """
+    loop = asyncio.get_running_loop()
+    part_path, meta_path = _partial_paths(download_subfolder, url, ASYNC_PARTIAL_OWNER)
+    timings = {} if timings is None else timings
+    part_file = None
+    request_started = time.perf_counter()
+    try:
+        manifest_entry = manifest.get(url) if manifest is not None else None
+        conditional_headers = manifest.conditional_headers(manifest_entry) if manifest_entry else None
+        async with http_session.get(url, allow_redirects=True, headers=conditional_headers) as response:
+            headers_received = time.perf_counter()
+            timings['ttfb_s'] = headers_received - request_started
+            timings['http_status'] = response.status
+            response.raise_for_status() # Tjekker for 4xx/5xx fejl
+
+            if response.status == 304 and manifest_entry:
+                # Uændret siden sidste kørsel: den eksisterende fil genbruges
+                manifest.mark_unchanged(url)
+                q.put(("log", f"[Async] UÆNDRET: {manifest_entry['filename']} (fra {source_key})"))
+                return (True, (url, manifest_entry['filename'], source_key))
+
+            # Kig på starten af strømmen for at undgå at gemme HTML-fejlsider som filer og for at finde den rigtige filtype
+            content_type = response.headers.get('content-type', '').lower()
+            head = b''
+            while len(head) < CONTENT_SNIFF_BYTES:
+                part = await response.content.read(CONTENT_SNIFF_BYTES - len(head))
+                if not part: break
+                head += part
+            if looks_like_html(head, content_type):
+                raise ValueError(f"Modtog HTML i stedet for forventet fil (Content-Type: {content_type})")
+
+            filename = correct_extension(get_filename_from_url(url, response), head, content_type)
+            content_length = response.headers.get('content-length')
+            # aiohttp dekomprimerer, så Content-Length siger da intet om antallet af bytes på disken
+            compressed = response.headers.get('content-encoding', 'identity').lower() != 'identity'
+            total_length = int(content_length) if content_length and content_length.isdigit() and not compressed else None
+            etag, last_modified = response.headers.get('etag'), response.headers.get('last-modified')
+            if progress is not None: progress.start(url, total_length)
+
+            # Gem til .part-filen; bidderne samles til SEGMENT_WRITE_BUFFER og skrives (og hashes) i executoren
+            host = _url_host(url)
+            hasher = hashlib.sha256()
+            def write_block(block):
+                part_file.write(block)
+                hasher.update(block)
+            part_file = await loop.run_in_executor(None, open, part_path, 'wb')
+            disk_seconds = 0.0
+            received = 0
+            buffer = bytearray()
+            async def receive(chunk):
+                nonlocal disk_seconds, received
+                if limiter is not None: await limiter.consume_async(host, len(chunk))
+                if progress is not None: progress.add(url, len(chunk))
+                buffer.extend(chunk)
+                received += len(chunk)
+                if len(buffer) >= SEGMENT_WRITE_BUFFER:
+                    write_started = time.perf_counter()
+                    await loop.run_in_executor(None, write_block, bytes(buffer))
+                    disk_seconds += time.perf_counter() - write_started
+                    buffer.clear()
+            if head: await receive(head)
+            async for chunk in response.content.iter_chunked(65536):
+                if chunk: await receive(chunk)
+            write_started = time.perf_counter()
+            if buffer: await loop.run_in_executor(None, write_block, bytes(buffer))
+            await loop.run_in_executor(None, part_file.close)
+            part_file = None
+            disk_seconds += time.perf_counter() - write_started
+
+        body_received = time.perf_counter()
+        timings['bytes'] = received
+        timings['transfer_s'] = body_received - headers_received - disk_seconds
+        if total_length is not None and received != total_length:
+            raise IOError(f"Ufuldstændig download: {received} af {total_length} bytes")
+        # Omdøbning, hardlink og manifest som i tråd-motoren (filsystem-kald, så de kører i executoren)
+        saved_filename = await loop.run_in_executor(None, _store_part_file, part_path, meta_path, download_subfolder, filename, url, received, hasher.hexdigest(),
+                                                    etag, last_modified, manifest, manifest_entry, content_index, q, "[Async]")
+        timings['disk_s'] = disk_seconds + time.perf_counter() - body_received
+        q.put(("log", f"[Async] SUCCES: Gemt {saved_filename} (fra {source_key})"))
+        return (True, (url, saved_filename, source_key))
+
+    except asyncio.TimeoutError: reason = f"Timeout ({timeout}s)"
+    except aiohttp.ClientResponseError as e:
+        # Samme form som requests' HTTPError, så classify_failure kan læse statuskoden
+        reason = f"Request Fejl: {e.status} {e.message} for url: {url}"
+        retry_after = _retry_after_seconds(e.headers.get('retry-after')) if e.headers else None
+        if retry_after is not None: reason += f" [Retry-After: {retry_after}]"
+    except aiohttp.ClientError as e: reason = f"Request Fejl: {e}"
+    except ValueError as e: reason = f"Værdi Fejl: {e}"
+    except Exception as e: reason = f"Anden Fejl: {e}"
+
+    # Ingen halve filer: .part-filen slettes (et reserveret navn er allerede frigivet af _store_part_file)
+    if part_file is not None: part_file.close()
+    _discard_partial(part_path, meta_path)
+
+    # Fejl-logning
+    q.put(("log", f"[Async] FEJL: {url} (fra {source_key}) - {reason}"))
+    return (False, (url, reason, source_key))
+
+
+async def _timed_download_async(*args, **kwargs):
+    """ Som _timed_download, for download_file_async. """
+    timings = {}
+    started = time.monotonic()
+    result = await download_file_async(*args, timings=timings, **kwargs)
+    timings['total_s'] = time.monotonic() - started
+    return result, timings
+
+
+class _AsyncioExecutor:
+    """ Executor for run_download_task der kører downloads som coroutines på ét event loop i en egen tråd.
+    submit() returnerer en concurrent.futures.Future, så planlægningen (vindue, genforsøg, fan-out, progress og
+    hændelser) er den samme som med tråd-motoren. Højst max_concurrency downloads kører ad gangen (semaphore). """
+    def __init__(self, max_concurrency, timeout_seconds):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="asyncio-downloads", daemon=True)
+        self._thread.start()
+        try:
+            self.http_session, self._semaphore = asyncio.run_coroutine_threadsafe(self._open(max_concurrency, timeout_seconds), self._loop).result()
+        except BaseException:
+            self._stop()
+            raise
+
+    @staticmethod
+    async def _open(max_concurrency, timeout_seconds):
+        # Samme semantik som requests' timeout: grænse for connect og for hver læsning, ikke for hele filen
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout_seconds, sock_read=timeout_seconds)
+        connector = aiohttp.TCPConnector(limit=max_concurrency, limit_per_host=0, ttl_dns_cache=300)
+        http_session = aiohttp.ClientSession(connector=connector, timeout=client_timeout, headers=DEFAULT_REQUEST_HEADERS)
+        return http_session, asyncio.Semaphore(max_concurrency)
+
+    def submit(self, coroutine_function, *args, **kwargs):
+        async def bounded():
+            async with self._semaphore:
+                return await coroutine_function(*args, **kwargs)
+        return asyncio.run_coroutine_threadsafe(bounded(), self._loop)
+
+    async def _close(self):
+        # Som ThreadPoolExecutor.shutdown(wait=True): igangværende downloads gøres færdige før sessionen lukkes
+        running = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        await asyncio.gather(*running, return_exceptions=True)
+        await self.http_session.close()
+
+    def _stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+        finally:
+            self._stop()
+
+
+def run_download_task_async(links_to_process, base_download_folder_path, q, max_concurrency, timeout_seconds, is_retry=False, **kwargs):
+    """ run_download_task med asyncio-motoren: alle downloads kører på ét event loop, max_concurrency styrer semaphoren.
+    Øvrige argumenter (limiter, adaptive, order, link_queue ...) gives videre til run_download_task. """
+    run_download_task(links_to_process, base_download_folder_path, q, max_concurrency, timeout_seconds, is_retry, engine=DOWNLOAD_ENGINE_ASYNCIO, **kwargs)
+
+
+# ----- PIPELINE: EKSTRAKTION -> DOWNLOAD -----
+
+_PIPELINE_DONE = object() # Sentinel: producenten er færdig
+
+
+def _website_source_key(website_urls_list):
+    """ Mappenavn til website links: domænet hvis kun én URL, ellers en fælles mappe. """
+    website_source_key = "_Website_Downloads_" # Standard mappenavn
+    if len(website_urls_list) == 1: # Hvis kun én URL, brug domænet
+         try: domain = urlparse(website_urls_list[0]).netloc.replace('.', '_'); website_source_key = sanitize_filename(f"_Website_{domain}", is_folder=True) if domain else website_source_key
+         except: pass
+    return website_source_key
+
+
+def run_pipelined_processing(excel_files_list, website_urls_list, download_folder_path, q, max_workers, timeout_seconds, session=None, queue_size=DEFAULT_PIPELINE_QUEUE_SIZE, extraction_processes=DEFAULT_EXTRACTION_PROCESSES, fast_scan=False,
+                             crawl_depth=0, crawl_max_pages=DEFAULT_CRAWL_MAX_PAGES, crawl_scope=CRAWL_SCOPE_PATH, adaptive=True, max_attempts=DEFAULT_MAX_ATTEMPTS, limiter=None, archive_format=None,
+                             engine=DOWNLOAD_ENGINE_THREADS):
+    """ Som run_processing_thread_full, men downloads starter mens Excel-filer og websites stadig læses.
+    En producent-tråd lægger hvert nyt (source_key, url) i en begrænset kø (backpressure), og run_download_task
+    henter fra køen med sin sædvanlige planlægning: genforsøg, adaptiv samtidighed, byte-progress, arkiver og journal.
+    Samme ressource (kanonisk URL) hentes kun én gang og fordeles til alle kilder der linker til den. """
+    link_queue = queue.Queue(maxsize=queue_size)
+    stopped = threading.Event() # Sat hvis download-siden er stoppet; producenten smider så resten af sine links væk
+    seen_by_source = {}
+    website_source_key = _website_source_key(website_urls_list) if website_urls_list else None
+
+    def publish_link(source_key, url):
+        # Dedup pr. source_key som i extract_links_from_files; put() blokerer når køen er fuld
+        seen = seen_by_source.setdefault(source_key, set())
+        if url in seen or stopped.is_set(): return
+        seen.add(url)
+        link_queue.put((source_key, url))
+
+    def producer():
+        try:
+            if excel_files_list:
+                if extraction_processes:
+                    extract_links_from_files_parallel(excel_files_list, q, on_link=publish_link, max_processes=extraction_processes, fast_scan=fast_scan)
+                else:
+                    extract_links_from_files(excel_files_list, q, on_link=publish_link, fast_scan=fast_scan)
+            if website_urls_list and crawl_depth > 0:
+                crawl_websites(website_urls_list, q, timeout_seconds, session, on_link=lambda url: publish_link(website_source_key, url),
+                               max_depth=crawl_depth, max_pages=crawl_max_pages, scope=crawl_scope)
+            else:
+                for website_url in website_urls_list or []:
+                    extract_links_from_website(website_url, q, timeout_seconds, session, on_link=lambda url: publish_link(website_source_key, url))
+        except Exception as e:
+            q.put(("error", f"FEJL under link-ekstraktion: {e}"))
+            q.put(("error_detail", traceback.format_exc()))
+        finally:
+            link_queue.put(_PIPELINE_DONE)
+
+    producer_thread = threading.Thread(target=producer, daemon=True)
+    producer_thread.start()
+    try:
+        run_download_task(None, download_folder_path, q, max_workers, timeout_seconds, session=session, adaptive=adaptive, max_attempts=max_attempts, limiter=limiter,
+                          archive_format=archive_format, link_queue=link_queue, engine=engine)
+    finally:
+        # Stoppede downloads før _PIPELINE_DONE (fatal fejl), tømmes køen så producenten ikke hænger i put()
+        stopped.set()
+        while producer_thread.is_alive():
+            try: link_queue.get(timeout=PIPELINE_POLL_INTERVAL)
+            except queue.Empty: pass
+
+
+def collect_links(excel_files_list, website_urls_list, q, timeout_seconds, session=None, extraction_processes=DEFAULT_EXTRACTION_PROCESSES, fast_scan=False,
+                  crawl_depth=0, crawl_max_pages=DEFAULT_CRAWL_MAX_PAGES, crawl_scope=CRAWL_SCOPE_PATH):
+    """ Ekstraktionsfasen alene: {source_key: links} fra Excel-filer og websites (evt. crawlet). """
+    links_by_source = {}
+    if excel_files_list:
+        if extraction_processes:
+            excel_links = extract_links_from_files_parallel(excel_files_list, q, max_processes=extraction_processes, fast_scan=fast_scan)
+        else:
+            excel_links = extract_links_from_files(excel_files_list, q, fast_scan=fast_scan)
+        links_by_source.update(excel_links)
+    if website_urls_list:
+        if crawl_depth > 0:
+            all_website_links = crawl_websites(website_urls_list, q, timeout_seconds, session, max_depth=crawl_depth, max_pages=crawl_max_pages, scope=crawl_scope)
+        else:
+            all_website_links = set()
+            for url in website_urls_list:
+                # Sender timeout_seconds med til website scanneren
+                website_links = extract_links_from_website(url, q, timeout_seconds, session)
+                all_website_links.update(website_links)
+        if all_website_links:
+            links_by_source.setdefault(_website_source_key(website_urls_list), set()).update(all_website_links)
+    return links_by_source
+
+
+def run_processing_thread_full(excel_files_list, website_urls_list, download_folder_path, q, max_workers, timeout_seconds, engine=DOWNLOAD_ENGINE_THREADS, pipelined=False, extraction_processes=DEFAULT_EXTRACTION_PROCESSES, fast_scan=False, adaptive=True,
+                               crawl_depth=0, crawl_max_pages=DEFAULT_CRAWL_MAX_PAGES, crawl_scope=CRAWL_SCOPE_PATH, limiter=None, order=SCHEDULE_INPUT, archive_format=None):
+     """ Wrapper der først ekstraherer links fra filer og websites, og derefter downloader.
+     engine vælger download-motor: DOWNLOAD_ENGINE_THREADS (max_workers tråde) eller DOWNLOAD_ENGINE_ASYNCIO (max_workers = semaphore).
+     pipelined=True starter downloads mens links stadig findes (ikke med størrelses-rækkefølge).
+     extraction_processes > 0 læser Excel-filerne parallelt i så mange processer.
+     fast_scan=True bruger den hurtige XML-scanner til .xlsx (openpyxl som fallback).
+     adaptive=True styrer samtidigheden pr. host automatisk (max_workers er det samlede loft).
+     crawl_depth > 0 crawler websites (crawl_websites) i stedet for kun at scanne start-siderne.
+     limiter (BandwidthLimiter) begrænser downloadenes samlede og evt. pr.-host hastighed; kan justeres undervejs.
+     order vælger rækkefølgen (SCHEDULE_INPUT, SCHEDULE_LARGEST_FIRST eller SCHEDULE_SMALLEST_FIRST).
+     archive_format (ARCHIVE_ZIP/ARCHIVE_TAR) skriver et arkiv pr. kilde i stedet for mapper (kun tråd-motoren). """
+     # Én forbindelses-pool til hele kørslen, så website scanning og downloads deler keep-alive forbindelser
+     session = DownloadSession(max_workers=max_workers, limiter=limiter)
+     try:
+          if pipelined and order != SCHEDULE_INPUT:
+               q.put(("log", "Størrelses-rækkefølge kræver hele link-listen; kører ekstraktion før download."))
+               pipelined = False
+          if pipelined:
+               run_pipelined_processing(excel_files_list, website_urls_list, download_folder_path, q, max_workers, timeout_seconds, session, extraction_processes=extraction_processes, fast_scan=fast_scan,
+                                        crawl_depth=crawl_depth, crawl_max_pages=crawl_max_pages, crawl_scope=crawl_scope, adaptive=adaptive, archive_format=archive_format, engine=engine)
+               return
+          links_by_source = collect_links(excel_files_list, website_urls_list, q, timeout_seconds, session, extraction_processes=extraction_processes, fast_scan=fast_scan,
+                                          crawl_depth=crawl_depth, crawl_max_pages=crawl_max_pages, crawl_scope=crawl_scope)
+
+          if links_by_source:
+               run_download_task(links_by_source, download_folder_path, q, max_workers, timeout_seconds, is_retry=False, session=session, adaptive=adaptive, order=order,
+                                 archive_format=archive_format, engine=engine)
+          else:
+               q.put(("results", (0, 0, [], [], False)))
+               q.put(("log", "Færdig (ingen links fundet)."))
+               q.put(("enable_buttons", True))
+     finally:
+          session.close()
+
+
+# ----- DISTRIBUERET KØRSEL (DELT JOB-LAGER) -----
+
+JOB_PENDING = "pending"
+JOB_LEASED = "leased"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class JobStore:
+    """ Holdbart job-lager i en SQLite-fil, normalt JOBS_FILENAME i den delte hoved-mappe.
+    Ét job pr. kanonisk URL (hentes én gang) med en eller flere refs (source_key, url) der får resultatet, ligesom
+    build_url_index. Workers i andre processer eller på andre maskiner lejer jobs med en tidsbegrænset lease, forlænger
+    den med heartbeat og afslutter jobbet; en udløbet lease tages op af den næste worker der spørger.
+    Bruger rollback-journal (ikke WAL), så låsningen også virker når filen ligger på et netværksdrev. """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY, canonical TEXT NOT NULL UNIQUE, url TEXT NOT NULL, source_key TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, available_at REAL NOT NULL DEFAULT 0,
+                    lease_owner TEXT, lease_expires REAL);
+                CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, available_at);
+                CREATE TABLE IF NOT EXISTS refs (
+                    job_id INTEGER NOT NULL, source_key TEXT NOT NULL, url TEXT NOT NULL, success INTEGER, detail TEXT,
+                    PRIMARY KEY (source_key, url));
+                CREATE INDEX IF NOT EXISTS refs_job ON refs (job_id);
+            """)
+
+    def _transaction(self, work):
+        """ Kører work(db) i én skrive-transaktion (BEGIN IMMEDIATE venter på andre skrivere i op til 60 s). """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def add_links(self, links_dict):
+        """ Lægger {source_key: urls} ind som jobs. Kendte links springes over, så en afbrudt coordinator kan startes igen.
+        Returnerer antal nye refs. """
+        rows = [(canonicalize_url(url), url, source_key) for source_key, urls in links_dict.items() for url in urls]
+        def work(db):
+            db.executemany("INSERT OR IGNORE INTO jobs (canonical, url, source_key) VALUES (?, ?, ?)", rows)
+            changes_before = db.total_changes
+            db.executemany("INSERT OR IGNORE INTO refs (job_id, source_key, url) SELECT id, ?, ? FROM jobs WHERE canonical = ?",
+                           [(source_key, url, canonical) for canonical, url, source_key in rows])
+            return db.total_changes - changes_before
+        return self._transaction(work)
+
+    def lease(self, owner, limit, lease_seconds=JOB_LEASE_SECONDS):
+        """ Lejer op til limit klare jobs: ventende (efter evt. backoff) eller med udløbet lease.
+        Returnerer [(job_id, forsøg, [(source_key, url), ...]), ...]; den første ref er den der hentes. """
+        now = time.time()
+        def work(db):
+            rows = db.execute("SELECT id, attempts FROM jobs WHERE (state = ? AND available_at <= ?) OR (state = ? AND lease_expires < ?) ORDER BY id LIMIT ?",
+                              (JOB_PENDING, now, JOB_LEASED, now, limit)).fetchall()
+            db.executemany("UPDATE jobs SET state = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                           [(JOB_LEASED, owner, now + lease_seconds, job_id) for job_id, _ in rows])
+            return [(job_id, attempts + 1, db.execute("SELECT source_key, url FROM refs WHERE job_id = ? ORDER BY rowid", (job_id,)).fetchall())
+                    for job_id, attempts in rows]
+        return self._transaction(work) if limit > 0 else []
+
+    def heartbeat(self, owner, job_ids, lease_seconds=JOB_LEASE_SECONDS):
+        """ Forlænger owners leases på job_ids. """
+        expires = time.time() + lease_seconds
+        self._transaction(lambda db: db.executemany("UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND state = ?",
+                                                    [(expires, job_id, owner, JOB_LEASED) for job_id in job_ids]))
+
+    def retry(self, job_id, owner, delay):
+        """ Lægger et job tilbage som ventende efter delay sekunder (backoff), så enhver worker kan tage det. """
+        self._transaction(lambda db: db.execute("UPDATE jobs SET state = ?, available_at = ?, lease_owner = NULL, lease_expires = NULL WHERE id = ? AND lease_owner = ?",
+                                                (JOB_PENDING, time.time() + delay, job_id, owner)))
+
+    def finish(self, job_id, owner, ref_results):
+        """ Gemmer resultat-tuples (success, (url, filnavn/årsag, source_key)) for jobbets refs.
+        Returnerer False (og gemmer intet) hvis owner har mistet sin lease til en anden worker. """
+        state = JOB_DONE if ref_results[0][0] else JOB_FAILED
+        def work(db):
+            if db.execute("UPDATE jobs SET state = ?, lease_owner = NULL, lease_expires = NULL WHERE id = ? AND lease_owner = ?",
+                          (state, job_id, owner)).rowcount == 0:
+                return False
+            db.executemany("UPDATE refs SET success = ?, detail = ? WHERE source_key = ? AND url = ?",
+                           [(int(success), detail, source_key, url) for success, (url, detail, source_key) in ref_results])
+            return True
+        return self._transaction(work)
+
+    def counts(self):
+        """ {tilstand: antal jobs} og {'refs': i alt, 'refs_done': med resultat}. """
+        with self._lock:
+            counts = dict(self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+            counts['refs'], counts['refs_done'] = self._db.execute("SELECT COUNT(*), COUNT(success) FROM refs").fetchone()
+        return counts
+
+    def results(self):
+        """ Resultat-tuples (success, (url, filnavn/årsag, source_key)) for alle afsluttede refs, i indsættelsesrækkefølge.
+        Læses efterhånden gennem en egen forbindelse, så hverken rækkerne eller lagerets lås holdes imens. """
+        db = sqlite3.connect(self.path, timeout=60)
+        try:
+            for url, detail, source_key, success in db.execute("SELECT url, detail, source_key, success FROM refs WHERE success IS NOT NULL ORDER BY rowid"):
+                yield (bool(success), (url, detail, source_key))
+        finally:
+            db.close()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def run_distributed_worker(store_path, download_folder_path, q, max_workers, timeout_seconds, worker_id=None, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                           lease_seconds=JOB_LEASE_SECONDS, limiter=None, report_results=True):
+    """ Worker i distribueret mode: lejer jobs fra JobStore og henter dem med download_file_threaded i max_workers tråde.
+    Leases forlænges hvert lease_seconds/4 sekund; forbigående fejl lægges tilbage i lageret med backoff.
+    Stopper når lageret hverken har ventende eller lejede jobs. Hver mappe får et DownloadManifest med shared=True
+    (betingede requests; poster fra andre workers flettes ind ved gem) og dets FilenameIndex, der reserverer filnavne
+    med eksklusiv oprettelse, så workers der deler mappen ikke overskriver hinanden. Dedup-indekset er pr. proces og
+    bruges ikke her. .part-filerne navngives med worker_id, så et job der er taget op fra en langsom (men levende)
+    worker ikke skrives i samme .part-fil af to processer.
+    Med report_results sendes denne workers egne resultater som ("results", ...) til sidst. """
+    if worker_id is None:
+        import socket
+        worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    store = None
+    session = DownloadSession(max_workers=max_workers, limiter=limiter)
+    running = {} # future -> (job_id, forsøg, refs)
+    running_lock = threading.Lock()
+    stop_heartbeat = threading.Event()
+    folders = {} # source_key -> (undermappe, manifest)
+    successful_downloads_info = []
+    failed_downloads_info = []
+
+    def heartbeat():
+        while not stop_heartbeat.wait(lease_seconds / 4):
+            with running_lock: job_ids = [job_id for job_id, _, _ in running.values()]
+            try:
+                if job_ids: store.heartbeat(worker_id, job_ids, lease_seconds)
+            except sqlite3.Error as e:
+                q.put(("log", f"[{worker_id}] Heartbeat fejlede: {e}"))
+
+    def folder_for(source_key):
+        if source_key not in folders:
+            subfolder_path = os.path.join(download_folder_path, source_key)
+            os.makedirs(subfolder_path, exist_ok=True)
+            manifest = DownloadManifest(subfolder_path, shared=True)
+            manifest.names()
+            folders[source_key] = (subfolder_path, manifest)
+        return folders[source_key]
+
+    heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+    try:
+        os.makedirs(download_folder_path, exist_ok=True)
+        store = JobStore(store_path)
+        q.put(("log", f"[{worker_id}] Worker startet mod {store_path} (max {max_workers} ad gangen)."))
+        heartbeat_thread.start()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                for job_id, attempt, refs in store.lease(worker_id, max_workers - len(running), lease_seconds):
+                    source_key, url = refs[0]
+                    try:
+                        subfolder_path, manifest = folder_for(source_key)
+                        future = executor.submit(_timed_download, url, subfolder_path, q, timeout_seconds, source_key, session, manifest, partial_owner=worker_id)
+                    except OSError as e:
+                        store.finish(job_id, worker_id, [(False, (url, f"Mappe-oprettelsesfejl: {e}", key)) for key, url in refs])
+                        continue
+                    with running_lock: running[future] = (job_id, attempt, refs)
+                if not running:
+                    counts = store.counts()
+                    if not counts.get(JOB_PENDING) and not counts.get(JOB_LEASED): break
+                    time.sleep(JOB_POLL_INTERVAL) # Jobs venter på backoff eller ejes af andre workers
+                    continue
+                done, _ = concurrent.futures.wait(list(running), timeout=JOB_POLL_INTERVAL, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    with running_lock: job_id, attempt, refs = running.pop(future)
+                    source_key, url = refs[0]
+                    try:
+                        result, timings = future.result()
+                    except Exception as exc:
+                        result, timings = (False, (url, f"Tråd Fejl: {exc}", source_key)), {"total_s": 0.0}
+                    will_retry = False
+                    if not result[0]:
+                        category, retry_after = classify_failure(result[1][1])
+                        will_retry = category in RETRYABLE_FAILURES and attempt < max_attempts
+                    q.put(("event", _download_event(worker_id, url, source_key, result, timings, attempt, will_retry)))
+                    if will_retry:
+                        delay = retry_delay(attempt, retry_after)
+                        q.put(("log", f"  -> Forsøg {attempt}/{max_attempts} fejlede for {url} ({category}); lægges tilbage i køen om {delay:.1f}s"))
+                        store.retry(job_id, worker_id, delay)
+                        continue
+                    if not result[0] and attempt > 1:
+                        result = (False, (url, f"{result[1][1]} [forsøg: {attempt}]", source_key))
+                    primary_subfolder, primary_manifest = folder_for(source_key)
+                    ref_results = [result]
+                    for other_key, other_url in refs[1:]:
+                        try:
+                            other_subfolder, other_manifest = folder_for(other_key)
+                            ref_results.append(place_download_for_source(result, primary_subfolder, primary_manifest, other_url, other_subfolder, other_key, other_manifest))
+                        except OSError as e:
+                            ref_results.append((False, (other_url, f"Mappe-oprettelsesfejl: {e}", other_key)))
+                    if not store.finish(job_id, worker_id, ref_results):
+                        q.put(("log", f"[{worker_id}] Mistede leasen på {url} til en anden worker; resultatet gemmes ikke."))
+                        continue
+                    for success, detail in ref_results:
+                        (successful_downloads_info if success else failed_downloads_info).append(detail)
+
+        q.put(("log", f"[{worker_id}] Ingen flere jobs: {len(successful_downloads_info)} hentet, {len(failed_downloads_info)} fejlede."))
+        if report_results:
+            q.put(("results", (len(successful_downloads_info), len(failed_downloads_info), failed_downloads_info, successful_downloads_info, False)))
+    except Exception as e:
+        q.put(("error", f"FATAL FEJL i worker {worker_id}: {e}"))
+        q.put(("error_detail", traceback.format_exc()))
+    finally:
+        stop_heartbeat.set()
+        for _, manifest in folders.values(): manifest.save()
+        session.close()
+        if store is not None: store.close()
+
+
+def _run_local_worker(store_path, download_folder_path, q, max_workers, timeout_seconds, global_rate=0, host_rates=None, **kwargs):
+    """ Indgang for coordinatorens worker-processer. En BandwidthLimiter kan ikke sendes til en ny proces, så den bygges her. """
+    limiter = BandwidthLimiter(global_rate, host_rates) if global_rate or host_rates else None
+    run_distributed_worker(store_path, download_folder_path, q, max_workers, timeout_seconds, limiter=limiter, **kwargs)
+
+
+def run_distributed_coordinator(links_dict, download_folder_path, q, max_workers, timeout_seconds, store_path=None, local_workers=DEFAULT_LOCAL_WORKERS,
+                                max_attempts=DEFAULT_MAX_ATTEMPTS, lease_seconds=JOB_LEASE_SECONDS, limiter=None):
+    """ Lægger {source_key: urls} i job-lageret, starter local_workers worker-processer og venter til alle jobs er
+    afsluttet - også dem workers på andre maskiner (run_distributed_worker mod samme fil) har taget.
+    limiter (BandwidthLimiter) deles ligeligt mellem de lokale workers; eksterne workers har deres egen --max-rate.
+    Sender progress undervejs og til sidst ("results", ...) med JournalView'er: resultaterne strømmer fra lageret
+    til en RunJournal ligesom i run_download_task, så intet af dem holdes i hukommelsen. """
+    store_path = store_path or os.path.join(download_folder_path, JOBS_FILENAME)
+    processes = []
+    store = None
+    journal = None
+    try:
+        os.makedirs(download_folder_path, exist_ok=True)
+        store = JobStore(store_path)
+        added = store.add_links(links_dict)
+        counts = store.counts()
+        q.put(("log", f"Job-lager {store_path}: {added} nye links; {counts['refs']} i alt, {counts['refs_done']} allerede afsluttet."))
+        q.put(("progress_max", counts['refs']))
+        q.put(("progress", counts['refs_done']))
+
+        rate_kwargs = {}
+        if limiter is not None and local_workers:
+            share = lambda rate: max(1, rate // local_workers) if rate else 0 # 0 er ubegrænset, så en lille grænse må ikke runde ned til 0
+            rate_kwargs = dict(global_rate=share(limiter.global_rate), host_rates={host: share(rate) for host, rate in limiter.host_rates().items()})
+            q.put(("log", f"Båndbredde-grænsen deles mellem {local_workers} lokale worker(s): {_format_rate(rate_kwargs['global_rate'])} hver."))
+        context = multiprocessing.get_context("spawn") # Samme opførsel på Windows og Linux
+        worker_queue = context.Queue()
+        for index in range(local_workers):
+            process = context.Process(target=_run_local_worker, args=(store_path, download_folder_path, worker_queue, max_workers, timeout_seconds),
+                                      kwargs=dict(max_attempts=max_attempts, lease_seconds=lease_seconds, report_results=False, **rate_kwargs), daemon=True)
+            process.start()
+            processes.append(process)
+        if not local_workers:
+            q.put(("log", f"Venter på workers: excel-link-downloader --worker --job-store \"{store_path}\" -o \"{download_folder_path}\""))
+
+        while True:
+            while True: # Videresend workernes beskeder (log, fejl, hændelser)
+                try: kind, payload = worker_queue.get(timeout=JOB_POLL_INTERVAL)
+                except queue.Empty: break
+                q.put((kind, payload))
+            counts = store.counts()
+            q.put(("progress", counts['refs_done']))
+            if not counts.get(JOB_PENDING) and not counts.get(JOB_LEASED): break
+            if processes and not any(process.is_alive() for process in processes):
+                q.put(("error", "Alle lokale workers er stoppet, men der er stadig jobs; de kan tages op af en ny worker senere."))
+                break
+
+        journal = RunJournal(download_folder_path)
+        for result in store.results(): journal.record(result)
+        journal.close() # Alt skal være på disken før visningerne læser det
+        failed_view, successful_view = journal.views()
+        q.put(("log", f"Alle jobs i job-lageret er afsluttet. Resultater: {journal.folder}"))
+        q.put(("results", (journal.success_count, journal.fail_count, failed_view, successful_view, False)))
+    except Exception as e:
+        q.put(("error", f"FATAL FEJL i coordinator: {e}"))
+        q.put(("error_detail", traceback.format_exc()))
+        q.put(("results", (0, 0, [], [], False)))
+    finally:
+        for process in processes: process.join(timeout=5)
+        if journal is not None: journal.close()
+        if store is not None: store.close()
+        q.put(("enable_buttons", True))
+
+
+def run_distributed_processing(excel_files_list, website_urls_list, download_folder_path, q, max_workers, timeout_seconds, store_path=None, local_workers=DEFAULT_LOCAL_WORKERS,
+                               extraction_processes=DEFAULT_EXTRACTION_PROCESSES, fast_scan=False, crawl_depth=0, crawl_max_pages=DEFAULT_CRAWL_MAX_PAGES, crawl_scope=CRAWL_SCOPE_PATH,
+                               limiter=None):
+    """ Coordinator-kørsel: ekstraktion som run_processing_thread_full, derefter run_distributed_coordinator.
+    Størrelses-rækkefølge og arkiv-output findes ikke i distribueret mode (main() afviser dem). """
+    session = DownloadSession(max_workers=max_workers, limiter=limiter)
+    try:
+        links_by_source = collect_links(excel_files_list, website_urls_list, q, timeout_seconds, session, extraction_processes=extraction_processes, fast_scan=fast_scan,
+                                        crawl_depth=crawl_depth, crawl_max_pages=crawl_max_pages, crawl_scope=crawl_scope)
+    finally:
+        session.close()
+    run_distributed_coordinator(links_by_source, download_folder_path, q, max_workers, timeout_seconds, store_path=store_path, local_workers=local_workers, limiter=limiter)
+
+
+# ----- KOMMANDOLINJE (HEADLESS) -----
+
+def _build_arg_parser():
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="excel-link-downloader",
+        description="Henter links fra Excel-filer og hjemmesider. Uden argumenter startes GUI'en.")
+    def rate_argument(text):
+        try: return parse_rate(text)
+        except ValueError as e: raise argparse.ArgumentTypeError(str(e))
+    def host_rate_argument(text):
+        host, _, rate = text.partition('=')
+        if not host or not rate: raise argparse.ArgumentTypeError(f"forventede HOST=HASTIGHED, fik {text!r}")
+        return host.strip().lower(), rate_argument(rate)
+    parser.add_argument("-e", "--excel", action="append", default=[], metavar="FIL", help="Excel-fil at hente links fra (kan gentages)")
+    parser.add_argument("-w", "--website", action="append", default=[], metavar="URL", help="Hjemmeside at scanne for links (kan gentages)")
+    parser.add_argument("-o", "--output", metavar="MAPPE", help="Hoved-mappe til downloads (påkrævet uden --gui)")
+    parser.add_argument("--workers", type=int, metavar="N", help=f"Max samtidige downloads (standard {DEFAULT_MAX_CONCURRENT_DOWNLOADS}, asyncio {DEFAULT_MAX_ASYNC_CONCURRENCY})")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_DOWNLOAD_TIMEOUT, metavar="SEK", help=f"Timeout pr. request i sekunder (standard {DEFAULT_DOWNLOAD_TIMEOUT})")
+    parser.add_argument("--engine", choices=(DOWNLOAD_ENGINE_THREADS, DOWNLOAD_ENGINE_ASYNCIO), default=DOWNLOAD_ENGINE_THREADS, help="Download-motor")
+    parser.add_argument("--pipelined", action="store_true", help="Start downloads mens links stadig findes")
+    parser.add_argument("--extraction-processes", type=int, default=DEFAULT_EXTRACTION_PROCESSES, metavar="N", help="Læs Excel-filer parallelt i N processer (0 = sekventielt)")
+    parser.add_argument("--fast-scan", action="store_true", help="Brug den hurtige XML-scanner til .xlsx")
+    parser.add_argument("--no-adaptive", dest="adaptive", action="store_false", help="Slå adaptiv samtidighed pr. host fra")
+    parser.add_argument("--crawl-depth", type=int, default=0, metavar="N", help="Crawl hjemmesiderne N klik væk fra start-siden (0 = kun start-siden)")
+    parser.add_argument("--crawl-max-pages", type=int, default=DEFAULT_CRAWL_MAX_PAGES, metavar="N", help=f"Max sider pr. start-URL ved crawl (standard {DEFAULT_CRAWL_MAX_PAGES})")
+    parser.add_argument("--crawl-scope", choices=(CRAWL_SCOPE_PATH, CRAWL_SCOPE_HOST), default=CRAWL_SCOPE_PATH, help="Crawl kun under start-URL'ens mappe (path) eller hele hosten (host)")
+    parser.add_argument("--order", choices=(SCHEDULE_INPUT, SCHEDULE_LARGEST_FIRST, SCHEDULE_SMALLEST_FIRST), default=SCHEDULE_INPUT,
+                        help="Rækkefølge for downloads: input, largest (største først, kortest kørsel) eller smallest (mindste først); de to sidste prober størrelser med HEAD")
+    parser.add_argument("--archive", choices=(ARCHIVE_ZIP, ARCHIVE_TAR), help="Skriv downloads direkte i ét arkiv pr. kilde (KILDE.zip/.tar med et .index.jsonl) i stedet for en mappe pr. kilde")
+    parser.add_argument("--max-rate", type=rate_argument, default=0, metavar="HASTIGHED", help="Samlet båndbredde-grænse for downloads, fx 500K eller 2M pr. sekund (standard ubegrænset)")
+    parser.add_argument("--host-rate", type=host_rate_argument, action="append", default=[], metavar="HOST=HASTIGHED", help="Båndbredde-grænse for én host, fx files.example.com=1M (kan gentages)")
+    parser.add_argument("--coordinator", action="store_true", help="Distribueret kørsel: læg links i et delt job-lager og start --local-workers worker-processer")
+    parser.add_argument("--worker", action="store_true", help="Distribueret kørsel: hent jobs fra --job-store indtil lageret er tømt (kræver ikke -e/-w)")
+    parser.add_argument("--job-store", metavar="FIL", help=f"SQLite job-lager delt af coordinator og workers (standard MAPPE/{JOBS_FILENAME})")
+    parser.add_argument("--local-workers", type=int, default=DEFAULT_LOCAL_WORKERS, metavar="N", help=f"Worker-processer coordinatoren starter selv (standard {DEFAULT_LOCAL_WORKERS}; 0 = kun eksterne workers)")
+    parser.add_argument("--json", action="store_true", help="Skriv alle kø-beskeder som JSON-linjer på stdout")
+    parser.add_argument("--gui", action="store_true", help="Start den grafiske brugerflade")
+    return parser
+
+
+def _headless_result_rows(rows):
+    """ JSON-form af en resultat-liste: en JournalView angives ved sin journal-fil (kan være meget stor), en liste som rækker. """
+    if isinstance(rows, JournalView): return {"journal": rows.path, "count": len(rows)}
+    return [list(row) for row in rows]
+
+
+def _print_headless_message(kind, payload, as_json, out):
+    """ Skriver én kø-besked. Med as_json skrives alt som {"type": ..., "data": ...}; ellers kun det læsbare. """
+    if as_json:
+        if kind == "results":
+            success_count, fail_count, failed_info, successful_info, is_retry = payload
+            payload = {"success_count": success_count, "fail_count": fail_count, "is_retry": is_retry,
+                       "failed": _headless_result_rows(failed_info), "successful": _headless_result_rows(successful_info)}
+        out.write(json.dumps({"type": kind, "data": payload}, ensure_ascii=False, default=str) + "\n")
+        out.flush()
+        return
+    if kind in ("log", "summary"):
+        print(payload, file=out)
+    elif kind in ("error", "error_detail"):
+        print(payload, file=sys.stderr)
+    elif kind == "results":
+        success_count, fail_count, failed_info, _, _ = payload
+        print(f"Succesfulde: {success_count}", file=out)
+        print(f"Mislykkede: {fail_count}", file=out)
+        for url, reason, source_key in failed_info:
+            print(f"- Kilde: {source_key}\n  URL: {url}\n  Årsag: {reason}", file=out)
+
+
+def run_headless(args):
+    """ Kører run_processing_thread_full (eller en distribueret coordinator/worker) uden GUI og skriver kø-beskederne til stdout.
+    Returnerer exit-kode: 0 = alt hentet, 1 = nogle downloads fejlede, 2 = kørslen gav intet resultat. """
+    workers = args.workers or (DEFAULT_MAX_ASYNC_CONCURRENCY if args.engine == DOWNLOAD_ENGINE_ASYNCIO else DEFAULT_MAX_CONCURRENT_DOWNLOADS)
+    q = queue.Queue()
+    out = sys.stdout
+    results = None
+    limiter = BandwidthLimiter(args.max_rate, dict(args.host_rate)) if args.max_rate or args.host_rate else None
+    output = os.path.abspath(args.output)
+    store_path = os.path.abspath(args.job_store) if args.job_store else os.path.join(output, JOBS_FILENAME)
+    if args.worker:
+        worker = threading.Thread(target=run_distributed_worker, args=(store_path, output, q, workers, args.timeout), kwargs=dict(limiter=limiter), daemon=True)
+    elif args.coordinator:
+        worker = threading.Thread(
+            target=run_distributed_processing,
+            args=([os.path.abspath(path) for path in args.excel], args.website, output, q, workers, args.timeout),
+            kwargs=dict(store_path=store_path, local_workers=args.local_workers, extraction_processes=args.extraction_processes, fast_scan=args.fast_scan,
+                        crawl_depth=args.crawl_depth, crawl_max_pages=args.crawl_max_pages, crawl_scope=args.crawl_scope, limiter=limiter),
+            daemon=True)
+    else:
+        worker = threading.Thread(
+            target=run_processing_thread_full,
+            args=([os.path.abspath(path) for path in args.excel], args.website, output, q, workers, args.timeout),
+            kwargs=dict(engine=args.engine, pipelined=args.pipelined, extraction_processes=args.extraction_processes, fast_scan=args.fast_scan, adaptive=args.adaptive,
+                        crawl_depth=args.crawl_depth, crawl_max_pages=args.crawl_max_pages, crawl_scope=args.crawl_scope, limiter=limiter, order=args.order,
+                        archive_format=args.archive),
+            daemon=True)
+    worker.start()
+    while worker.is_alive() or not q.empty():
+        try:
+            kind, payload = q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if kind == "results": results = payload
+        _print_headless_message(kind, payload, args.json, out)
+    if results is None: return 2
+    return 1 if results[1] else 0
+
+
+def run_gui():
+    root = tk.Tk()
+    app = DownloaderApp(root)
+    root.mainloop()
+
+
+def main(argv=None):
+    """ Indgang for `excel-link-downloader`: GUI uden argumenter (eller med --gui), ellers headless kørsel. """
+    argv = sys.argv[1:] if argv is None else argv
+    parser = _build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.gui or not argv:
+        run_gui()
+        return 0
+    if args.worker and args.coordinator:
+        parser.error("--worker og --coordinator kan ikke bruges sammen")
+    if args.worker or args.coordinator:
+        # Jobs lejes i lagerets rækkefølge af flere processer; de kan hverken sorteres efter størrelse eller skrive ét fælles arkiv
+        mode = "--worker" if args.worker else "--coordinator"
+        if args.archive: parser.error(f"--archive kan ikke bruges med {mode}")
+        if args.order != SCHEDULE_INPUT: parser.error(f"--order kan ikke bruges med {mode}")
+        if args.engine != DOWNLOAD_ENGINE_THREADS: parser.error(f"--engine {args.engine} kan ikke bruges med {mode}")
+        if args.pipelined: parser.error(f"--pipelined kan ikke bruges med {mode}")
+    if not args.worker and not (args.excel or args.website):
+        parser.error("angiv mindst én --excel eller --website")
+    if not args.output:
+        parser.error("--output er påkrævet")
+    return run_headless(args)
+
+
+# ----- GUI Klassen -----
+
+class DownloaderApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Excel & Website Link Downloader")
+        self.root.geometry("800x990") # Lidt bredere for URL listbox; højere for resultat-tabellen og indstillingerne
+
+        self.excel_files = []
+        self.website_urls = [] # Liste til website URLs
+        self.download_folder = ""
+        self.progress_queue = queue.Queue()
+        self.processing_thread = None
+        self.failed_downloads_info_last_run = []
+        self.run_summary_lines = [] # Ekstra linjer til resultat-opsummeringen ("summary" beskeder)
+        # Log-linjer samles her og skrives i ét insert pr. tick; maxlen gør bufferen til en ringbuffer
+        self.pending_log_lines = collections.deque(maxlen=GUI_LOG_MAX_LINES)
+        self.dropped_log_lines = 0
+        self.pending_progress = None # Seneste progress-værdi siden sidste tick
+        self.result_views = ([], []) # (mislykkede, succesfulde) for seneste kørsel: lister eller JournalView'er; vises side for side
+        self.results_page = 0
+
+        self.concurrency_var = tk.IntVar(value=DEFAULT_MAX_CONCURRENT_DOWNLOADS)
+        self.timeout_var = tk.IntVar(value=DEFAULT_DOWNLOAD_TIMEOUT)
+        self.use_async_var = tk.BooleanVar(value=False)
+        self.async_concurrency_var = tk.IntVar(value=DEFAULT_MAX_ASYNC_CONCURRENCY)
+        self.pipelined_var = tk.BooleanVar(value=False)
+        self.parallel_extraction_var = tk.BooleanVar(value=False)
+        self.fast_scan_var = tk.BooleanVar(value=False)
+        self.adaptive_var = tk.BooleanVar(value=True)
+        self.crawl_var = tk.BooleanVar(value=False)
+        self.crawl_depth_var = tk.IntVar(value=DEFAULT_CRAWL_DEPTH)
+        self.bandwidth_var = tk.StringVar(value="0") # MB/s; 0 = ubegrænset
+        self.bandwidth_var.trace_add("write", self.on_bandwidth_changed)
+        self.bandwidth_limiter = None # Den igangværende kørsels BandwidthLimiter
+        self.schedule_labels = {"Input-rækkefølge": SCHEDULE_INPUT, "Største filer først": SCHEDULE_LARGEST_FIRST, "Mindste filer først": SCHEDULE_SMALLEST_FIRST}
+        self.schedule_var = tk.StringVar(value="Input-rækkefølge")
+        self.output_labels = {"Mappe pr. kilde": None, "Zip-arkiv pr. kilde": ARCHIVE_ZIP, "Tar-arkiv pr. kilde": ARCHIVE_TAR}
+        self.output_var = tk.StringVar(value="Mappe pr. kilde")
+        self.bytes_progress_var = tk.StringVar(value="")
+
+        style = ttk.Style()
+        try: themes = style.theme_names(); style.theme_use(themes[0]) # Prøv OS standard
+        except: style.theme_use('clam') # Fallback
+
+        main_frame = ttk.Frame(root, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # --- Input Sektion (Excel + Website side om side) ---
+        input_frame = ttk.Frame(main_frame)
+        input_frame.pack(fill=tk.X, pady=5)
+
+        # 1a. Fil Valg (Venstre)
+        file_frame = ttk.LabelFrame(input_frame, text="1a. Vælg Excel Filer (.xlsx)", padding="10")
+        file_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 5))
+        self.select_files_button = ttk.Button(file_frame, text="Vælg Filer...", command=self.select_excel_files)
+        self.select_files_button.pack(pady=2, fill=tk.X) # Fyld bredden
+        self.file_list_box = tk.Listbox(file_frame, height=4, width=45) # Juster bredde
+        self.file_list_box.pack(fill=tk.BOTH, expand=True, pady=(2,0))
+
+        # 1b. Website URL Input (Højre)
+        url_frame = ttk.LabelFrame(input_frame, text="1b. Tilføj Website URL", padding="10")
+        url_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(5, 0))
+        self.url_entry_var = tk.StringVar() # For at kunne slette tekst nemmere
+        self.url_entry = ttk.Entry(url_frame, width=40, textvariable=self.url_entry_var)
+        self.url_entry.pack(pady=(2,0), ipady=2, fill=tk.X)
+        self.add_url_button = ttk.Button(url_frame, text="Tilføj URL", command=self.add_website_url)
+        self.add_url_button.pack(pady=2, fill=tk.X)
+        self.url_list_box = tk.Listbox(url_frame, height=2, width=45) # Matcher ca. bredde
+        self.url_list_box.pack(fill=tk.BOTH, expand=True, pady=(2,0))
+
+        # 2. Mappe Valg
+        folder_frame = ttk.LabelFrame(main_frame, text="2. Vælg Hoved-Download Mappe", padding="10")
+        folder_frame.pack(fill=tk.X, pady=5)
+        self.select_folder_button = ttk.Button(folder_frame, text="Vælg Mappe...", command=self.select_download_folder)
+        self.select_folder_button.pack(side=tk.LEFT, padx=5)
+        self.folder_label_var = tk.StringVar(value="Ingen mappe valgt (undermapper oprettes her)")
+        self.folder_label = ttk.Label(folder_frame, textvariable=self.folder_label_var, relief=tk.SUNKEN, padding=2)
+        self.folder_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+
+        # 3. Indstillinger (Sliders)
+        settings_frame = ttk.LabelFrame(main_frame, text="3. Indstillinger", padding="10")
+        settings_frame.pack(fill=tk.X, pady=5)
+        concurrency_label = ttk.Label(settings_frame, text="Max samtidige downloads:"); concurrency_label.grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+        self.concurrency_scale = ttk.Scale(settings_frame, from_=1, to=30, orient=tk.HORIZONTAL, length=200, variable=self.concurrency_var, command=self.update_concurrency_label); self.concurrency_scale.grid(row=0, column=1, padx=5, pady=5, sticky=tk.EW)
+        self.concurrency_value_label_var = tk.StringVar(value=f"{self.concurrency_var.get()}"); concurrency_value_label = ttk.Label(settings_frame, textvariable=self.concurrency_value_label_var, width=4); concurrency_value_label.grid(row=0, column=2, padx=5, pady=5)
+        timeout_label = ttk.Label(settings_frame, text="Download Timeout (sekunder):"); timeout_label.grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
+        self.timeout_scale = ttk.Scale(settings_frame, from_=5, to=120, orient=tk.HORIZONTAL, length=200, variable=self.timeout_var, command=self.update_timeout_label); self.timeout_scale.grid(row=1, column=1, padx=5, pady=5, sticky=tk.EW)
+        self.timeout_value_label_var = tk.StringVar(value=f"{self.timeout_var.get()}s"); timeout_value_label = ttk.Label(settings_frame, textvariable=self.timeout_value_label_var, width=5); timeout_value_label.grid(row=1, column=2, padx=5, pady=5)
+        self.use_async_check = ttk.Checkbutton(settings_frame, text="Brug asyncio-motor (max samtidige):", variable=self.use_async_var); self.use_async_check.grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
+        self.async_concurrency_spinbox = ttk.Spinbox(settings_frame, from_=1, to=10000, increment=50, textvariable=self.async_concurrency_var, width=8); self.async_concurrency_spinbox.grid(row=2, column=1, padx=5, pady=5, sticky=tk.W)
+        self.pipelined_check = ttk.Checkbutton(settings_frame, text="Start downloads mens links læses (pipeline)", variable=self.pipelined_var); self.pipelined_check.grid(row=3, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
+        self.parallel_extraction_check = ttk.Checkbutton(settings_frame, text="Læs Excel-filer parallelt (alle CPU-kerner)", variable=self.parallel_extraction_var); self.parallel_extraction_check.grid(row=4, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
+        self.fast_scan_check = ttk.Checkbutton(settings_frame, text="Hurtig scanning af .xlsx (læser XML direkte)", variable=self.fast_scan_var); self.fast_scan_check.grid(row=5, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
+        self.adaptive_check = ttk.Checkbutton(settings_frame, text="Tilpas samtidighed pr. host automatisk (max ovenfor er loftet)", variable=self.adaptive_var); self.adaptive_check.grid(row=6, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
+        self.crawl_check = ttk.Checkbutton(settings_frame, text="Crawl hjemmesider (følg links på samme sti), dybde:", variable=self.crawl_var); self.crawl_check.grid(row=7, column=0, padx=5, pady=5, sticky=tk.W)
+        self.crawl_depth_spinbox = ttk.Spinbox(settings_frame, from_=1, to=10, increment=1, textvariable=self.crawl_depth_var, width=8); self.crawl_depth_spinbox.grid(row=7, column=1, padx=5, pady=5, sticky=tk.W)
+        bandwidth_label = ttk.Label(settings_frame, text="Max båndbredde MB/s (0 = ubegrænset, kan ændres undervejs):"); bandwidth_label.grid(row=8, column=0, padx=5, pady=5, sticky=tk.W)
+        self.bandwidth_spinbox = ttk.Spinbox(settings_frame, from_=0, to=10000, increment=0.5, textvariable=self.bandwidth_var, width=8); self.bandwidth_spinbox.grid(row=8, column=1, padx=5, pady=5, sticky=tk.W)
+        schedule_label = ttk.Label(settings_frame, text="Rækkefølge (probe størrelser med HEAD):"); schedule_label.grid(row=9, column=0, padx=5, pady=5, sticky=tk.W)
+        self.schedule_combobox = ttk.Combobox(settings_frame, values=list(self.schedule_labels), textvariable=self.schedule_var, state="readonly", width=20); self.schedule_combobox.grid(row=9, column=1, padx=5, pady=5, sticky=tk.W)
+        output_label = ttk.Label(settings_frame, text="Gem downloads som (arkiv = færre filer, kun tråd-motoren):"); output_label.grid(row=10, column=0, padx=5, pady=5, sticky=tk.W)
+        self.output_combobox = ttk.Combobox(settings_frame, values=list(self.output_labels), textvariable=self.output_var, state="readonly", width=20); self.output_combobox.grid(row=10, column=1, padx=5, pady=5, sticky=tk.W)
+        settings_frame.columnconfigure(1, weight=1)
+
+        # 4. Progress Bar
+        progress_frame = ttk.Frame(main_frame, padding="5 0 5 0"); progress_frame.pack(fill=tk.X, pady=5)
+        self.progress_bar_label = ttk.Label(progress_frame, text="Fremskridt:"); self.progress_bar_label.pack(side=tk.LEFT, padx=(5, 2))
+        self.progress_bar = ttk.Progressbar(progress_frame, orient=tk.HORIZONTAL, length=300, mode='determinate'); self.progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
+        self.bytes_progress_label = ttk.Label(progress_frame, textvariable=self.bytes_progress_var, width=42); self.bytes_progress_label.pack(side=tk.LEFT, padx=(0, 5)) # MB hentet / forventet, hastighed og ETA
+
+        # 5. Kontrol Knapper
+        control_frame = ttk.Frame(main_frame, padding="5 0 10 0"); control_frame.pack(fill=tk.X)
+        self.start_button = ttk.Button(control_frame, text="Start Download", command=self.start_initial_processing, state=tk.DISABLED); self.start_button.pack(side=tk.LEFT, padx=5)
+        self.retry_button = ttk.Button(control_frame, text="Genforsøg Fejlede", command=self.start_retry_processing, state=tk.DISABLED); self.retry_button.pack(side=tk.LEFT, padx=5)
+
+        # 6. Status Log / Resultater
+        status_results_frame = ttk.LabelFrame(main_frame, text="Log og Resultater", padding="10")
+        status_results_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        self.results_text = scrolledtext.ScrolledText(status_results_frame, height=15, width=80, wrap=tk.WORD, state=tk.DISABLED); self.results_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        # Resultaterne vises i en tabel én side ad gangen i stedet for at blive skrevet ind i loggen
+        self.results_tree = ttk.Treeview(status_results_frame, columns=("status", "source", "detail", "url"), show="headings", height=8)
+        for column, heading, width in (("status", "Status", 60), ("source", "Kilde", 140), ("detail", "Filnavn / Årsag", 260), ("url", "URL", 300)):
+            self.results_tree.heading(column, text=heading); self.results_tree.column(column, width=width, stretch=(column != "status"))
+        self.results_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+        page_frame = ttk.Frame(status_results_frame); page_frame.pack(fill=tk.X, padx=5)
+        self.prev_page_button = ttk.Button(page_frame, text="< Forrige", command=lambda: self.show_results_page(self.results_page - 1), state=tk.DISABLED); self.prev_page_button.pack(side=tk.LEFT)
+        self.next_page_button = ttk.Button(page_frame, text="Næste >", command=lambda: self.show_results_page(self.results_page + 1), state=tk.DISABLED); self.next_page_button.pack(side=tk.LEFT, padx=5)
+        self.page_label_var = tk.StringVar(value=""); ttk.Label(page_frame, textvariable=self.page_label_var).pack(side=tk.LEFT, padx=5)
+        self.log_to_results("Klar. Vælg filer og/eller tilføj URLs, vælg mappe og juster indstillinger.")
+
+        self.check_queue()
+
+    def update_concurrency_label(self, value): self.concurrency_value_label_var.set(f"{int(float(value))}")
+    def update_timeout_label(self, value): self.timeout_value_label_var.set(f"{int(float(value))}s")
+
+    def select_excel_files(self):
+        selected = filedialog.askopenfilenames(
+            title="Vælg Excel fil(er)",
+            filetypes=[("Excel filer", "*.xlsx"), ("Alle filer", "*.*")]
+        )
+        if selected:
+            self.excel_files = list(selected)
+            self.file_list_box.delete(0, tk.END)
+            # Vis kun filnavne, ikke fulde stier
+            display_files = [os.path.basename(f) for f in self.excel_files]
+            max_display = 50
+            if len(display_files) > max_display:
+                for f_disp in display_files[:max_display]:
+                    self.file_list_box.insert(tk.END, f_disp)
+                self.file_list_box.insert(tk.END, f"... ({len(display_files) - max_display} flere)")
+            else:
+                for f_disp in display_files:
+                    self.file_list_box.insert(tk.END, f_disp)
+
+            self.update_start_button_state()
+            self.retry_button.config(state=tk.DISABLED)
+            self.failed_downloads_info_last_run = []
+            self.clear_log_and_results()
+
+    def add_website_url(self):
+        url = self.url_entry_var.get().strip() # Brug var til at få værdi
+        if url.lower().startswith(('http://', 'https://')):
+            if url not in self.website_urls:
+                 self.website_urls.append(url); self.url_list_box.insert(tk.END, url); self.url_entry_var.set("") # Ryd inputfelt via var
+                 self.update_start_button_state(); self.retry_button.config(state=tk.DISABLED); self.failed_downloads_info_last_run = []; self.clear_log_and_results()
+            else: messagebox.showinfo("URL Eksisterer", "Denne URL er allerede tilføjet.")
+        else: messagebox.showwarning("Ugyldig URL", "Indtast venligst en gyldig URL (starter med http:// eller https://).")
+
+    def select_download_folder(self):
+        selected = filedialog.askdirectory(title="Vælg HOVED mappe til downloads")
+        if selected: self.download_folder = selected; self.folder_label_var.set(selected); self.update_start_button_state(); self.retry_button.config(state=tk.DISABLED); self.failed_downloads_info_last_run = []; self.clear_log_and_results()
+
+    def update_start_button_state(self): self.start_button.config(state=tk.NORMAL) if (self.excel_files or self.website_urls) and self.download_folder else self.start_button.config(state=tk.DISABLED)
+
+    def clear_log_and_results(self):
+        self.pending_log_lines.clear(); self.dropped_log_lines = 0; self.pending_progress = None
+        self.results_text.config(state=tk.NORMAL); self.results_text.delete('1.0', tk.END); self.log_to_results("Klar."); self.results_text.config(state=tk.DISABLED); self.progress_bar['value'] = 0
+        self.bytes_progress_var.set("")
+        self.result_views = ([], []); self.show_results_page(0)
+
+    def disable_controls(self):
+        for btn in [self.select_files_button, self.select_folder_button, self.add_url_button, self.start_button, self.retry_button]: btn.config(state=tk.DISABLED)
+        for scale in [self.concurrency_scale, self.timeout_scale]: scale.config(state=tk.DISABLED)
+        for widget in [self.use_async_check, self.async_concurrency_spinbox, self.pipelined_check, self.parallel_extraction_check, self.fast_scan_check, self.adaptive_check, self.crawl_check, self.crawl_depth_spinbox]: widget.config(state=tk.DISABLED)
+        self.schedule_combobox.config(state=tk.DISABLED); self.output_combobox.config(state=tk.DISABLED)
+        self.url_entry.config(state=tk.DISABLED)
+
+    def enable_controls(self):
+        for btn in [self.select_files_button, self.select_folder_button, self.add_url_button]: btn.config(state=tk.NORMAL)
+        for scale in [self.concurrency_scale, self.timeout_scale]: scale.config(state=tk.NORMAL)
+        for widget in [self.use_async_check, self.async_concurrency_spinbox, self.pipelined_check, self.parallel_extraction_check, self.fast_scan_check, self.adaptive_check, self.crawl_check, self.crawl_depth_spinbox]: widget.config(state=tk.NORMAL)
+        self.schedule_combobox.config(state="readonly"); self.output_combobox.config(state="readonly")
+        self.url_entry.config(state=tk.NORMAL)
+        self.retry_button.config(state=tk.NORMAL) if self.failed_downloads_info_last_run else self.retry_button.config(state=tk.DISABLED)
+        self.update_start_button_state() # Start knap styres af om der er input
+
+    def start_initial_processing(self):
+        if not self.excel_files and not self.website_urls: messagebox.showwarning("Input Mangler", "Vælg venligst mindst én Excel fil eller tilføj en Website URL."); return
+        if not self.download_folder: messagebox.showwarning("Input Mangler", "Vælg venligst en download mappe."); return
+        self.disable_controls(); self.clear_log_and_results(); self.failed_downloads_info_last_run = []; engine, max_workers = self.get_engine_settings(); timeout = self.timeout_var.get(); self.log_to_results(f"Starter kørsel ({self.describe_engine(engine, max_workers)}, Timeout: {timeout}s)...")
+        # Klon listerne for at undgå race conditions hvis brugeren ændrer dem mens tråden kører
+        excel_files_copy = list(self.excel_files)
+        website_urls_copy = list(self.website_urls)
+        self.processing_thread = threading.Thread(
+            target=run_processing_thread_full,
+            args=(excel_files_copy, website_urls_copy, self.download_folder, self.progress_queue, max_workers, timeout, engine, self.pipelined_var.get(), (os.cpu_count() or 1) if self.parallel_extraction_var.get() else 0, self.fast_scan_var.get(), self.adaptive_var.get()),
+            kwargs={"crawl_depth": self.get_crawl_depth(), "limiter": self.new_bandwidth_limiter(), "order": self.schedule_labels.get(self.schedule_var.get(), SCHEDULE_INPUT),
+                    "archive_format": self.output_labels.get(self.output_var.get())},
+            daemon=True
+        )
+        self.processing_thread.start()
+
+    def start_retry_processing(self):
+        if not self.failed_downloads_info_last_run: messagebox.showinfo("Ingen Fejl", "Der er ingen fejlede downloads at genprøve."); return
+        if not self.download_folder: messagebox.showwarning("Mappe Mangler", "Vælg venligst en download mappe."); return
+        self.disable_controls(); self.log_to_results("\n--- STARTER GENFORSØG AF FEJLEDE ---")
+        # Input til run_download_task er tuples: [(url, reason, source_key), ...]; en JournalView læses fra journalen
+        failed_to_retry = self.failed_downloads_info_last_run
+        self.failed_downloads_info_last_run = []; # Nulstil listen
+        engine, max_workers = self.get_engine_settings(); timeout = self.timeout_var.get(); self.log_to_results(f"Genforsøger {len(failed_to_retry)} links ({self.describe_engine(engine, max_workers)}, Timeout: {timeout}s)...")
+        archive_format = self.output_labels.get(self.output_var.get())
+        task_kwargs = {"adaptive": self.adaptive_var.get(), "order": self.schedule_labels.get(self.schedule_var.get(), SCHEDULE_INPUT), "archive_format": archive_format,
+                       "engine": engine, "limiter": self.new_bandwidth_limiter()}
+        self.processing_thread = threading.Thread(target=run_download_task, args=(failed_to_retry, self.download_folder, self.progress_queue, max_workers, timeout, True), kwargs=task_kwargs, daemon=True); self.processing_thread.start()
+
+    def get_engine_settings(self):
+        """ Returnerer (engine, max samtidige) ud fra indstillingerne. """
+        if self.use_async_var.get():
+            try: concurrency = max(1, int(self.async_concurrency_var.get()))
+            except (tk.TclError, ValueError): concurrency = DEFAULT_MAX_ASYNC_CONCURRENCY
+            return DOWNLOAD_ENGINE_ASYNCIO, concurrency
+        return DOWNLOAD_ENGINE_THREADS, self.concurrency_var.get()
+
+    def get_crawl_depth(self):
+        """ 0 når crawl er slået fra, ellers dybden fra spinboxen. """
+        if not self.crawl_var.get(): return 0
+        try: return max(1, int(self.crawl_depth_var.get()))
+        except (tk.TclError, ValueError): return DEFAULT_CRAWL_DEPTH
+
+    def get_bandwidth_limit(self):
+        """ Båndbredde-grænsen fra spinboxen i bytes/s (0 = ubegrænset; ugyldig tekst tæller som 0). """
+        try: return max(0, int(float(self.bandwidth_var.get().replace(',', '.')) * 1024 * 1024))
+        except (tk.TclError, ValueError): return 0
+
+    def new_bandwidth_limiter(self):
+        """ Ny BandwidthLimiter til en kørsel; spinboxen justerer den så længe kørslen er i gang. """
+        self.bandwidth_limiter = BandwidthLimiter(self.get_bandwidth_limit())
+        return self.bandwidth_limiter
+
+    def on_bandwidth_changed(self, *_):
+        if self.bandwidth_limiter is not None:
+            self.bandwidth_limiter.set_global_rate(self.get_bandwidth_limit())
+
+    def describe_bytes_progress(self, data):
+        """ '12.3 / 48.0 MB (+2 ukendte), 4.1 MB/s, ca. 0:09 tilbage' ud fra en progress_bytes besked. """
+        text = f"{data['done'] / (1024 * 1024):.1f} / {data['expected'] / (1024 * 1024):.1f} MB"
+        if data['unknown']: text += f" (+{data['unknown']} ukendte)"
+        return f"{text}, {data['bytes_per_s'] / (1024 * 1024):.1f} MB/s, ca. {_format_eta(data['eta_s'])} tilbage"
+
+    def describe_engine(self, engine, max_workers):
+        return f"asyncio, max {max_workers} samtidige" if engine == DOWNLOAD_ENGINE_ASYNCIO else f"Max tråde: {max_workers}"
+
+    def check_queue(self):
+        """ Behandler kø-beskeder i højst GUI_QUEUE_TIME_BUDGET sekunder og tegner derefter én gang:
+        log-linjer i ét insert, progress med den seneste værdi. Resten af køen tages i næste tick. """
+        deadline = time.perf_counter() + GUI_QUEUE_TIME_BUDGET
+        more_waiting = False
+        try:
+            while True:
+                if time.perf_counter() > deadline:
+                    more_waiting = True
+                    break
+                message_type, data = self.progress_queue.get_nowait()
+                if message_type == "log":
+                    self.log_to_results(data)
+                elif message_type == "progress":
+                    self.pending_progress = data
+                elif message_type == "progress_max":
+                    max_val = data if data > 0 else 1
+                    self.progress_bar['maximum'] = max_val
+                    self.progress_bar['value'] = 0
+                    self.pending_progress = None
+                elif message_type == "progress_max_update": # Voksende maksimum (pipeline), nulstiller ikke værdien
+                    self.progress_bar['maximum'] = data if data > 0 else 1
+                elif message_type == "progress_bytes":
+                    self.bytes_progress_var.set(self.describe_bytes_progress(data))
+                elif message_type == "results":
+                    success_count, fail_count, failed_info, successful_info, is_retry = data
+                    self.display_results(success_count, fail_count, failed_info, successful_info, is_retry)
+                    self.failed_downloads_info_last_run = failed_info
+                elif message_type == "summary":
+                    self.run_summary_lines.append(data)
+                elif message_type == "error":
+                    self.log_error_to_results(f"FEJL: {data}")
+                elif message_type == "enable_buttons":
+                    self.enable_controls()
+        except queue.Empty:
+            pass
+        finally:
+            if self.pending_progress is not None:
+                self.progress_bar['value'] = self.pending_progress
+                self.pending_progress = None
+            self.flush_log()
+            # Er der stadig beskeder, fortsættes straks efter Tk har nået at tegne; ellers ventes et interval
+            self.root.after(1 if more_waiting else GUI_POLL_INTERVAL_MS, self.check_queue)
+
+    def log_to_results(self, message):
+        """ Lægger en linje i log-bufferen; den skrives til skærmen ved næste flush_log(). """
+        if len(self.pending_log_lines) == self.pending_log_lines.maxlen:
+            self.dropped_log_lines += 1 # Den ældste ventende linje skubbes ud af ringbufferen
+        self.pending_log_lines.append(message)
+
+    def flush_log(self):
+        """ Skriver ventende log-linjer i ét insert og beskærer loggen til GUI_LOG_MAX_LINES linjer. """
+        if not self.pending_log_lines: return
+        lines = list(self.pending_log_lines)
+        self.pending_log_lines.clear()
+        if self.dropped_log_lines:
+            lines.insert(0, f"... ({self.dropped_log_lines} log-linjer udeladt)")
+            self.dropped_log_lines = 0
+        try:
+            self.results_text.config(state=tk.NORMAL)
+            self.results_text.insert(tk.END, "\n".join(lines) + "\n")
+            line_count = int(self.results_text.index('end-1c').split('.')[0])
+            if line_count > GUI_LOG_MAX_LINES:
+                self.results_text.delete('1.0', f"{line_count - GUI_LOG_MAX_LINES + 1}.0")
+            self.results_text.config(state=tk.DISABLED)
+            self.results_text.see(tk.END)
+        except tk.TclError as e:
+            print(f"      - Advarsel: Kunne ikke skrive til log-vinduet (TclError): {e}", file=sys.stderr)
+
+    def log_error_to_results(self, error_message):
+        self.log_to_results(f"*** {error_message} ***")
+
+    def display_results(self, success_count, fail_count, failed_info, successful_info, is_retry):
+        result_header = "RESULTATER (GENFORSØG)" if is_retry else "RESULTATER"
+        self.log_to_results(f"\n--- {result_header} ---")
+        self.log_to_results(f"Succesfulde: {success_count}")
+        self.log_to_results(f"Mislykkede: {fail_count}")
+        for summary_line in self.run_summary_lines:
+            self.log_to_results(summary_line)
+        self.run_summary_lines = []
+        self.log_to_results("------------------ (detaljer i tabellen nedenfor)")
+        # Mislykkede først, så de er på de første sider; rækkerne hentes først når en side vises
+        self.result_views = (failed_info, successful_info)
+        self.show_results_page(0)
+
+    def show_results_page(self, page):
+        """ Viser én side (GUI_RESULTS_PAGE_SIZE rækker) af resultaterne; tabellen holder aldrig mere end det.
+        Med JournalView'er læses kun sidens rækker fra journalen. """
+        failed_info, successful_info = self.result_views
+        row_count = len(failed_info) + len(successful_info)
+        page_count = max(1, -(-row_count // GUI_RESULTS_PAGE_SIZE))
+        self.results_page = min(max(0, page), page_count - 1)
+        start = self.results_page * GUI_RESULTS_PAGE_SIZE
+        end = start + GUI_RESULTS_PAGE_SIZE
+        rows = [("Fejl", source_key, reason, url) for url, reason, source_key in failed_info[start:end]]
+        rows.extend(("OK", source_key, filename, url) for url, filename, source_key in successful_info[max(0, start - len(failed_info)):max(0, end - len(failed_info))])
+        self.results_tree.delete(*self.results_tree.get_children())
+        for row in rows:
+            self.results_tree.insert("", tk.END, values=row)
+        if row_count:
+            self.page_label_var.set(f"Side {self.results_page + 1} af {page_count} (række {start + 1}-{min(end, row_count)} af {row_count})")
+        else:
+            self.page_label_var.set("")
+        self.prev_page_button.config(state=tk.NORMAL if self.results_page > 0 else tk.DISABLED)
+        self.next_page_button.config(state=tk.NORMAL if self.results_page < page_count - 1 else tk.DISABLED)
+
+
+# ----- Start Applikationen -----
+if __name__ == "__main__":
+    sys.exit(main())
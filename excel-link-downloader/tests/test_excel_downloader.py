@@ -1,5 +1,144 @@
+import http.server
+import subprocess
+import sys
+import threading
 import unittest
-from src.excel_downloader import sanitize_filename, get_filename_from_url, download_file_threaded
+from src.excel_downloader import sanitize_filename, get_filename_from_url, download_file_threaded, classify_failure, main, DownloadMetrics, _download_event, _CrawlScope, crawl_websites, CRAWL_SCOPE_PATH, CRAWL_SCOPE_HOST, iter_html_links, peek_stream, looks_like_html, correct_extension, FilenameIndex, _segment_ranges, _download_segmented, _get, parse_rate, BandwidthLimiter, schedule_order, probe_sizes, ByteProgress, SCHEDULE_LARGEST_FIRST, SCHEDULE_SMALLEST_FIRST, JobStore, run_distributed_coordinator, ArchiveWriter, place_archived_download, RunJournal, place_download_for_source, DownloadManifest, _page_links, scan_xlsx_links_fast, _read_excel_links, UnsafeWorkbook, download_file_async, _print_headless_message, JOURNAL_KEEP_RUNS, run_download_task, run_download_task_async, JournalView, run_pipelined_processing, run_distributed_worker, _partial_paths, DownloadSession, extract_links_from_files, extract_links_from_files_parallel, ContentIndex, canonicalize_url, build_url_index, HostConcurrencyController
+
+class _LocalHandler(http.server.BaseHTTPRequestHandler):
+    """ Lille testserver: /html giver en HTML-side, /cut lover flere bytes end den sender, /flaky svarer 503 første gang,
+    /throttled svarer 503 med Retry-After: 1 første gang, /gone svarer altid 416, /missing 404, alt andet er en PDF. """
+    protocol_version = 'HTTP/1.1'
+    flaky_seen = set()
+    def log_message(self, *args): pass
+    def do_GET(self):
+        if self.path.startswith('/flaky') and self.path not in self.flaky_seen:
+            self.flaky_seen.add(self.path)
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.startswith('/throttled') and self.path not in self.flaky_seen:
+            self.flaky_seen.add(self.path)
+            self.send_response(503)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.startswith(('/gone', '/missing')):
+            self.send_response(416 if self.path.startswith('/gone') else 404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.startswith('/html'):
+            body, content_type = b'<!doctype html><html><body>fejl</body></html>', 'text/html'
+        else:
+            body, content_type = b'%PDF-1.4 ' + self.path.encode() * 200, 'application/pdf'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body) * 2 if self.path.startswith('/cut') else len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if self.path.startswith('/cut'): self.close_connection = True
+
+class _RangeHandler(http.server.BaseHTTPRequestHandler):
+    """ Testserver med ETag: /ranged svarer 206 på Range (hvis If-Range passer), /norange altid 200, og If-None-Match
+    med den aktuelle ETag giver 304. Første svar på en sti i cut afbrydes efter en tredjedel af filen. """
+    protocol_version = 'HTTP/1.1'
+    body = bytes(range(256)) * 1024
+    etag = '"v1"'
+    cut = set()
+    requests = []
+    def log_message(self, *args): pass
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get('Range'), self.headers.get('If-Range'), self.headers.get('If-None-Match')))
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('ETag', self.etag)
+            self.end_headers()
+            return
+        body = self.body
+        byte_range = self.headers.get('Range')
+        if byte_range and self.path.startswith('/ranged') and self.headers.get('If-Range') in (self.etag, None):
+            start, _, end = byte_range.split('=')[1].partition('-')
+            start, end = int(start), int(end) if end else len(self.body) - 1
+            body = self.body[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{len(self.body)}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('ETag', self.etag)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.path in self.cut:
+            self.cut.discard(self.path)
+            self.wfile.write(body[:len(body) // 3])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+class _CrawlHandler(http.server.BaseHTTPRequestHandler):
+    """ Lille website til crawl-tests: robots.txt forbyder /site/private og kræver 1 sekund mellem requests.
+    requests logger (sti, tidspunkt) for hver request. """
+    pages = {
+        "/site/": ["/site/a", "/site/b", "/site/private", "/site/f0.pdf"],
+        "/site/a": ["/site/a2", "/site/fa.pdf"],
+        "/site/b": ["/site/fb.pdf"],
+        "/site/a2": ["/site/deep.pdf"],
+        "/site/private": ["/site/secret.pdf"],
+    }
+    requests = []
+    def log_message(self, *args): pass
+    def do_GET(self):
+        import time
+        self.requests.append((self.path, time.monotonic()))
+        if self.path == "/robots.txt":
+            body, content_type = b"User-agent: *\nDisallow: /site/private\nCrawl-delay: 1\n", 'text/plain'
+        elif self.path in self.pages:
+            body = "<html><body>" + "".join(f'<a href="{link}">x</a>' for link in self.pages[self.path]) + "</body></html>"
+            body, content_type = body.encode(), 'text/html'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class _SizedHandler(http.server.BaseHTTPRequestHandler):
+    """ /<sti>-<n>.pdf er en PDF på n bytes. HEAD på /nohead-... giver 405, og /nolength-... svarer uden Content-Length.
+    gets logger stierne i den rækkefølge GET-requests kommer. """
+    protocol_version = 'HTTP/1.1'
+    gets = []
+    def log_message(self, *args): pass
+    def _body(self):
+        size = int(self.path.rsplit('-', 1)[1].split('.')[0])
+        return b'%PDF-1.4 ' + b'x' * (size - 9)
+    def do_HEAD(self):
+        if self.path.startswith('/nohead'):
+            self.send_response(405)
+            self.send_header('Content-Length', '0')
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/pdf')
+            if not self.path.startswith('/nolength'): self.send_header('Content-Length', str(len(self._body())))
+        self.end_headers()
+    def do_GET(self):
+        self.gets.append(self.path)
+        body = self._body()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def _serve(handler):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
 
 class TestExcelDownloader(unittest.TestCase):
 
@@ -30,5 +169,684 @@ class TestExcelDownloader(unittest.TestCase):
         # For now, we will just assert that the function exists
         self.assertTrue(callable(download_file_threaded))
 
+    def test_download_file_async_writes_part_and_cleans_up(self):
+        import aiohttp, asyncio, os, queue, tempfile
+        server, base_url = _serve(_LocalHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+
+        async def fetch_all(folder, manifest):
+            async with aiohttp.ClientSession() as http_session:
+                return [await download_file_async(f"{base_url}{path}", folder, queue.Queue(), 5, "a", http_session, manifest) for path in ("/doc.pdf", "/html.pdf", "/cut.pdf", "/gone.pdf")]
+
+        with tempfile.TemporaryDirectory() as folder:
+            # En afbrudt download fra tråd-motoren; dens .part og metadata skal overleve asyncio-motoren
+            self.assertFalse(download_file_threaded(f"{base_url}/cut.pdf", folder, queue.Queue(), 5, "a")[0])
+            threaded_partial = sorted(os.listdir(folder))
+            manifest = DownloadManifest(folder)
+            ok, html, cut, gone = asyncio.run(fetch_all(folder, manifest))
+            self.assertEqual(ok, (True, (f"{base_url}/doc.pdf", "doc.pdf", "a")))
+            self.assertFalse(html[0]); self.assertIn("HTML", html[1][1])
+            self.assertFalse(cut[0])
+            self.assertEqual(classify_failure(gone[1][1]), ("permanent", None)) # Statuskoden kan læses som fra requests
+            # Kun den komplette fil er kommet til: ingen asyncio .part-filer, ingen afkortet cut.pdf og ingen tom html.pdf
+            self.assertEqual(sorted(os.listdir(folder)), sorted(threaded_partial + ["doc.pdf"]))
+            self.assertEqual(manifest.names().reserve("cut.pdf"), os.path.join(folder, "cut.pdf"))
+            self.assertEqual(manifest.get(f"{base_url}/doc.pdf")["filename"], "doc.pdf")
+
+    def test_engines_journal_results_for_shared_links(self):
+        import os, queue, tempfile
+        server, base_url = _serve(_LocalHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+        for number, (engine, kwargs) in enumerate(((run_download_task, {"adaptive": True}), (run_download_task, {"adaptive": False}), (run_download_task_async, {}))):
+            links = {"a": {f"{base_url}/f{i}.pdf" for i in range(30)} | {f"{base_url}/html.pdf", f"{base_url}/flaky{number}.pdf"},
+                     "b": {f"{base_url}/f{i}.pdf" for i in range(0, 30, 3)}}
+            with self.subTest(engine=engine.__name__, **kwargs), tempfile.TemporaryDirectory() as folder:
+                q = queue.Queue()
+                engine(links, folder, q, 2, 5, **kwargs)
+                messages = []
+                while not q.empty(): messages.append(q.get())
+                success_count, fail_count, failed, successful, _ = next(payload for kind, payload in messages if kind == "results")
+                self.assertEqual((success_count, fail_count), (41, 1))
+                self.assertIsInstance(successful, JournalView)
+                self.assertEqual([row[0] for row in failed], [f"{base_url}/html.pdf"])
+                self.assertEqual(sorted(row[1] for row in successful if row[2] == "b"), sorted(f"f{i}.pdf" for i in range(0, 30, 3)))
+                self.assertEqual([payload for kind, payload in messages if kind == "progress"][-1], 42)
+                self.assertEqual(len([name for name in os.listdir(os.path.join(folder, "b")) if name.endswith(".pdf")]), 10)
+                # Begge motorer går gennem samme planlægning: delte links hentes én gang, 503 forsøges igen, manifest og bytes meldes
+                events = [event for kind, event in messages if kind == "event"]
+                self.assertEqual(len(events), 33)
+                self.assertEqual([event["attempt"] for event in events if event["url"].endswith(f"/flaky{number}.pdf")], [1, 2])
+                self.assertTrue(os.path.exists(os.path.join(folder, "b", ".download_manifest.json")))
+                self.assertTrue(any(kind == "progress_bytes" for kind, _ in messages))
+
+    def test_pipeline_feeds_the_download_scheduler(self):
+        import openpyxl, os, queue, tempfile
+        server, base_url = _serve(_LocalHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+        with tempfile.TemporaryDirectory() as folder:
+            excel_paths = []
+            for name, urls in (("one", [f"{base_url}/p{i}.pdf" for i in range(40)] + [f"{base_url}/flaky.pdf"]), ("two", [f"{base_url}/p{i}.pdf" for i in range(0, 40, 4)])):
+                workbook = openpyxl.Workbook()
+                for row, url in enumerate(urls, start=1): workbook.active.cell(row=row, column=1, value=url)
+                excel_paths.append(os.path.join(folder, f"{name}.xlsx"))
+                workbook.save(excel_paths[-1])
+            q = queue.Queue()
+            run_pipelined_processing(excel_paths, [], os.path.join(folder, "out"), q, 3, 5, queue_size=4, extraction_processes=0)
+            messages = []
+            while not q.empty(): messages.append(q.get())
+            success_count, fail_count, failed, successful, _ = next(payload for kind, payload in messages if kind == "results")
+            self.assertEqual((success_count, fail_count), (51, 0))
+            self.assertIsInstance(successful, JournalView)
+            # Samme planlægning som run_download_task: 503 forsøges igen, og delte links hentes én gang
+            self.assertEqual([event["attempt"] for kind, event in messages if kind == "event" and event["url"].endswith("/flaky.pdf")], [1, 2])
+            self.assertEqual(sum(1 for kind, _ in messages if kind == "event"), 42)
+            self.assertEqual([payload for kind, payload in messages if kind == "progress_max_update"][-1], 51)
+            self.assertEqual(len([name for name in os.listdir(os.path.join(folder, "out", "Excel_two")) if name.endswith(".pdf")]), 10)
+
+    def test_download_session_reuses_connections_across_threads(self):
+        import concurrent.futures, queue, tempfile
+        server, base_url = _serve(_LocalHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+        session = DownloadSession(max_workers=2)
+        self.addCleanup(session.close)
+        with tempfile.TemporaryDirectory() as folder:
+            for i in range(3): self.assertTrue(download_file_threaded(f"{base_url}/s{i}.pdf", folder, queue.Queue(), 5, "a", session)[0])
+            self.assertEqual(session.connection_stats(), {"opened": 1, "reused": 2, "requests": 3})
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                results = list(executor.map(lambda i: download_file_threaded(f"{base_url}/t{i}.pdf", folder, queue.Queue(), 5, "a", session), range(12)))
+            self.assertTrue(all(success for success, _ in results))
+            stats = session.connection_stats()
+            self.assertEqual(stats["requests"], 15)
+            self.assertLessEqual(stats["opened"], 2) # Trådene deler poolen: højst én forbindelse pr. tråd
+
+    def test_resume_part_file_with_range_and_if_range(self):
+        import os, queue, tempfile
+        server, base_url = _serve(_RangeHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+        body = _RangeHandler.body
+        with tempfile.TemporaryDirectory() as folder:
+            for path in ("/ranged.bin", "/norange.bin"):
+                with self.subTest(path=path):
+                    url = f"{base_url}{path}"
+                    _RangeHandler.cut.add(path)
+                    self.assertFalse(download_file_threaded(url, folder, queue.Queue(), 5, "a")[0])
+                    part_path, meta_path = _partial_paths(folder, url)
+                    offset = os.path.getsize(part_path)
+                    self.assertTrue(0 < offset <= len(body) // 3)
+                    success, (_, filename, _) = download_file_threaded(url, folder, queue.Queue(), 5, "a")
+                    self.assertTrue(success)
+                    # Genoptagelsen beder om resten med If-Range; et 200-svar starter forfra i stedet for at hænge det på
+                    self.assertEqual(_RangeHandler.requests[-1][1:3], (f"bytes={offset}-", _RangeHandler.etag))
+                    with open(os.path.join(folder, filename), 'rb') as f: self.assertEqual(f.read(), body)
+                    self.assertFalse(os.path.exists(part_path) or os.path.exists(meta_path))
+
+    def test_416_without_resume_is_an_error(self):
+        import os, queue, tempfile
+        server, base_url = _serve(_LocalHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+        url = f"{base_url}/gone.pdf"
+        with tempfile.TemporaryDirectory() as folder:
+            success, (_, reason, _) = download_file_threaded(url, folder, queue.Queue(), 5, "a")
+            self.assertFalse(success)
+            self.assertIn("416", reason) # HTTP-fejlen, ikke en FileNotFoundError fra den manglende .part-fil
+            archive = ArchiveWriter(os.path.join(folder, "a.zip"), "zip")
+            self.assertFalse(download_file_threaded(url, folder, queue.Queue(), 5, "a", archive=archive)[0])
+            archive.close()
+            self.assertEqual(archive.added_count, 0) # Intet tomt medlem i arkivet
+
+    def test_segmented_download_against_range_server(self):
+        import hashlib, os, tempfile
+        server, base_url = _serve(_RangeHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+        body = _RangeHandler.body
+        session = DownloadSession(max_workers=4)
+        self.addCleanup(session.close)
+        with tempfile.TemporaryDirectory() as folder:
+            part_path = os.path.join(folder, "x.part")
+            url = f"{base_url}/ranged.bin"
+            _RangeHandler.requests.clear()
+            response = _get(url, 5, session)
+            self.assertEqual(_download_segmented(url, response, response.iter_content(8192), part_path, len(body), 5, session, _RangeHandler.etag, 4), len(body))
+            with open(part_path, 'rb') as f: self.assertEqual(hashlib.sha256(f.read()).hexdigest(), hashlib.sha256(body).hexdigest())
+            # Det første interval kommer fra det åbne svar; de øvrige hentes med Range + If-Range
+            self.assertEqual(sorted(request[1:3] for request in _RangeHandler.requests[1:]),
+                             sorted((f"bytes={start}-{end}", _RangeHandler.etag) for start, end in _segment_ranges(len(body), 4)[1:]))
+
+            # Ændret fil (If-Range passer ikke) eller en server der ignorerer Range: 200 i stedet for 206 afbryder
+            for url, if_range in ((f"{base_url}/ranged.bin", '"v0"'), (f"{base_url}/norange.bin", _RangeHandler.etag)):
+                with self.subTest(url=url, if_range=if_range):
+                    response = _get(url, 5, session)
+                    with self.assertRaisesRegex(IOError, "sendte ikke intervallet"):
+                        _download_segmented(url, response, response.iter_content(8192), part_path, len(body), 5, session, if_range, 4)
+
+    def test_manifest_skips_unchanged_files_with_etag(self):
+        import hashlib, os, queue, tempfile
+        server, base_url = _serve(_RangeHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+        url = f"{base_url}/ranged.bin"
+        with tempfile.TemporaryDirectory() as folder:
+            manifest = DownloadManifest(folder)
+            self.assertEqual(download_file_threaded(url, folder, queue.Queue(), 5, "a", manifest=manifest), (True, (url, "ranged.bin", "a")))
+            manifest.save()
+            manifest = DownloadManifest(folder) # Næste kørsel læser manifestet fra disken
+            entry = manifest.get(url)
+            self.assertEqual((entry["filename"], entry["size"], entry["etag"]), ("ranged.bin", len(_RangeHandler.body), _RangeHandler.etag))
+            self.assertEqual(entry["sha256"], hashlib.sha256(_RangeHandler.body).hexdigest())
+            self.assertEqual(download_file_threaded(url, folder, queue.Queue(), 5, "a", manifest=manifest), (True, (url, "ranged.bin", "a")))
+            self.assertEqual(_RangeHandler.requests[-1][3], _RangeHandler.etag) # If-None-Match -> 304
+            self.assertEqual(manifest.unchanged_count, 1)
+            self.assertEqual(sorted(os.listdir(folder)), [".download_manifest.json", "ranged.bin"])
+            with open(os.path.join(folder, "ranged.bin"), 'r+b') as f: f.truncate(10)
+            self.assertIsNone(manifest.get(url)) # Filen er ændret lokalt; betinget request ville genbruge en forkert fil
+
+    def test_shared_manifests_merge_on_save(self):
+        import os, tempfile
+        with tempfile.TemporaryDirectory() as folder:
+            for name in ("a.pdf", "b.pdf"):
+                with open(os.path.join(folder, name), 'wb') as f: f.write(b"x")
+            first, second = DownloadManifest(folder, shared=True), DownloadManifest(folder, shared=True)
+            first.record("https://x.dk/a.pdf", "a.pdf", 1, '"a"', None, "00")
+            second.record("https://x.dk/b.pdf", "b.pdf", 1, '"b"', None, "11")
+            first.save(); second.save()
+            merged = DownloadManifest(folder)
+            self.assertEqual((merged.get("https://x.dk/a.pdf")["etag"], merged.get("https://x.dk/b.pdf")["etag"]), ('"a"', '"b"'))
+
+    def test_canonical_urls_are_fetched_once_and_fanned_out(self):
+        import os, queue, tempfile
+        self.assertEqual(canonicalize_url("HTTPS://Example.COM:443/a%7eb/c d?q=%2f#frag"), "https://example.com/a~b/c%20d?q=%2F")
+        self.assertEqual(canonicalize_url("http://example.com:80"), "http://example.com/")
+        self.assertEqual(canonicalize_url("http://example.com:8080/x"), "http://example.com:8080/x")
+        self.assertEqual(canonicalize_url("http://user:pw@Host.dk/x"), "http://user:pw@host.dk/x")
+        self.assertEqual(canonicalize_url("http://bad:port/x"), "http://bad:port/x") # Ugyldig port: uændret
+        self.assertEqual(build_url_index({"a": ["https://x.dk/f.pdf", "https://X.dk/g.pdf"], "b": ["https://x.dk:443/f.pdf#top"]}),
+                         {"https://x.dk/f.pdf": [("a", "https://x.dk/f.pdf"), ("b", "https://x.dk:443/f.pdf#top")], "https://x.dk/g.pdf": [("a", "https://X.dk/g.pdf")]})
+
+        server, base_url = _serve(_LocalHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+        links = {"a": [f"{base_url}/shared.pdf"], "b": [f"{base_url}/shared.pdf#side2"], "c": [base_url.replace("127.0.0.1", "127.0.0.1.") + "/shared.pdf"]}
+        with tempfile.TemporaryDirectory() as folder:
+            q = queue.Queue()
+            run_download_task(links, folder, q, 2, 5)
+            messages = []
+            while not q.empty(): messages.append(q.get())
+            self.assertEqual(sum(1 for kind, _ in messages if kind == "event"), 1) # Hentet én gang
+            success_count, fail_count, _, successful, _ = next(payload for kind, payload in messages if kind == "results")
+            self.assertEqual((success_count, fail_count), (3, 0))
+            self.assertEqual(sorted((source_key, url) for url, _, source_key in successful), sorted((key, urls[0]) for key, urls in links.items()))
+            with open(os.path.join(folder, "a", "shared.pdf"), 'rb') as f: original = f.read()
+            for source_key in ("b", "c"):
+                with open(os.path.join(folder, source_key, "shared.pdf"), 'rb') as f: self.assertEqual(f.read(), original)
+
+    def test_classify_failure(self):
+        self.assertEqual(classify_failure("Timeout (30s)"), ("timeout", None))
+        self.assertEqual(classify_failure("Request Fejl: 503 Server Error: x [Retry-After: 7]"), ("throttled", 7))
+        self.assertEqual(classify_failure("Request Fejl: 404 Client Error: Not Found"), ("permanent", None))
+        self.assertEqual(classify_failure("Værdi Fejl: Modtog HTML (Content-Type: text/html)"), ("html", None))
+
+    def test_run_download_task_retries_transient_failures_only(self):
+        import queue, tempfile
+        server, base_url = _serve(_LocalHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+        _LocalHandler.flaky_seen.discard("/throttled.pdf")
+        with tempfile.TemporaryDirectory() as folder:
+            q = queue.Queue()
+            run_download_task({"a": [f"{base_url}/throttled.pdf", f"{base_url}/missing.pdf"]}, folder, q, 2, 5, adaptive=False)
+            messages = []
+            while not q.empty(): messages.append(q.get())
+            events = [event for kind, event in messages if kind == "event"]
+            throttled = [event for event in events if event["url"].endswith("/throttled.pdf")]
+            self.assertEqual([(event["attempt"], event["status"], event["http_status"]) for event in throttled], [(1, "retry", 503), (2, "ok", 200)])
+            self.assertGreaterEqual(throttled[1]["ts"] - throttled[0]["ts"], 0.9) # Retry-After: 1 er overholdt
+            # 404 er permanent: ét forsøg, ingen genforsøg
+            self.assertEqual([(event["attempt"], event["status"], event["category"]) for event in events if event["url"].endswith("/missing.pdf")], [(1, "failed", "permanent")])
+            success_count, fail_count, failed, _, _ = next(payload for kind, payload in messages if kind == "results")
+            self.assertEqual((success_count, fail_count), (1, 1))
+            self.assertNotIn("[forsøg:", list(failed)[0][1])
+
+    def test_host_concurrency_controller_aimd(self):
+        controller = HostConcurrencyController(16, initial_limit=2, decrease_cooldown=60)
+        acquire = lambda count: [controller.try_acquire("a") for _ in range(count)]
+        self.assertEqual(acquire(3), [True, True, False])
+        for _ in range(2): controller.release("a", True, "a.pdf", 0.1)
+        self.assertEqual(controller.limits(), {"a": 4}) # Slow start: fordobling efter en runde hurtige succeser
+        self.assertEqual(acquire(5), [True] * 4 + [False])
+        controller.release("a", False, "Timeout (30s)", 30.0)
+        self.assertEqual(controller.limits(), {"a": 2})
+        controller.release("a", False, "Request Fejl: 503 Server Error", 0.1) # Inden for cooldown: ingen ny halvering
+        controller.release("a", False, "Request Fejl: 404 Client Error: Not Found", 0.1) # Ikke overbelastning
+        controller.release("a", True, "a.pdf", 0.1)
+        self.assertEqual(controller.limits(), {"a": 2})
+        self.assertEqual(acquire(3), [True, True, False])
+        controller.release("a", True, "a.pdf", 0.1)
+        self.assertEqual(controller.limits(), {"a": 3}) # Efter en halvering: +1 pr. runde
+        controller.release("a", True, "a.pdf", 5.0) # Markant langsommere svar tæller ikke med
+        self.assertEqual(acquire(3), [True] * 3)
+        for _ in range(2): controller.release("a", True, "a.pdf", 0.1)
+        self.assertEqual(controller.limits(), {"a": 3})
+        controller.release("a", True, "a.pdf", 0.1)
+        self.assertEqual(controller.limits(), {"a": 4})
+
+        ceiling = HostConcurrencyController(3, initial_limit=2)
+        self.assertEqual([ceiling.try_acquire(host) for host in ("a", "a", "b", "b")], [True, True, True, False]) # Samlet loft
+        self.assertEqual(ceiling.total_in_flight, 3)
+
+    def test_download_metrics_aggregates_events(self):
+        metrics = DownloadMetrics()
+        timings = {"http_status": 200, "bytes": 1000, "connect_s": 0.01, "ttfb_s": 0.05, "transfer_s": 0.2, "disk_s": 0.01, "total_s": 0.3}
+        metrics.record(_download_event(metrics.run_id, "http://a.example/x.pdf", "Excel_a", (True, ("http://a.example/x.pdf", "x.pdf", "Excel_a")), timings, 1))
+        metrics.record(_download_event(metrics.run_id, "http://a.example/y.pdf", "Excel_a", (False, ("http://a.example/y.pdf", "Timeout (30s)", "Excel_a")), {"total_s": 30.0}, 1, will_retry=True))
+        summary = metrics.host_summaries()["a.example"]
+        self.assertEqual((summary["ok"], summary["retry"], summary["bytes"]), (1, 1, 1000))
+        text = metrics.prometheus_text()
+        self.assertIn('excel_downloader_downloads_total{host="a.example",status="retry"} 1', text)
+        self.assertIn('excel_downloader_download_duration_seconds_bucket{host="a.example",le="0.5"} 1', text)
+        self.assertIn('excel_downloader_download_duration_seconds_count{host="a.example"} 2', text)
+
+    def test_crawl_scope(self):
+        path_scope = _CrawlScope("https://portal.example/docs/index.html", CRAWL_SCOPE_PATH)
+        self.assertTrue(path_scope.contains("https://portal.example/docs/page2.html"))
+        self.assertFalse(path_scope.contains("https://portal.example/other/page.html"))
+        self.assertFalse(path_scope.contains("https://cdn.example/docs/page2.html"))
+        host_scope = _CrawlScope("https://portal.example/docs/", CRAWL_SCOPE_HOST)
+        self.assertTrue(host_scope.contains("https://PORTAL.example/other/page.html"))
+
+    def test_crawl_websites_depth_pages_robots_and_delay(self):
+        import queue
+        server, base_url = _serve(_CrawlHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+        _CrawlHandler.requests.clear()
+        links = crawl_websites([f"{base_url}/site/"], queue.Queue(), 5, max_depth=1, max_pages=10, host_delay=0.0)
+        # Dybde 1: a2 (og deep.pdf) nås ikke; /site/private er forbudt i robots.txt og hentes aldrig
+        self.assertEqual(links, {f"{base_url}/site/{name}" for name in ("f0.pdf", "fa.pdf", "fb.pdf")})
+        paths = [path for path, _ in _CrawlHandler.requests]
+        self.assertEqual(paths.count("/robots.txt"), 1)
+        self.assertEqual(sorted(path for path in paths if path != "/robots.txt"), ["/site/", "/site/a", "/site/b"])
+        # Crawl-delay fra robots.txt gælder mellem siderne, også selvom host_delay er 0
+        page_times = [at for path, at in _CrawlHandler.requests if path != "/robots.txt"]
+        self.assertTrue(all(later - earlier >= 0.9 for earlier, later in zip(page_times, page_times[1:])))
+
+        _CrawlHandler.requests.clear()
+        links = crawl_websites([f"{base_url}/site/"], queue.Queue(), 5, max_depth=2, max_pages=2, host_delay=0.0)
+        self.assertEqual(links, {f"{base_url}/site/f0.pdf", f"{base_url}/site/fa.pdf"}) # Kun start-siden og /site/a
+        self.assertEqual(sorted(path for path, _ in _CrawlHandler.requests if path != "/robots.txt"), ["/site/", "/site/a"])
+
+    def test_iter_html_links_streams_chunks_and_honours_base(self):
+        page = '<html><head><meta charset="iso-8859-1"><base href="https://files.example/root/"></head><body>' \
+               '<a href="a.pdf">A</a><a href="b%20%C3%A6.xlsx?x=1&amp;y=2">B</a><a href="sub/">S</a><a href="a.pdf">dup</a>' \
+               '<a href="mailto:x@example.com">M</a><a href="æ.zip">Æ</a></body></html>'
+        data = page.encode("iso-8859-1")
+        chunks = [data[i:i + 3] for i in range(0, len(data), 3)] # Tags og tegn deles over bidder
+        self.assertEqual(list(iter_html_links("http://portal.example/docs/index.html", chunks, "text/html")), [
+            ("file", "https://files.example/root/a.pdf"),
+            ("file", "https://files.example/root/b%20%C3%A6.xlsx?x=1&y=2"),
+            ("page", "https://files.example/root/sub/"),
+            ("file", "https://files.example/root/æ.zip"),
+        ])
+
+    def test_streaming_parser_matches_bs4(self):
+        import bs4
+        page = '<html><head><base href="https://files.example/root/"><link rel="next" href="?page=2"><link rel="stylesheet" href="s.css"></head><body>' \
+               '<a href="a.pdf">A</a><A HREF=" b.docx ">B</A><a href="sub/">S</a><a href="a.pdf">dup</a><a>ingen href</a>' \
+               '<a href="mailto:x@example.com">M</a><a href="/abs/c.zip?x=1&amp;y=2">C</a></body></html>'
+        for follow_next in (False, True):
+            streamed = list(iter_html_links("http://portal.example/docs/", [page.encode("utf-8")], "text/html", follow_next=follow_next))
+            file_links, page_links = _page_links("http://portal.example/docs/", bs4.BeautifulSoup(page, "html.parser"), follow_next=follow_next)
+            self.assertEqual({url for kind, url in streamed if kind == "file"}, set(file_links))
+            self.assertEqual({url for kind, url in streamed if kind == "page"}, set(page_links))
+            self.assertEqual("https://files.example/root/?page=2" in page_links, follow_next) # rel=next kun ved crawl
+
+    def test_content_sniffing(self):
+        chunks = [b'%PDF', b'-1.7\n', b'x' * 1000, b'rest']
+        head, stream = peek_stream(iter(chunks), size=8)
+        self.assertEqual(head, b'%PDF-1.7')
+        self.assertEqual(b''.join(stream), b''.join(chunks)) # De kiggede bidder gives videre uden tab
+        self.assertTrue(looks_like_html(b'\n<!DOCTYPE html><html>', 'application/pdf'))
+        self.assertFalse(looks_like_html(b'%PDF-1.7 <html', 'application/pdf'))
+        self.assertEqual(correct_extension("getfile.php", b'%PDF-1.7', 'application/octet-stream'), "getfile.pdf")
+        self.assertEqual(correct_extension("rapport.download", b'PK\x03\x04', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'), "rapport.xlsx")
+        self.assertEqual(correct_extension("ark.xlsx", b'PK\x03\x04', ''), "ark.xlsx")
+        self.assertEqual(correct_extension("rapport.2024", b'%PDF-1.7', ''), "rapport.2024.pdf")
+        self.assertEqual(correct_extension("data.csv", b'a;b;c', 'text/csv'), "data.csv")
+
+    def test_filename_index_reserves_unique_names(self):
+        import os, tempfile, concurrent.futures
+        with tempfile.TemporaryDirectory() as folder:
+            open(os.path.join(folder, "download.pdf"), 'wb').close()
+            names = FilenameIndex(folder)
+            open(os.path.join(folder, "download_1.pdf"), 'wb').close() # Oprettet efter indekset blev bygget
+            with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+                paths = list(executor.map(names.reserve, ["download.pdf"] * 50))
+            self.assertEqual(len(set(paths)), 50)
+            self.assertNotIn(os.path.join(folder, "download_1.pdf"), paths)
+            self.assertTrue(all(os.path.exists(path) for path in paths))
+            names.release(paths[0])
+            self.assertFalse(os.path.exists(paths[0]))
+
+    def test_failed_placement_releases_reserved_name(self):
+        import os, tempfile
+        with tempfile.TemporaryDirectory() as folder:
+            primary, other = os.path.join(folder, "a"), os.path.join(folder, "b")
+            os.makedirs(primary); os.makedirs(other)
+            manifest = DownloadManifest(other)
+            # Den primære fil mangler, så kopieringen fejler efter navnet er reserveret
+            result = place_download_for_source((True, ("https://x.dk/f.pdf", "f.pdf", "a")), primary, None, "https://x.dk/f.pdf", other, "b", manifest)
+            self.assertFalse(result[0])
+            self.assertEqual(os.listdir(other), [])
+            self.assertTrue(manifest.names().reserve("f.pdf").endswith("f.pdf")) # Navnet er ledigt igen
+
+    def test_fast_xlsx_scan_matches_openpyxl(self):
+        import openpyxl, os, queue, tempfile, zipfile
+        main_ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+        with tempfile.TemporaryDirectory() as folder:
+            workbook = openpyxl.Workbook() # openpyxl skriver inline strings og hyperlink-relationer
+            sheet = workbook.active
+            sheet["A1"] = "https://x.dk/inline.pdf"
+            sheet["A2"] = "  https://x.dk/spaces.pdf  "
+            sheet["A3"] = "tekst"; sheet["A3"].hyperlink = "https://x.dk/hyper.pdf"
+            sheet["A4"] = "https://x.dk/a_x005F_x0041_b.pdf"
+            sheet["A5"] = "ftp://ikke.http"
+            workbook.create_sheet("B")["B2"] = "pladsholder"
+            plain_path, path = os.path.join(folder, "plain.xlsx"), os.path.join(folder, "links.xlsx")
+            workbook.save(plain_path)
+            # Shared strings (også rich text og _x005F_) og HYPERLINK-formler med cachet værdi sættes ind i ark B
+            shared = (f'<sst {main_ns}><si><t>https://x.dk/shared.pdf</t></si><si><r><t>https://x.dk/</t></r><r><t>rich.pdf</t></r></si>'
+                      '<si><t>https://x.dk/e_x005F_x0041_.pdf</t></si></sst>')
+            cells = ('<row r="2"><c r="B2" t="s"><v>0</v></c><c r="C2" t="s"><v>1</v></c><c r="D2" t="s"><v>2</v></c></row>'
+                     '<row r="3"><c r="B3" t="str"><f>HYPERLINK("https://x.dk/f.pdf")</f><v>https://x.dk/f.pdf</v></c>'
+                     '<c r="C3" t="str"><f>HYPERLINK("https://x.dk/g.pdf","vis")</f><v>vis</v></c></row>')
+            with zipfile.ZipFile(plain_path) as source, zipfile.ZipFile(path, "w") as target:
+                for name in source.namelist():
+                    data = source.read(name).decode("utf-8")
+                    if name == "xl/worksheets/sheet2.xml":
+                        data = data.replace('<row r="2"><c r="B2" t="inlineStr"><is><t>pladsholder</t></is></c></row>', cells)
+                    elif name == "xl/_rels/workbook.xml.rels":
+                        data = data.replace("</Relationships>", '<Relationship Id="rId99" Target="sharedStrings.xml" '
+                                            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"/></Relationships>')
+                    elif name == "[Content_Types].xml":
+                        data = data.replace("</Types>", '<Override PartName="/xl/sharedStrings.xml" '
+                                            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>')
+                    target.writestr(name, data)
+                target.writestr("xl/sharedStrings.xml", shared)
+            openpyxl_links = set()
+            self.assertTrue(_read_excel_links(path, queue.Queue(), openpyxl_links.add))
+            self.assertEqual(scan_xlsx_links_fast(path), openpyxl_links)
+            self.assertTrue({"https://x.dk/shared.pdf", "https://x.dk/rich.pdf", "https://x.dk/f.pdf", "https://x.dk/hyper.pdf", "https://x.dk/e_x0041_.pdf"} <= openpyxl_links)
+
+            # En DTD i en zip-del afvises i stedet for at blive udvidet
+            bomb_path = os.path.join(folder, "bomb.xlsx")
+            with zipfile.ZipFile(path) as source, zipfile.ZipFile(bomb_path, "w") as target:
+                for name in source.namelist():
+                    data = source.read(name)
+                    if name == "xl/sharedStrings.xml":
+                        data = b'<?xml version="1.0"?><!DOCTYPE sst [<!ENTITY a "aaaa"><!ENTITY b "&a;&a;&a;">]>' + data.replace(b"rich.pdf", b"&b;")
+                    target.writestr(name, data)
+            with self.assertRaises(UnsafeWorkbook):
+                scan_xlsx_links_fast(bomb_path)
+
+    def test_parallel_extraction_matches_sequential(self):
+        import openpyxl, os, queue, tempfile
+        with tempfile.TemporaryDirectory() as folder:
+            paths = []
+            for n in range(3):
+                workbook = openpyxl.Workbook()
+                for row in range(1, 21): workbook.active.cell(row=row, column=1, value=f"https://x.dk/{n}/{row % 15}.pdf")
+                workbook.active["B1"] = "tekst"; workbook.active["B1"].hyperlink = f"https://x.dk/{n}/hyper.pdf"
+                paths.append(os.path.join(folder, f"book{n}.xlsx"))
+                workbook.save(paths[-1])
+            paths.append(os.path.join(folder, "mangler.xlsx")) # Fejl i én fil stopper ikke de andre
+            sequential = extract_links_from_files(paths, queue.Queue())
+            published = []
+            parallel_queue = queue.Queue()
+            parallel = extract_links_from_files_parallel(paths, parallel_queue, on_link=lambda key, url: published.append((key, url)), max_processes=2)
+            self.assertEqual(parallel, sequential)
+            self.assertIn("(2 processer)", parallel_queue.get()[1])
+            self.assertEqual(list(parallel), ["Excel_book0", "Excel_book1", "Excel_book2"]) # Input-rækkefølge
+            self.assertEqual(len(parallel["Excel_book1"]), 16)
+            self.assertEqual(sorted(published), sorted((key, url) for key, urls in sequential.items() for url in urls))
+
+    def test_content_index_hardlinks_identical_files(self):
+        import hashlib, os, tempfile
+        with tempfile.TemporaryDirectory() as folder:
+            def write(relative_path, data):
+                path = os.path.join(folder, relative_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f: f.write(data)
+                return path, hashlib.sha256(data).hexdigest()
+            first, first_hash = write("a/x.pdf", b"same bytes")
+            manifest = DownloadManifest(os.path.dirname(first))
+            manifest.record("https://x.dk/x.pdf", "x.pdf", 10, None, None, first_hash)
+            manifest.save()
+
+            index = ContentIndex(folder) # Kender a/x.pdf fra manifestet (tidligere kørsel)
+            copy, copy_hash = write("b/y.pdf", b"same bytes")
+            self.assertTrue(index.deduplicate(copy, copy_hash, 10))
+            self.assertTrue(os.path.samefile(first, copy))
+            other, other_hash = write("b/z.pdf", b"other data")
+            self.assertFalse(index.deduplicate(other, other_hash, 10))
+            self.assertFalse(os.path.samefile(first, other))
+            self.assertEqual((index.linked_count, index.bytes_saved), (1, 10))
+
+            # En fil fra en tidligere kørsel der er ændret på disken bruges ikke som link-kilde
+            os.remove(first); write("a/x.pdf", b"changed!!!")
+            stale_index = ContentIndex(folder)
+            third, third_hash = write("c/w.pdf", b"same bytes")
+            self.assertFalse(stale_index.deduplicate(third, third_hash, 10))
+            with open(third, 'rb') as f: self.assertEqual(f.read(), b"same bytes")
+
+    def test_segment_ranges_cover_file(self):
+        self.assertEqual(_segment_ranges(10, 4), [(0, 2), (3, 5), (6, 8), (9, 9)])
+        ranges = _segment_ranges(100 * 1024 * 1024 + 7, 4)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], 100 * 1024 * 1024 + 6)
+        self.assertTrue(all(previous[1] + 1 == current[0] for previous, current in zip(ranges, ranges[1:])))
+
+    def test_bandwidth_limiter(self):
+        import time
+        self.assertEqual(parse_rate("500K"), 500 * 1024)
+        self.assertEqual(parse_rate("1.5MB/s"), int(1.5 * 1024 * 1024))
+        self.assertEqual(parse_rate("0"), 0)
+        with self.assertRaises(ValueError): parse_rate("hurtigt")
+        limiter = BandwidthLimiter(0, {"slow.example": 2 * 1024 * 1024})
+        started = time.monotonic()
+        for _ in range(5): limiter.consume("fast.example", 1024 * 1024) # Ingen global grænse
+        self.assertLess(time.monotonic() - started, 0.2)
+        started = time.monotonic()
+        for _ in range(4): limiter.consume("slow.example", 512 * 1024) # 2 MB, heraf 1 MB over burst: ~0.5 s
+        self.assertGreater(time.monotonic() - started, 0.3)
+        self.assertEqual(limiter.host_rates(), {"slow.example": 2 * 1024 * 1024})
+
+    def test_schedule_order_and_byte_progress(self):
+        import queue
+        jobs = [("a", 1), ("b", 2), ("c", 3), ("d", 4)]
+        sizes = {"a": 10, "b": None, "c": 300, "d": 20}
+        self.assertEqual([url for url, _ in schedule_order(jobs, sizes, SCHEDULE_LARGEST_FIRST)], ["c", "d", "a", "b"])
+        self.assertEqual([url for url, _ in schedule_order(jobs, sizes, SCHEDULE_SMALLEST_FIRST)], ["a", "d", "c", "b"])
+        q = queue.Queue()
+        progress = ByteProgress(q, interval=0)
+        progress.expect("a", 100)
+        progress.expect("b", None)
+        progress.start("b", 50) # Content-Length kendt når svaret starter
+        progress.add("a", 40)
+        self.assertEqual((progress.snapshot()["done"], progress.snapshot()["expected"], progress.snapshot()["unknown"]), (40, 150, 0))
+        progress.start("a", 100) # Genforsøg forfra: de 40 bytes tæller ikke længere som hentet
+        progress.finish("b") # Opgivet/uændret: forventes ikke længere
+        self.assertEqual((progress.snapshot()["done"], progress.snapshot()["expected"]), (0, 100))
+        self.assertEqual(q.get_nowait()[0], "progress_bytes")
+
+    def test_largest_first_probes_sizes_and_orders_submissions(self):
+        import queue, tempfile
+        server, base_url = _serve(_SizedHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+        paths = ["/small-100.pdf", "/nohead-5000.pdf", "/big-30000.pdf", "/nolength-800.pdf", "/mid-2000.pdf"]
+        urls = [f"{base_url}{path}" for path in paths]
+        # HEAD 405 og et svar uden Content-Length giver ukendt størrelse; kendte størrelser fra manifestet koster ingen request
+        self.assertEqual(probe_sizes(urls, 5, known_sizes={urls[0]: 123}), dict(zip(urls, [123, None, 30000, None, 2000])))
+        with tempfile.TemporaryDirectory() as folder:
+            _SizedHandler.gets.clear()
+            q = queue.Queue()
+            run_download_task({"a": urls}, folder, q, 1, 5, adaptive=False, order=SCHEDULE_LARGEST_FIRST)
+            messages = []
+            while not q.empty(): messages.append(q.get())
+            # Én tråd: GET-rækkefølgen er indsendelsesrækkefølgen. Største først, ukendte til sidst i input-rækkefølge
+            self.assertEqual(_SizedHandler.gets, ["/big-30000.pdf", "/mid-2000.pdf", "/small-100.pdf", "/nohead-5000.pdf", "/nolength-800.pdf"])
+            progress = [payload for kind, payload in messages if kind == "progress_bytes"]
+            # Probede størrelser er forventet fra start; ukendte tælles for sig indtil deres svar kommer
+            self.assertEqual(progress[0]["expected"], 32100)
+            self.assertGreater(progress[0]["unknown"], 0)
+            self.assertEqual((progress[-1]["done"], progress[-1]["expected"]), (37900, 37900))
+            self.assertEqual(next(payload for kind, payload in messages if kind == "results")[:2], (5, 0))
+
+    def test_job_store_leases_and_reclaims(self):
+        import os, tempfile, time
+        with tempfile.TemporaryDirectory() as folder:
+            store = JobStore(os.path.join(folder, "jobs.sqlite"))
+            self.assertEqual(store.add_links({"a": ["https://x.dk/1.pdf", "https://x.dk/2.pdf"], "b": ["https://X.dk/1.pdf"]}), 3)
+            self.assertEqual(store.add_links({"a": ["https://x.dk/1.pdf"]}), 0) # Genstart lægger ikke dubletter ind
+            first = store.lease("w1", 1, lease_seconds=0.05)
+            self.assertEqual(first[0][2], [("a", "https://x.dk/1.pdf"), ("b", "https://X.dk/1.pdf")]) # Ét job, to refs
+            time.sleep(0.1) # w1 er død; leasen udløber og w2 tager jobbet
+            second = store.lease("w2", 5)
+            self.assertEqual(sorted((job_id, attempt) for job_id, attempt, _ in second), [(first[0][0], 2), (2, 1)])
+            job_id = first[0][0]
+            self.assertFalse(store.finish(job_id, "w1", [(True, ("https://x.dk/1.pdf", "1.pdf", "a"))]))
+            self.assertTrue(store.finish(job_id, "w2", [(True, ("https://x.dk/1.pdf", "1.pdf", "a")), (False, ("https://X.dk/1.pdf", "Fordelingsfejl", "b"))]))
+            self.assertEqual(list(store.results()), [(True, ("https://x.dk/1.pdf", "1.pdf", "a")), (False, ("https://X.dk/1.pdf", "Fordelingsfejl", "b"))])
+            self.assertEqual(store.counts()["leased"], 1)
+            store.close()
+
+    def test_distributed_workers_share_manifests_and_not_part_files(self):
+        import json, os, queue, tempfile
+        server, base_url = _serve(_LocalHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+        self.assertNotEqual(_partial_paths("d", "https://x.dk/f.pdf", "w1"), _partial_paths("d", "https://x.dk/f.pdf", "w2"))
+        with tempfile.TemporaryDirectory() as folder:
+            store_path = os.path.join(folder, "jobs.sqlite")
+            store = JobStore(store_path)
+            store.add_links({"a": [f"{base_url}/d{i}.pdf" for i in range(20)], "b": [f"{base_url}/d0.pdf"]})
+            store.close()
+            workers = [threading.Thread(target=run_distributed_worker, args=(store_path, folder, queue.Queue(), 2, 5), kwargs=dict(worker_id=f"w{i}")) for i in range(2)]
+            for worker in workers: worker.start()
+            for worker in workers: worker.join()
+            # Begge workers har gemt i samme manifest; ingen af deres poster er gået tabt
+            with open(os.path.join(folder, "a", ".download_manifest.json"), encoding="utf-8") as f:
+                self.assertEqual(len(json.load(f)["files"]), 20)
+            self.assertEqual(sorted(os.listdir(os.path.join(folder, "b"))), [".download_manifest.json", "d0.pdf"])
+            # Coordinatoren uden lokale workers: alt er afsluttet, og resultaterne læses fra lageret til en journal
+            q = queue.Queue()
+            run_distributed_coordinator({}, folder, q, 2, 5, store_path=store_path, local_workers=0)
+            messages = []
+            while not q.empty(): messages.append(q.get())
+            success_count, fail_count, failed, successful, _ = next(payload for kind, payload in messages if kind == "results")
+            self.assertEqual((success_count, fail_count), (21, 0))
+            self.assertIsInstance(successful, JournalView)
+            self.assertEqual(sorted(row[2] for row in successful).count("b"), 1)
+
+    def test_distributed_mode_rejects_unsupported_options(self):
+        for extra in (["--archive", "zip"], ["--order", "largest"], ["--engine", "asyncio"], ["--pipelined"]):
+            with self.subTest(extra=extra), self.assertRaises(SystemExit) as ctx:
+                main(["--coordinator", "--excel", "links.xlsx", "--output", "downloads", *extra])
+            self.assertEqual(ctx.exception.code, 2)
+
+    def test_archive_writer_names_index_and_copies(self):
+        import io, json, os, tarfile, tempfile, zipfile
+        with tempfile.TemporaryDirectory() as folder:
+            for archive_format in ("zip", "tar"):
+                first = ArchiveWriter(os.path.join(folder, f"a.{archive_format}"), archive_format)
+                second = ArchiveWriter(os.path.join(folder, f"b.{archive_format}"), archive_format)
+                self.assertEqual(first.add("f.pdf", io.BytesIO(b"one"), 3, "https://x.dk/1/f.pdf", "h1"), "f.pdf")
+                self.assertEqual(first.add("f.pdf", io.BytesIO(b"two"), 3, "https://x.dk/2/f.pdf", "h2"), "f_1.pdf") # Samme navneregler som i en mappe
+                result = place_archived_download((True, ("https://x.dk/2/f.pdf", "f_1.pdf", "a")), first, "https://x.dk/2/f.pdf", second, "b")
+                self.assertEqual(result, (True, ("https://x.dk/2/f.pdf", "f_1.pdf", "b")))
+                first.close(); second.close()
+                if archive_format == "zip":
+                    with zipfile.ZipFile(os.path.join(folder, "b.zip")) as archive: self.assertEqual(archive.read("f_1.pdf"), b"two")
+                else:
+                    with tarfile.open(os.path.join(folder, "b.tar")) as archive: self.assertEqual(archive.extractfile("f_1.pdf").read(), b"two")
+                with open(os.path.join(folder, f"a.{archive_format}.index.jsonl"), encoding="utf-8") as index:
+                    self.assertEqual([json.loads(line)["member"] for line in index], ["f.pdf", "f_1.pdf"])
+
+    def test_archive_mode_end_to_end(self):
+        import os, queue, tarfile, tempfile, zipfile
+        server, base_url = _serve(_LocalHandler)
+        self.addCleanup(server.server_close); self.addCleanup(server.shutdown)
+        links = {"a": [f"{base_url}/doc.pdf", f"{base_url}/html.pdf", f"{base_url}/other.pdf"], "b": [f"{base_url}/doc.pdf"]}
+        for archive_format in ("zip", "tar"):
+            with self.subTest(archive_format=archive_format), tempfile.TemporaryDirectory() as folder:
+                q = queue.Queue()
+                run_download_task(links, folder, q, 2, 5, archive_format=archive_format)
+                messages = []
+                while not q.empty(): messages.append(q.get())
+                success_count, fail_count, failed, successful, _ = next(payload for kind, payload in messages if kind == "results")
+                self.assertEqual((success_count, fail_count), (3, 1))
+                self.assertEqual([(row[0], row[2]) for row in failed], [(f"{base_url}/html.pdf", "a")]) # HTML-siden afvises
+                self.assertEqual(sorted((row[2], row[1]) for row in successful), [("a", "doc.pdf"), ("a", "other.pdf"), ("b", "doc.pdf")])
+                members = {}
+                for source_key in ("a", "b"):
+                    path = os.path.join(folder, f"{source_key}.{archive_format}")
+                    if archive_format == "zip":
+                        with zipfile.ZipFile(path) as archive: members[source_key] = {name: archive.read(name) for name in archive.namelist()}
+                    else:
+                        with tarfile.open(path) as archive: members[source_key] = {member.name: archive.extractfile(member).read() for member in archive.getmembers()}
+                self.assertEqual(sorted(members["a"]), ["doc.pdf", "other.pdf"])
+                self.assertEqual(members["b"], {"doc.pdf": members["a"]["doc.pdf"]}) # Hentet én gang, kopieret til b's arkiv
+                self.assertTrue(members["a"]["doc.pdf"].startswith(b"%PDF"))
+                # Ingen undermapper, .part-filer eller metadata ved siden af arkiverne
+                leftovers = [name for _, _, names in os.walk(folder) for name in names if name.endswith((".part", ".part.json")) or name.endswith(".pdf")]
+                self.assertEqual(leftovers, [])
+                self.assertFalse(os.path.exists(os.path.join(folder, "a")) or os.path.exists(os.path.join(folder, "b")))
+
+    def test_run_journal_views_read_back_from_disk(self):
+        import os, tempfile
+        with tempfile.TemporaryDirectory() as folder:
+            earlier = RunJournal(folder)
+            earlier.record((False, ("https://x.dk/old.pdf", "Timeout (30s)", "a")))
+            earlier.close()
+            journal = RunJournal(folder) # Egne filer; en ny kørsel ser kun sine egne poster
+            for i in range(5): journal.record((True, (f"https://x.dk/{i}.pdf", f"{i}.pdf", "a")))
+            journal.record((False, ("https://x.dk/bad.pdf", "Request Fejl: 404", "b")))
+            journal.close()
+            failed, successful = journal.views()
+            self.assertEqual((len(failed), len(successful)), (1, 5))
+            self.assertEqual(list(failed), [("https://x.dk/bad.pdf", "Request Fejl: 404", "b")])
+            self.assertEqual(successful[3:], [("https://x.dk/3.pdf", "3.pdf", "a"), ("https://x.dk/4.pdf", "4.pdf", "a")])
+            self.assertEqual(successful[0], ("https://x.dk/0.pdf", "0.pdf", "a"))
+            self.assertEqual(successful[-1], ("https://x.dk/4.pdf", "4.pdf", "a"))
+            for _ in range(JOURNAL_KEEP_RUNS): RunJournal(folder).close()
+            self.assertEqual(len(os.listdir(journal.folder)), 2 * JOURNAL_KEEP_RUNS) # Ældre kørsler er ryddet væk
+            self.assertFalse(os.path.exists(journal.failed_path))
+
+    def test_headless_json_results(self):
+        import io, json, tempfile
+        with tempfile.TemporaryDirectory() as folder:
+            journal = RunJournal(folder)
+            journal.record((True, ("https://x.dk/a.pdf", "a.pdf", "a")))
+            journal.record((False, ("https://x.dk/b.pdf", "Timeout (30s)", "a")))
+            journal.close()
+            out = io.StringIO()
+            _print_headless_message("results", (1, 1, *journal.views(), False), True, out)
+            _print_headless_message("results", (0, 1, [("https://x.dk/c.pdf", "Timeout (30s)", "b")], [], True), True, out)
+            from_journal, from_lists = (json.loads(line) for line in out.getvalue().splitlines())
+            self.assertEqual(from_journal["type"], "results")
+            self.assertEqual(from_journal["data"]["failed"], {"journal": journal.failed_path, "count": 1})
+            self.assertEqual(from_journal["data"]["successful"], {"journal": journal.succeeded_path, "count": 1})
+            self.assertEqual((from_journal["data"]["success_count"], from_journal["data"]["is_retry"]), (1, False))
+            with open(from_journal["data"]["failed"]["journal"], encoding="utf-8") as f:
+                self.assertEqual(json.loads(f.readline())["url"], "https://x.dk/b.pdf")
+            self.assertEqual(from_lists["data"]["failed"], [["https://x.dk/c.pdf", "Timeout (30s)", "b"]])
+
+    def test_import_does_not_load_gui_or_parsers(self):
+        # Headless kørsel må ikke kræve tkinter, og korte jobs skal ikke betale for at importere parserne
+        code = "import sys, src.excel_downloader; print(sorted(m for m in ('tkinter', 'openpyxl', 'bs4', 'requests', 'aiohttp') if m in sys.modules))"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "[]")
+
+    def test_main_requires_input_and_output(self):
+        with self.assertRaises(SystemExit) as ctx:
+            main(["--output", "downloads"])
+        self.assertEqual(ctx.exception.code, 2)
+        with self.assertRaises(SystemExit) as ctx:
+            main(["--excel", "links.xlsx"])
+        self.assertEqual(ctx.exception.code, 2)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file